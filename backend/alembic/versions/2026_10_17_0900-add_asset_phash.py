@@ -0,0 +1,29 @@
+"""Add perceptual hash to assets
+
+Revision ID: 003_asset_phash
+Revises: 002_asset_versioning
+Create Date: 2026-10-17 09:00:00
+
+Adds a 64-bit dHash (hex) column for near-duplicate detection.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_asset_phash'
+down_revision: Union[str, None] = '002_asset_versioning'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('assets', sa.Column('phash', sa.String(16), nullable=True))
+    op.create_index('ix_assets_phash', 'assets', ['phash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assets_phash', table_name='assets')
+    op.drop_column('assets', 'phash')
@@ -0,0 +1,27 @@
+"""Add dominant-colour palette to assets
+
+Revision ID: 004_asset_palette
+Revises: 003_asset_phash
+Create Date: 2026-10-17 10:00:00
+
+Stores locally computed dominant colours ([{"hex", "weight"}]).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_asset_palette'
+down_revision: Union[str, None] = '003_asset_phash'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('assets', sa.Column('palette', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('assets', 'palette')
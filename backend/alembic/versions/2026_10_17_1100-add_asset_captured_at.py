@@ -0,0 +1,27 @@
+"""Add EXIF capture time to assets
+
+Revision ID: 005_asset_captured_at
+Revises: 004_asset_palette
+Create Date: 2026-10-17 11:00:00
+
+Filled from the image header probe on asset creation.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_asset_captured_at'
+down_revision: Union[str, None] = '004_asset_palette'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('assets', sa.Column('captured_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('assets', 'captured_at')
@@ -40,9 +40,63 @@ class Settings(BaseSettings):
     r2_endpoint_url: str = ""
     r2_public_url: str = ""
     r2_bucket: str = "neural-canvas-assets"
+
+    # Storage backend: "s3", "local", or "auto" (s3 if R2 is configured).
+    # "local" serves objects unauthenticated at /storage: development only
+    storage_backend: str = "auto"
+    storage_local_root: str = ""  # "" = system temp dir
+    storage_local_url: str = "http://localhost:8000/storage"
+    storage_signed_urls: bool = False  # Private bucket: responses carry presigned URLs
+    storage_url_ttl: int = 3600  # Signed URLs are stable for this long (valid up to 2x)
+    url_signer_max_entries: int = 100_000
+
+    # Direct client uploads (presigned PUT / multipart)
+    upload_session_expiry: int = 3600  # Lifetime of upload URLs
+    upload_part_bytes: int = 16 * 1024 * 1024  # Multipart part size (S3 minimum is 5MB)
+    upload_enqueue_renditions: bool = False  # Also queue the Celery rendition task
     
     # Gemini AI
     gemini_api_key: str = ""
+    analysis_cache_backend: str = "memory"  # memory, redis, none
+    analysis_cache_ttl: int = 7 * 24 * 3600
+    analysis_cache_max_entries: int = 50_000
+    gemini_rate_backend: str = "memory"  # memory, redis (shared across processes)
+    gemini_requests_per_minute: int = 1000
+    gemini_tokens_per_minute: int = 1_000_000
+    gemini_max_in_flight: int = 16
+    gemini_max_retries: int = 5
+    gemini_batch_size: int = 8  # Images per multi-image analysis request
+    gemini_batch_max_wait: float = 2.0  # Seconds to wait for a micro-batch to fill
+    gemini_input_max_edge: int = 1024  # Long edge of images sent for analysis
+    gemini_input_max_bytes: int = 300 * 1024  # Encoded size budget per analysis image
+    
+    # Image processing (0 = one pool worker per CPU)
+    image_pool_workers: int = 0
+    image_max_download_bytes: int = 100 * 1024 * 1024
+    image_max_pixels: int = 120_000_000
+    image_tile_threshold_mp: float = 40.0  # Above this, filters/resizes run in strips
+    image_tile_max_pixels: int = 4_000_000  # Pixels per strip (incl. overlap)
+    image_probe_bytes: int = 16 * 1024  # First ranged read of a header probe
+    image_probe_max_bytes: int = 256 * 1024  # Give up if the header isn't within this
+    image_probe_concurrency: int = 64
+    storage_max_concurrency: int = 16  # Concurrent S3 calls from the async API
+    storage_upload_parallelism: int = 32  # Concurrent PUTs per upload_many call
+    rendition_batch_size: int = 25  # Assets per generate_renditions_batch task (sources held in memory)
+    duplicate_index_max_tables: int = 256  # Per-owner duplicate tables kept per process
+    buffer_pool_max_buffers: int = 16  # Idle encode buffers kept per process
+    buffer_pool_max_buffer_bytes: int = 32 * 1024 * 1024  # Larger ones aren't pooled
+    
+    # Local derivative cache ("" = system temp dir, 0 bytes = disabled)
+    derivative_cache_dir: str = ""
+    derivative_cache_max_bytes: int = 2 * 1024 * 1024 * 1024
+    
+    # Outbound HTTP (shared pooled client for image downloads)
+    http_http2: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 30.0
+    http_connect_timeout: float = 5.0
     
     @property
     def cors_origins_list(self) -> list[str]:
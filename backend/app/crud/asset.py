@@ -3,7 +3,10 @@ Neural Canvas Backend - Asset CRUD Operations
 """
 
 import uuid
-from sqlalchemy import select
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.asset import Asset
@@ -34,6 +37,18 @@ async def get_asset_by_id(
     return result.scalar_one_or_none()
 
 
+async def get_asset_by_storage_url(
+    db: AsyncSession, storage_url: str, owner_id: str
+) -> Asset | None:
+    """Get the owner's asset stored at ``storage_url``, if any."""
+    result = await db.execute(
+        select(Asset)
+        .where(Asset.storage_url == storage_url, Asset.owner_id == owner_id)
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
 async def create_asset(
     db: AsyncSession, asset_in: AssetCreate, owner_id: str
 ) -> Asset:
@@ -65,3 +80,68 @@ async def delete_asset(db: AsyncSession, asset: Asset) -> None:
     """Delete an asset."""
     await db.delete(asset)
     await db.flush()
+
+
+async def set_asset_phash(db: AsyncSession, asset_id: str, phash: str) -> None:
+    """Store an asset's perceptual hash."""
+    await db.execute(update(Asset).where(Asset.id == asset_id).values(phash=phash))
+    await db.flush()
+
+
+async def set_asset_palette(db: AsyncSession, asset_id: str, palette: list[dict]) -> None:
+    """Store an asset's dominant-colour palette."""
+    await db.execute(update(Asset).where(Asset.id == asset_id).values(palette=palette))
+    await db.flush()
+
+
+async def set_asset_analysis(db: AsyncSession, asset_id: str, analysis: dict) -> None:
+    """
+    Store Gemini tags and caption and mark the asset analyzed. Error
+    results (``{"error": ...}``) are refused with ValueError so a failed
+    call never marks an asset analyzed without tags.
+    """
+    if analysis.get("error"):
+        raise ValueError(f"Not an analysis result: {analysis['error']}")
+    await db.execute(
+        update(Asset)
+        .where(Asset.id == asset_id)
+        .values(
+            tags=analysis.get("tags", []),
+            caption=analysis.get("caption"),
+            analyzed=True,
+            processing_status="completed",
+        )
+    )
+    await db.flush()
+
+
+async def set_asset_status(db: AsyncSession, asset_id: str, processing_status: str) -> None:
+    """Update an asset's processing status (pending, processing, failed, completed)."""
+    await db.execute(
+        update(Asset).where(Asset.id == asset_id).values(processing_status=processing_status)
+    )
+    await db.flush()
+
+
+async def get_asset_hashes(db: AsyncSession, owner_id: str) -> list[tuple[str, str]]:
+    """(asset_id, phash) for every hashed asset of a user."""
+    result = await db.execute(
+        select(Asset.id, Asset.phash).where(
+            Asset.owner_id == owner_id, Asset.phash.is_not(None)
+        )
+    )
+    return [(row.id, row.phash) for row in result]
+
+
+async def get_hash_version(db: AsyncSession, owner_id: str) -> tuple[int, Optional[datetime]]:
+    """
+    (count, latest updated_at) of a user's hashed assets: changes on any
+    add, delete or re-hash, so cached duplicate tables can detect staleness.
+    """
+    result = await db.execute(
+        select(func.count(), func.max(Asset.updated_at)).where(
+            Asset.owner_id == owner_id, Asset.phash.is_not(None)
+        )
+    )
+    count, latest = result.one()
+    return count, latest
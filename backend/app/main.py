@@ -8,7 +8,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.database import engine
-from app.routers import auth_router, users_router, assets_router, reels_router, themes_router, batch_router
+from app.services.image_processor import image_processor
+from app.services.http_client import get_http_client, close_http_client
+from app.services.storage_service import storage_service
+from app.routers import auth_router, users_router, assets_router, reels_router, themes_router, batch_router, storage_router, uploads_router
 
 
 @asynccontextmanager
@@ -16,8 +19,13 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup
     print("🚀 Neural Canvas Backend starting...")
+    image_processor.start_pool(settings.image_pool_workers)
+    get_http_client()
     yield
     # Shutdown
+    await close_http_client()
+    image_processor.shutdown_pool()
+    storage_service.shutdown()
     await engine.dispose()
     print("👋 Neural Canvas Backend shutdown complete.")
 
@@ -48,6 +56,8 @@ app.include_router(assets_router, tags=["assets"])
 app.include_router(reels_router, prefix="/reels", tags=["reels"])  # Has no internal prefix
 app.include_router(themes_router, prefix="/themes", tags=["themes"])  # Has no internal prefix
 app.include_router(batch_router, tags=["batch"])
+app.include_router(storage_router, tags=["storage"])
+app.include_router(uploads_router, tags=["uploads"])
 
 
 @app.get("/")
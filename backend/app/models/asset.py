@@ -58,10 +58,17 @@ class Asset(Base):
     caption: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     analyzed: Mapped[bool] = mapped_column(default=False)
     
+    # Perceptual hash (64-bit dHash, hex) for near-duplicate detection
+    phash: Mapped[Optional[str]] = mapped_column(String(16), nullable=True, index=True)
+    
+    # Dominant colours from the local palette engine: [{"hex", "weight"}]
+    palette: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    
     # Metadata
     original_filename: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     mime_type: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     file_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    captured_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # EXIF capture time
     
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow
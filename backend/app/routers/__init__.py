@@ -6,6 +6,8 @@ from app.routers.assets import router as assets_router
 from app.routers.reels import router as reels_router
 from app.routers.themes import router as themes_router
 from app.routers.batch import router as batch_router
+from app.routers.storage import router as storage_router
+from app.routers.uploads import router as uploads_router
 
-__all__ = ["auth_router", "users_router", "assets_router", "reels_router", "themes_router", "batch_router"]
+__all__ = ["auth_router", "users_router", "assets_router", "reels_router", "themes_router", "batch_router", "storage_router", "uploads_router"]
 
@@ -3,25 +3,93 @@ Neural Canvas Backend - Assets Router
 Asset CRUD endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import io
+import logging
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from PIL import Image
 
-from app.database import get_async_db
+from app.config import settings
+from app.database import get_async_db, async_session_maker
 from app.models.user import User
-from app.schemas.asset import AssetCreate, AssetUpdate, AssetResponse
+from app.schemas.asset import AssetCreate, AssetUpdate, AssetResponse, DuplicateGroup
 from app.crud.asset import (
     get_assets_by_owner,
     get_asset_by_id,
     create_asset,
     update_asset,
     delete_asset,
+    set_asset_phash,
+    set_asset_palette,
+    get_asset_hashes,
+    get_hash_version,
 )
 from app.dependencies import get_current_active_user
+from app.services import encoders
+from app.services.image_processor import ImageRejectedError, image_processor
+from app.services.image_probe import image_probe
+from app.services.storage_backends import StorageError
+from app.services.storage_service import storage_service
+from app.services.url_signer import url_signer
+from app.services.duplicate_index import duplicate_index, hash_to_hex
+
+logger = logging.getLogger(__name__)
+
+# Largest Hamming radius accepted by /assets/duplicates
+MAX_DUPLICATE_RADIUS = 6
+
+# Largest bounding box served by /assets/{id}/rendition
+MAX_RENDITION_EDGE = 4096
 
 
 router = APIRouter(prefix="/assets", tags=["Assets"])
 
 
+async def to_responses(assets: list) -> list[AssetResponse]:
+    """
+    Serialize assets. With ``storage_signed_urls`` (private bucket), image
+    URLs are swapped for cached presigned ones, signed in one batch.
+    """
+    responses = [AssetResponse.model_validate(asset) for asset in assets]
+    if not settings.storage_signed_urls:
+        return responses
+    signed = await url_signer.sign_urls_async(
+        url for response in responses for url in (response.storage_url, response.thumbnail_url)
+    )
+    for response in responses:
+        response.storage_url = signed.get(response.storage_url, response.storage_url)
+        if response.thumbnail_url:
+            response.thumbnail_url = signed.get(response.thumbnail_url, response.thumbnail_url)
+    return responses
+
+
+async def index_asset(asset_id: str, owner_id: str, storage_url: str) -> None:
+    """
+    Background task: compute and store the perceptual hash and colour
+    palette of a new asset from a single download.
+    """
+    try:
+        data = await image_processor.download_bytes(storage_url)
+        # Separate lazy opens so each can draft-decode at its own scale
+        value = await asyncio.to_thread(
+            image_processor.dhash, Image.open(io.BytesIO(data))
+        )
+        palette = await asyncio.to_thread(
+            image_processor.extract_palette, Image.open(io.BytesIO(data)), draft=True
+        )
+        async with async_session_maker() as db:
+            await set_asset_phash(db, asset_id, hash_to_hex(value))
+            await set_asset_palette(db, asset_id, palette)
+            await db.commit()
+        duplicate_index.add(owner_id, asset_id, value)
+    except Exception as e:
+        logger.warning("Asset indexing failed for %s: %s", asset_id, e)
+
+
 @router.get("", response_model=list[AssetResponse])
 async def list_assets(
     skip: int = 0,
@@ -31,18 +99,60 @@ async def list_assets(
 ) -> list[AssetResponse]:
     """List all assets for the current user."""
     assets = await get_assets_by_owner(db, current_user.id, skip=skip, limit=limit)
-    return [AssetResponse.model_validate(asset) for asset in assets]
+    return await to_responses(assets)
 
 
 @router.post("", response_model=AssetResponse, status_code=status.HTTP_201_CREATED)
 async def create_new_asset(
     asset_in: AssetCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_async_db),
 ) -> AssetResponse:
-    """Create a new asset."""
+    """
+    Create a new asset (hashed and palette-extracted in the background).
+    For objects in managed storage, dimensions, MIME type, size and
+    capture time come from a header probe instead of the client, and
+    non-images or decompression bombs are rejected with 400.
+    """
+    if storage_service.owns_url(asset_in.storage_url):
+        # Listings sign owned keys: never for another user's upload
+        object_key = storage_service.object_key(asset_in.storage_url) or ""
+        if object_key.startswith("uploads/") and not object_key.startswith(f"uploads/{current_user.id}/"):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Object belongs to another user",
+            )
+        try:
+            probe = await image_probe.probe(asset_in.storage_url)
+            asset_in = asset_in.model_copy(update=probe.asset_fields())
+        except ImageRejectedError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+        except (httpx.HTTPError, StorageError) as e:
+            logger.warning("Header probe failed for %s: %s", asset_in.storage_url, e)
     asset = await create_asset(db, asset_in, current_user.id)
-    return AssetResponse.model_validate(asset)
+    if storage_service.owns_url(asset.storage_url):
+        background_tasks.add_task(index_asset, asset.id, current_user.id, asset.storage_url)
+    return (await to_responses([asset]))[0]
+
+
+@router.get("/duplicates", response_model=list[DuplicateGroup])
+async def list_duplicate_groups(
+    radius: int = Query(4, ge=0, le=MAX_DUPLICATE_RADIUS),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> list[DuplicateGroup]:
+    """Group the user's near-identical assets (perceptual hash within radius bits)."""
+    version = await get_hash_version(db, current_user.id)
+    table = duplicate_index.get(current_user.id, radius, version)
+    if table is None:
+        table = duplicate_index.build(
+            current_user.id, radius, await get_asset_hashes(db, current_user.id), version
+        )
+    return [DuplicateGroup(asset_ids=group) for group in table.groups(radius)]
 
 
 @router.get("/{asset_id}", response_model=AssetResponse)
@@ -58,7 +168,71 @@ async def get_asset(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Asset not found",
         )
-    return AssetResponse.model_validate(asset)
+    return (await to_responses([asset]))[0]
+
+
+@router.get("/{asset_id}/rendition")
+async def get_asset_rendition(
+    asset_id: str,
+    request: Request,
+    width: int = Query(300, ge=16, le=MAX_RENDITION_EDGE),
+    height: int = Query(300, ge=16, le=MAX_RENDITION_EDGE),
+    profile: str = Query("fast"),
+    format: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """
+    Resized rendition fitted within width x height. The output format is
+    negotiated from the Accept header (AVIF > WebP > JPEG) unless
+    ``format`` is given; ``profile`` picks the encoder tier.
+    """
+    asset = await get_asset_by_id(db, asset_id, current_user.id)
+    if not asset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Asset not found",
+        )
+    if not storage_service.owns_url(asset.storage_url):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Asset is not in managed storage",
+        )
+    try:
+        output_format = (
+            encoders.normalize_format(format) if format
+            else encoders.negotiate_format(request.headers.get("accept"))
+        )
+        encoders.get_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if output_format not in encoders.MIME_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported output format: {format}",
+        )
+
+    # Keyed on the asset, not its bytes: a cache hit (or a 304) never
+    # touches the original
+    params = {"size": [width, height], "format": output_format, "profile": profile}
+    key = image_processor.source_derivative_key(
+        f"asset:{asset.id}:{asset.storage_url}", "thumbnail", params
+    )
+    headers = {"Vary": "Accept", "Cache-Control": "private, max-age=86400", "ETag": f'"{key}"'}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or headers["ETag"] in (
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    rendition = await image_processor.derive_for_key_async(
+        key, lambda: image_processor.download_bytes(asset.storage_url), "thumbnail", params
+    )
+    return Response(
+        content=rendition,
+        media_type=encoders.MIME_TYPES[output_format],
+        headers=headers,
+    )
 
 
 @router.patch("/{asset_id}", response_model=AssetResponse)
@@ -77,7 +251,7 @@ async def update_existing_asset(
         )
     
     updated_asset = await update_asset(db, asset, update_data)
-    return AssetResponse.model_validate(updated_asset)
+    return (await to_responses([updated_asset]))[0]
 
 
 @router.delete("/{asset_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -95,3 +269,4 @@ async def delete_existing_asset(
         )
     
     await delete_asset(db, asset)
+    duplicate_index.remove(current_user.id, asset_id)
@@ -4,18 +4,26 @@ Handles batch operations for assets: AI analysis, filters, bulk edits.
 Industry Best Practice: Async background tasks for scalable processing.
 """
 
+import asyncio
+import io
 import uuid
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+from PIL import Image
 
 from app.database import get_async_db
 from app.models.user import User
 from app.models.asset import Asset
 from app.dependencies import get_current_active_user
 from app.services.image_processor import image_processor
-from app.crud.asset import get_asset_by_id, create_asset
+from app.services.image_probe import image_probe
+from app.services.analysis_batcher import analysis_batcher
+from app.services.duplicate_index import duplicate_index, hash_to_hex
+from app.services.smart_crop import COMPOSITION_RULES
+from app.services.storage_service import storage_service
+from app.crud.asset import get_asset_by_id, create_asset, set_asset_analysis
 from app.schemas.asset import AssetCreate
 
 
@@ -27,7 +35,7 @@ router = APIRouter(prefix="/batch", tags=["Batch Processing"])
 class BatchProcessRequest(BaseModel):
     """Request to process multiple assets."""
     asset_ids: list[str]
-    operation: str  # "analyze", "resize", "filter", "thumbnail"
+    operation: str  # "analyze", "resize", "filter", "thumbnail", "hash", "palette", "smart_crop", "probe"
     params: Optional[dict] = None  # Operation-specific parameters
 
 
@@ -46,8 +54,15 @@ class BatchStatusResponse(BaseModel):
     processed: int
     total: int
     failed_ids: list[str]
+    outputs: dict[str, str] = {}  # asset_id -> rendition URL (smart_crop)
 
 
+# Assets downloaded and clustered together by the palette operation
+PALETTE_BATCH_WINDOW = 32
+
+# Largest hero crop edge accepted by the smart_crop operation
+MAX_CROP_EDGE = 8192
+
 # --- In-memory job tracking (for MVP; use Redis in production) ---
 _batch_jobs: dict[str, dict] = {}
 
@@ -62,7 +77,75 @@ async def process_batch_analyze(
 ):
     """
     Background task: Analyze multiple assets with Gemini.
-    Creates new versioned assets with analysis results.
+    Assets are analyzed in multi-image micro-batches and updated with the results.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    job = _batch_jobs[job_id]
+    job["status"] = "processing"
+    
+    async def analyze(asset_row) -> dict:
+        # Download, then join a multi-image Gemini request (cache first)
+        data = await image_processor.download_bytes(asset_row.storage_url)
+        return await analysis_batcher.submit(data)
+    
+    async with async_session() as db:
+        # One window per micro-batch so downloads stay bounded
+        window = analysis_batcher.max_batch
+        for start in range(0, len(asset_ids), window):
+            chunk = asset_ids[start:start + window]
+            result = await db.execute(
+                Asset.__table__.select().where(
+                    Asset.id.in_(chunk),
+                    Asset.owner_id == user_id
+                )
+            )
+            rows = {row.id: row for row in result.fetchall()}
+            found = [asset_id for asset_id in chunk if asset_id in rows]
+            job["failed_ids"].extend(asset_id for asset_id in chunk if asset_id not in rows)
+            
+            analyses = await asyncio.gather(
+                *(analyze(rows[asset_id]) for asset_id in found),
+                return_exceptions=True,
+            )
+            
+            for asset_id, analysis in zip(found, analyses):
+                try:
+                    if isinstance(analysis, Exception):
+                        raise analysis
+                    if analysis.get("error"):
+                        # Whole-batch failures (429/5xx) come back per item: leave the row as is
+                        raise RuntimeError(analysis["error"])
+                    
+                    # Update asset with analysis
+                    await set_asset_analysis(db, asset_id, analysis)
+                    await db.commit()
+                    
+                    job["processed"] += 1
+                    
+                except Exception as e:
+                    print(f"[BATCH] Failed to process {asset_id}: {e}")
+                    job["failed_ids"].append(asset_id)
+    
+    job["status"] = "completed" if not job["failed_ids"] else "partial"
+    await engine.dispose()
+
+
+async def process_batch_filter(
+    job_id: str,
+    asset_ids: list[str],
+    user_id: str,
+    filter_types: list[str],
+    db_url: str,
+):
+    """
+    Background task: Apply a filter stack to assets, creating new versions.
+    Stacked colour filters are fused into a single pixel pass.
+    Preserves originals (versioning).
     """
     from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
     from sqlalchemy.orm import sessionmaker
@@ -76,7 +159,7 @@ async def process_batch_analyze(
     async with async_session() as db:
         for asset_id in asset_ids:
             try:
-                # Get asset
+                # Get original asset
                 result = await db.execute(
                     Asset.__table__.select().where(
                         Asset.id == asset_id,
@@ -88,22 +171,89 @@ async def process_batch_analyze(
                     job["failed_ids"].append(asset_id)
                     continue
                 
-                # Download and analyze
+                # Download, then filter via the derivative cache / worker pool
+                data = await image_processor.download_bytes(asset_row.storage_url)
+                filtered_bytes = await image_processor.derive_async(
+                    data, "filter", {"filters": filter_types}
+                )
+                filtered = Image.open(io.BytesIO(filtered_bytes))  # Header only
+                
+                # TODO: Upload filtered image to cloud storage
+                # For now, just mark as processed
+                
+                # Create new version asset
+                new_id = str(uuid.uuid4())
+                new_asset = Asset(
+                    id=new_id,
+                    owner_id=user_id,
+                    parent_id=asset_id,  # Link to original
+                    version_number=2,  # TODO: Query max version
+                    is_original=False,
+                    processing_status="completed",
+                    storage_url=asset_row.storage_url,  # TODO: Use new URL
+                    thumbnail_url=asset_row.thumbnail_url,
+                    width=filtered.width,
+                    height=filtered.height,
+                    original_filename=f"{asset_row.original_filename}_{'_'.join(filter_types)}",
+                    mime_type=asset_row.mime_type,
+                )
+                db.add(new_asset)
+                await db.commit()
+                
+                job["processed"] += 1
+                
+            except Exception as e:
+                print(f"[BATCH] Failed to process {asset_id}: {e}")
+                job["failed_ids"].append(asset_id)
+    
+    job["status"] = "completed" if not job["failed_ids"] else "partial"
+    await engine.dispose()
+
+
+async def process_batch_hash(
+    job_id: str,
+    asset_ids: list[str],
+    user_id: str,
+    db_url: str,
+):
+    """
+    Background task: Compute perceptual hashes for existing assets
+    (backfill for near-duplicate detection).
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    job = _batch_jobs[job_id]
+    job["status"] = "processing"
+    
+    async with async_session() as db:
+        for asset_id in asset_ids:
+            try:
+                result = await db.execute(
+                    Asset.__table__.select().where(
+                        Asset.id == asset_id,
+                        Asset.owner_id == user_id
+                    )
+                )
+                asset_row = result.fetchone()
+                if not asset_row:
+                    job["failed_ids"].append(asset_id)
+                    continue
+                
+                # Lazy open so dhash can draft-decode at 1/8 scale
                 image = await image_processor.download_image(asset_row.storage_url)
-                analysis = await image_processor.analyze_with_gemini(image)
+                value = await asyncio.to_thread(image_processor.dhash, image)
                 
-                # Update asset with analysis
                 await db.execute(
                     Asset.__table__.update()
                     .where(Asset.id == asset_id)
-                    .values(
-                        tags=analysis.get("tags", []),
-                        caption=analysis.get("caption"),
-                        analyzed=True,
-                        processing_status="completed"
-                    )
+                    .values(phash=hash_to_hex(value))
                 )
                 await db.commit()
+                duplicate_index.add(user_id, asset_id, value)
                 
                 job["processed"] += 1
                 
@@ -115,16 +265,80 @@ async def process_batch_analyze(
     await engine.dispose()
 
 
-async def process_batch_filter(
+async def process_batch_palette(
     job_id: str,
     asset_ids: list[str],
     user_id: str,
-    filter_type: str,
     db_url: str,
 ):
     """
-    Background task: Apply filter to assets, creating new versions.
-    Preserves originals (versioning).
+    Background task: Extract dominant-colour palettes locally (no Gemini
+    call), clustering each window of images in one vectorized pass.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    job = _batch_jobs[job_id]
+    job["status"] = "processing"
+    
+    async with async_session() as db:
+        window = PALETTE_BATCH_WINDOW
+        for start in range(0, len(asset_ids), window):
+            chunk = asset_ids[start:start + window]
+            result = await db.execute(
+                Asset.__table__.select().where(
+                    Asset.id.in_(chunk),
+                    Asset.owner_id == user_id
+                )
+            )
+            rows = {row.id: row for row in result.fetchall()}
+            job["failed_ids"].extend(asset_id for asset_id in chunk if asset_id not in rows)
+            
+            # Lazy opens so each image can draft-decode near the sample size
+            downloads = await asyncio.gather(
+                *(image_processor.download_image(row.storage_url) for row in rows.values()),
+                return_exceptions=True,
+            )
+            images = {}
+            for asset_id, image in zip(rows, downloads):
+                if isinstance(image, Exception):
+                    print(f"[BATCH] Failed to process {asset_id}: {image}")
+                    job["failed_ids"].append(asset_id)
+                else:
+                    images[asset_id] = image
+            
+            try:
+                palettes = await asyncio.to_thread(
+                    image_processor.extract_palettes, list(images.values()), draft=True
+                )
+                for asset_id, palette in zip(images, palettes):
+                    await db.execute(
+                        Asset.__table__.update()
+                        .where(Asset.id == asset_id)
+                        .values(palette=palette)
+                    )
+                await db.commit()
+                job["processed"] += len(images)
+            except Exception as e:
+                print(f"[BATCH] Failed to process palettes: {e}")
+                job["failed_ids"].extend(images)
+    
+    job["status"] = "completed" if not job["failed_ids"] else "partial"
+    await engine.dispose()
+
+
+async def process_batch_probe(
+    job_id: str,
+    asset_ids: list[str],
+    user_id: str,
+    db_url: str,
+):
+    """
+    Background task: Backfill dimensions, MIME type, size and capture
+    time from header probes (a few KB per asset, probed concurrently).
     """
     from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
     from sqlalchemy.orm import sessionmaker
@@ -135,10 +349,87 @@ async def process_batch_filter(
     job = _batch_jobs[job_id]
     job["status"] = "processing"
     
+    async with async_session() as db:
+        result = await db.execute(
+            Asset.__table__.select().where(
+                Asset.id.in_(asset_ids),
+                Asset.owner_id == user_id
+            )
+        )
+        rows = {
+            row.id: row for row in result.fetchall()
+            if storage_service.owns_url(row.storage_url)
+        }
+        job["failed_ids"].extend(asset_id for asset_id in asset_ids if asset_id not in rows)
+        
+        probes = await image_probe.probe_many([row.storage_url for row in rows.values()])
+        for asset_id, probe in zip(rows, probes):
+            if isinstance(probe, Exception):
+                print(f"[BATCH] Failed to process {asset_id}: {probe}")
+                job["failed_ids"].append(asset_id)
+                continue
+            await db.execute(
+                Asset.__table__.update()
+                .where(Asset.id == asset_id)
+                .values(**probe.asset_fields())
+            )
+            job["processed"] += 1
+        await db.commit()
+    
+    job["status"] = "completed" if not job["failed_ids"] else "partial"
+    await engine.dispose()
+
+
+def smart_crop_options(params: dict) -> tuple[int, int, dict]:
+    """Validated (width, height, subjects) for smart_crop; raises ValueError."""
+    try:
+        width = int(params.get("width", 1920))
+        height = int(params.get("height", 1080))
+    except (TypeError, ValueError):
+        raise ValueError("width and height must be integers")
+    if not (0 < width <= MAX_CROP_EDGE and 0 < height <= MAX_CROP_EDGE):
+        raise ValueError(f"width and height must be between 1 and {MAX_CROP_EDGE}")
+    subjects = params.get("subjects") or {}
+    if not isinstance(subjects, dict) or not all(
+        isinstance(subject, dict) for subject in subjects.values()
+    ):
+        raise ValueError("subjects must map asset IDs to objects")
+    return width, height, subjects
+
+
+async def process_batch_smart_crop(
+    job_id: str,
+    asset_ids: list[str],
+    user_id: str,
+    params: dict,
+    db_url: str,
+):
+    """
+    Background task: Render hero crops (16:9 by default) server-side and
+    upload them as renditions, so playback streams pre-cropped frames.
+    Per-asset "box"/"focal_point" come from params["subjects"]; assets
+    without one are cropped around their edge-energy focus.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    job = _batch_jobs[job_id]
+    job["status"] = "processing"
+    
+    try:
+        width, height, subjects = smart_crop_options(params)
+    except ValueError as e:
+        print(f"[BATCH] Invalid smart_crop params for job {job_id}: {e}")
+        job["status"] = "failed"
+        await engine.dispose()
+        return
+    
     async with async_session() as db:
         for asset_id in asset_ids:
             try:
-                # Get original asset
                 result = await db.execute(
                     Asset.__table__.select().where(
                         Asset.id == asset_id,
@@ -150,31 +441,22 @@ async def process_batch_filter(
                     job["failed_ids"].append(asset_id)
                     continue
                 
-                # Download, apply filter
-                image = await image_processor.download_image(asset_row.storage_url)
-                filtered = image_processor.apply_filter(image, filter_type)
+                subject = subjects.get(asset_id) or {}
+                data = await image_processor.download_bytes(asset_row.storage_url)
+                cropped = await image_processor.derive_async(data, "smart_crop", {
+                    "box": subject.get("box"),
+                    "focal_point": subject.get("focal_point"),
+                    "composition": params.get("composition", "center"),
+                    "width": width,
+                    "height": height,
+                })
                 
-                # TODO: Upload filtered image to cloud storage
-                # For now, just mark as processed
-                
-                # Create new version asset
-                new_id = str(uuid.uuid4())
-                new_asset = Asset(
-                    id=new_id,
-                    owner_id=user_id,
-                    parent_id=asset_id,  # Link to original
-                    version_number=2,  # TODO: Query max version
-                    is_original=False,
-                    processing_status="completed",
-                    storage_url=asset_row.storage_url,  # TODO: Use new URL
-                    thumbnail_url=asset_row.thumbnail_url,
-                    width=filtered.width,
-                    height=filtered.height,
-                    original_filename=f"{asset_row.original_filename}_{filter_type}",
-                    mime_type=asset_row.mime_type,
+                url = await storage_service.upload_image_async(
+                    cropped, f"renditions/{asset_id}/hero_{width}x{height}.jpg"
                 )
-                db.add(new_asset)
-                await db.commit()
+                if url is None:
+                    raise RuntimeError("Upload failed")
+                job["outputs"][asset_id] = url
                 
                 job["processed"] += 1
                 
@@ -197,7 +479,7 @@ async def submit_batch_job(
 ) -> BatchJobResponse:
     """
     Submit a batch processing job.
-    Operations: analyze, resize, filter, thumbnail
+    Operations: analyze, resize, filter, thumbnail, hash, palette, smart_crop, probe
     """
     if not request.asset_ids:
         raise HTTPException(
@@ -205,12 +487,29 @@ async def submit_batch_job(
             detail="No asset IDs provided"
         )
     
-    if request.operation not in ["analyze", "resize", "filter", "thumbnail"]:
+    if request.operation not in [
+        "analyze", "resize", "filter", "thumbnail", "hash", "palette", "smart_crop", "probe"
+    ]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Unknown operation: {request.operation}"
         )
     
+    if request.operation == "smart_crop":
+        composition = (request.params or {}).get("composition", "center")
+        if composition not in COMPOSITION_RULES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown composition: {composition}"
+            )
+        try:
+            smart_crop_options(request.params or {})
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
     # Create job
     job_id = str(uuid.uuid4())
     _batch_jobs[job_id] = {
@@ -218,6 +517,7 @@ async def submit_batch_job(
         "processed": 0,
         "total": len(request.asset_ids),
         "failed_ids": [],
+        "outputs": {},
     }
     
     # Get DB URL for background task
@@ -234,13 +534,48 @@ async def submit_batch_job(
             db_url,
         )
     elif request.operation == "filter":
-        filter_type = request.params.get("filter_type", "grayscale") if request.params else "grayscale"
+        # "filters": ["brighten", "sepia"] stacks; "filter_type" applies one
+        params = request.params or {}
+        filter_types = params.get("filters") or [params.get("filter_type", "grayscale")]
         background_tasks.add_task(
             process_batch_filter,
             job_id,
             request.asset_ids,
             current_user.id,
-            filter_type,
+            filter_types,
+            db_url,
+        )
+    elif request.operation == "hash":
+        background_tasks.add_task(
+            process_batch_hash,
+            job_id,
+            request.asset_ids,
+            current_user.id,
+            db_url,
+        )
+    elif request.operation == "palette":
+        background_tasks.add_task(
+            process_batch_palette,
+            job_id,
+            request.asset_ids,
+            current_user.id,
+            db_url,
+        )
+    elif request.operation == "smart_crop":
+        background_tasks.add_task(
+            process_batch_smart_crop,
+            job_id,
+            request.asset_ids,
+            current_user.id,
+            request.params or {},
+            db_url,
+        )
+    elif request.operation == "probe":
+        background_tasks.add_task(
+            process_batch_probe,
+            job_id,
+            request.asset_ids,
+            current_user.id,
             db_url,
         )
     else:
@@ -280,6 +615,7 @@ async def get_batch_status(
         processed=job["processed"],
         total=job["total"],
         failed_ids=job["failed_ids"],
+        outputs=job.get("outputs", {}),
     )
 
 
@@ -295,6 +631,7 @@ async def list_batch_jobs(
             processed=job["processed"],
             total=job["total"],
             failed_ids=job["failed_ids"],
+            outputs=job.get("outputs", {}),
         )
         for job_id, job in _batch_jobs.items()
     ]
@@ -0,0 +1,63 @@
+"""
+Neural Canvas Backend - Local Storage Router
+Serves objects from the local-filesystem storage backend, standing in for
+the R2 public bucket. FileResponse handles Range/HEAD and hands the file
+to the server (``pathsend``) where supported instead of reading it here.
+Signed PUTs stand in for presigned bucket uploads.
+"""
+
+import mimetypes
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+
+from app.config import settings
+from app.services.storage_backends import LocalBackend
+from app.services.storage_service import storage_service
+
+
+router = APIRouter(prefix="/storage", tags=["Storage"])
+
+
+def _local_backend() -> LocalBackend:
+    # Reads here are unauthenticated: only with local storage opted into
+    backend = storage_service.backend
+    if settings.storage_backend != "local" or backend is None or not backend.is_local:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return backend
+
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"])
+async def read_object(key: str) -> FileResponse:
+    """Public read of a locally stored object (404 unless ``storage_backend="local"``)."""
+    backend = _local_backend()
+    path = backend.path_for(key)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return FileResponse(
+        path,
+        media_type=mimetypes.guess_type(key)[0] or "application/octet-stream",
+    )
+
+
+@router.put("/{key:path}", status_code=status.HTTP_200_OK)
+async def write_object(key: str, expires: int, signature: str, request: Request) -> Response:
+    """
+    Client upload to a URL from ``LocalBackend.presigned_put_url``. The
+    body is streamed to a temp file and renamed into place once complete.
+    """
+    backend = _local_backend()
+    if not backend.verify_put(key, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature")
+
+    received = 0
+    with backend.writer(key) as file:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > settings.image_max_download_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Upload exceeds {settings.image_max_download_bytes} bytes",
+                )
+            file.write(chunk)
+    return Response(status_code=status.HTTP_200_OK)
@@ -0,0 +1,200 @@
+"""
+Neural Canvas Backend - Direct Upload Router
+Upload sessions: clients PUT files straight to storage through presigned
+URLs (multipart for large files), then confirm completion here. Upload
+bandwidth and memory never touch the API workers; the server only HEADs
+and header-probes the finished object before creating the asset.
+"""
+
+import asyncio
+import logging
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_async_db
+from app.models.user import User
+from app.schemas.asset import AssetCreate, AssetResponse
+from app.schemas.upload import (
+    UploadAbort,
+    UploadComplete,
+    UploadPart,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from app.crud.asset import create_asset, get_asset_by_storage_url
+from app.dependencies import get_current_active_user
+from app.routers.assets import index_asset, to_responses
+from app.services.image_processor import ImageRejectedError
+from app.services.image_probe import image_probe
+from app.services.storage_backends import StorageError
+from app.services.storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+UPLOAD_KEY = r"uploads/{user_id}/[0-9a-f]{{32}}/[A-Za-z0-9_-][A-Za-z0-9._-]*"
+
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+
+def upload_key(user_id: str, filename: str) -> str:
+    """Fresh object key for a user's upload (the filename is sanitized)."""
+    name = UNSAFE_FILENAME_CHARS.sub("_", filename).strip("._")[-100:] or "upload"
+    return f"uploads/{user_id}/{uuid.uuid4().hex}/{name}"
+
+
+def _check_key(object_key: str, user: User) -> None:
+    """Only keys shaped like ``upload_key`` output for this user are accepted."""
+    if not re.fullmatch(UPLOAD_KEY.format(user_id=re.escape(user.id)), object_key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    if storage_service.backend is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Storage unavailable",
+        )
+
+
+async def enqueue_renditions(asset_id: str, storage_url: str) -> None:
+    """Background task: queue the Celery rendition task (broker I/O off the loop)."""
+    from app.workers.tasks import generate_renditions
+
+    try:
+        await asyncio.to_thread(generate_renditions.delay, asset_id, storage_url)
+    except Exception as e:
+        logger.warning("Could not enqueue renditions for %s: %s", asset_id, e)
+
+
+@router.post("", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    session_in: UploadSessionCreate,
+    current_user: User = Depends(get_current_active_user),
+) -> UploadSessionResponse:
+    """
+    Presigned upload target for one file: a single PUT URL, or part URLs
+    of ``part_size`` bytes each for files above the multipart threshold.
+    """
+    if not session_in.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not an image: {session_in.content_type}",
+        )
+    if session_in.file_size > settings.image_max_download_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File exceeds {settings.image_max_download_bytes} bytes",
+        )
+
+    expiry = settings.upload_session_expiry
+    try:
+        upload = await storage_service.create_direct_upload_async(
+            upload_key(current_user.id, session_in.filename),
+            session_in.content_type,
+            session_in.file_size,
+            expiry,
+        )
+    except StorageError as e:
+        logger.error("Upload session failed: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Storage unavailable",
+        )
+
+    return UploadSessionResponse(
+        object_key=upload.object_key,
+        url=upload.url,
+        headers={"Content-Type": session_in.content_type} if upload.url else {},
+        upload_id=upload.upload_id,
+        part_size=upload.part_size,
+        parts=[
+            UploadPart(part_number=number, url=url)
+            for number, url in enumerate(upload.part_urls, start=1)
+        ],
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=expiry),
+    )
+
+
+@router.post("/complete", response_model=AssetResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload(
+    upload_in: UploadComplete,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+) -> AssetResponse:
+    """
+    Confirm an upload: assemble multipart parts, HEAD the object, probe
+    its header, then create the asset and queue its processing. Objects
+    that aren't acceptable images are deleted. Repeating the call for the
+    same object returns the existing asset.
+    """
+    _check_key(upload_in.object_key, current_user)
+    storage_url = storage_service.backend.url_for(upload_in.object_key)
+    existing = await get_asset_by_storage_url(db, storage_url, current_user.id)
+    if existing:
+        return (await to_responses([existing]))[0]
+
+    parts = [(part.part_number, part.etag) for part in upload_in.parts or []]
+    try:
+        info = await storage_service.complete_direct_upload_async(
+            upload_in.object_key, upload_in.upload_id, parts
+        )
+    except StorageError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Upload could not be completed: {e}",
+        )
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload not received",
+        )
+
+    try:
+        if info.size > settings.image_max_download_bytes:
+            raise ImageRejectedError(f"Image too large: {info.size} bytes")
+        probe = await image_probe.probe_object(upload_in.object_key)
+    except ImageRejectedError as e:
+        await storage_service.delete_object_async(upload_in.object_key)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except StorageError as e:
+        logger.warning("Header probe failed for %s: %s", upload_in.object_key, e)
+        await storage_service.delete_object_async(upload_in.object_key)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not read uploaded object",
+        )
+
+    asset_in = AssetCreate(
+        storage_url=storage_url,
+        original_filename=upload_in.original_filename,
+        x=upload_in.x,
+        y=upload_in.y,
+        scale=upload_in.scale,
+        rotation=upload_in.rotation,
+        tags=upload_in.tags,
+        caption=upload_in.caption,
+        **{"file_size": info.size, **probe.asset_fields()},
+    )
+    asset = await create_asset(db, asset_in, current_user.id)
+    background_tasks.add_task(index_asset, asset.id, current_user.id, storage_url)
+    if settings.upload_enqueue_renditions:
+        background_tasks.add_task(enqueue_renditions, asset.id, storage_url)
+    return (await to_responses([asset]))[0]
+
+
+@router.post("/abort", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    upload_in: UploadAbort,
+    current_user: User = Depends(get_current_active_user),
+) -> None:
+    """Cancel an upload and discard whatever was uploaded so far."""
+    _check_key(upload_in.object_key, current_user)
+    try:
+        await storage_service.abort_direct_upload_async(upload_in.object_key, upload_in.upload_id)
+    except StorageError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
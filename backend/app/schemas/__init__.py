@@ -5,14 +5,19 @@ Re-exports all schemas for convenient importing.
 
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserInDB
 from app.schemas.auth import Token, TokenPayload, LoginRequest, RefreshRequest
-from app.schemas.asset import AssetCreate, AssetUpdate, AssetResponse
+from app.schemas.asset import AssetCreate, AssetUpdate, AssetResponse, DuplicateGroup, PaletteColor
 from app.schemas.reel import ReelCreate, ReelUpdate, Reel
 from app.schemas.theme import ThemeCreate, ThemeUpdate, Theme
+from app.schemas.upload import (
+    UploadSessionCreate, UploadSessionResponse, UploadPart, UploadComplete, CompletedPart, UploadAbort,
+)
 
 __all__ = [
     "UserCreate", "UserUpdate", "UserResponse", "UserInDB",
     "Token", "TokenPayload", "LoginRequest", "RefreshRequest",
-    "AssetCreate", "AssetUpdate", "AssetResponse",
+    "AssetCreate", "AssetUpdate", "AssetResponse", "DuplicateGroup", "PaletteColor",
     "ReelCreate", "ReelUpdate", "Reel",
     "ThemeCreate", "ThemeUpdate", "Theme",
+    "UploadSessionCreate", "UploadSessionResponse", "UploadPart", "UploadComplete", "CompletedPart",
+    "UploadAbort",
 ]
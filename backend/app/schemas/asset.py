@@ -7,6 +7,12 @@ from datetime import datetime
 from pydantic import BaseModel, ConfigDict
 
 
+class PaletteColor(BaseModel):
+    """One dominant colour and its share of the image."""
+    hex: str
+    weight: float
+
+
 class AssetBase(BaseModel):
     """Shared asset properties."""
     width: int
@@ -26,6 +32,7 @@ class AssetCreate(AssetBase):
     original_filename: str | None = None
     mime_type: str | None = None
     file_size: int | None = None
+    captured_at: datetime | None = None
 
 
 class AssetUpdate(BaseModel):
@@ -51,5 +58,13 @@ class AssetResponse(AssetBase):
     original_filename: str | None = None
     mime_type: str | None = None
     file_size: int | None = None
+    phash: str | None = None
+    palette: list[PaletteColor] | None = None
+    captured_at: datetime | None = None
     created_at: datetime
     updated_at: datetime
+
+
+class DuplicateGroup(BaseModel):
+    """Assets whose perceptual hashes are within the requested radius."""
+    asset_ids: list[str]
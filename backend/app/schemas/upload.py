@@ -0,0 +1,59 @@
+"""
+Neural Canvas Backend - Upload Schemas
+Pydantic models for direct-to-bucket upload sessions.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class UploadSessionCreate(BaseModel):
+    """A file the client is about to upload."""
+    filename: str = Field(min_length=1, max_length=255)
+    content_type: str
+    file_size: int = Field(gt=0)
+
+
+class UploadPart(BaseModel):
+    """Presigned URL for one part of a multipart upload."""
+    part_number: int
+    url: str
+
+
+class UploadSessionResponse(BaseModel):
+    """
+    Where to upload: PUT the whole file to ``url`` (with the given
+    headers), or, for multipart, PUT each ``part_size`` chunk to its part
+    URL and report the returned ETags on completion.
+    """
+    object_key: str
+    url: str | None = None
+    headers: dict[str, str] = {}
+    upload_id: str | None = None
+    part_size: int | None = None
+    parts: list[UploadPart] = []
+    expires_at: datetime
+
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(ge=1)
+    etag: str
+
+
+class UploadComplete(BaseModel):
+    """Confirms an upload finished; canvas fields become the new asset's."""
+    object_key: str
+    upload_id: str | None = None
+    parts: list[CompletedPart] | None = None
+    original_filename: str | None = None
+    x: float = 0
+    y: float = 0
+    scale: float = 1
+    rotation: float = 0
+    tags: list[str] | None = None
+    caption: str | None = None
+
+
+class UploadAbort(BaseModel):
+    object_key: str
+    upload_id: str | None = None
@@ -0,0 +1,70 @@
+"""
+Neural Canvas Backend - Analysis Micro-Batcher
+Collects concurrent single-image analysis requests and sends them to
+Gemini as multi-image calls: a batch is flushed as soon as it is full, or
+once the oldest pending request has waited ``max_wait`` seconds.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional, Sequence
+
+from app.config import settings
+from app.services.image_processor import image_processor
+
+AnalyzeMany = Callable[[Sequence[bytes], Optional[str]], Awaitable[list[dict]]]
+
+
+class AnalysisBatcher:
+    """In-process micro-batcher; one pending queue per prompt."""
+
+    def __init__(self, analyze: AnalyzeMany, max_batch: int, max_wait: float):
+        self.analyze = analyze
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.flushes = 0
+        self._pending: dict[Optional[str], list[tuple[bytes, asyncio.Future]]] = {}
+        self._timers: dict[Optional[str], asyncio.TimerHandle] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, data: bytes, prompt: Optional[str] = None) -> dict:
+        """Queue source bytes for analysis and wait for this item's result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(prompt, [])
+        queue.append((data, future))
+        if len(queue) >= self.max_batch:
+            self._flush(prompt)
+        elif prompt not in self._timers:
+            self._timers[prompt] = loop.call_later(self.max_wait, self._flush, prompt)
+        return await future
+
+    def _flush(self, prompt: Optional[str]) -> None:
+        timer = self._timers.pop(prompt, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(prompt, [])
+        if batch:
+            self.flushes += 1
+            task = asyncio.ensure_future(self._run(batch, prompt))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list[tuple[bytes, asyncio.Future]], prompt: Optional[str]) -> None:
+        try:
+            results = await self.analyze([data for data, _ in batch], prompt)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# Singleton instance
+analysis_batcher = AnalysisBatcher(
+    image_processor.analyze_sources,
+    max_batch=settings.gemini_batch_size,
+    max_wait=settings.gemini_batch_max_wait,
+)
@@ -0,0 +1,157 @@
+"""
+Neural Canvas Backend - Gemini Analysis Cache
+Persists analysis results keyed by (image fingerprint, prompt, model) so
+re-uploads, duplicate photos and re-run batches skip the API call.
+Backends: in-process memory (default / tests) or Redis (shared across
+API workers and Celery processes).
+"""
+
+import hashlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCacheBackend(ABC):
+    """Storage for cached analysis results."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[dict]:
+        """Return a cached result, or None."""
+
+    @abstractmethod
+    async def set(self, key: str, value: dict) -> None:
+        """Store a result (subject to TTL and size eviction)."""
+
+
+class MemoryAnalysisBackend(AnalysisCacheBackend):
+    """Per-process LRU with TTL."""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisAnalysisBackend(AnalysisCacheBackend):
+    """
+    Redis-backed cache shared by all processes.
+    Entries expire via TTL; a sorted-set index of insertion times drops
+    expired members and trims the oldest live entries once
+    ``max_entries`` is exceeded.
+    """
+
+    INDEX_KEY = "analysis:index"
+
+    def __init__(self, url: str, ttl: int, max_entries: int):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self.redis.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: dict) -> None:
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, json.dumps(value), ex=self.ttl)
+            # Drop index members whose keys have already expired, so they
+            # don't count towards the cap and push out live entries
+            pipe.zremrangebyscore(self.INDEX_KEY, "-inf", now - self.ttl)
+            pipe.zadd(self.INDEX_KEY, {key: now})
+            pipe.zcard(self.INDEX_KEY)
+            *_, count = await pipe.execute()
+
+        excess = count - self.max_entries
+        if excess > 0:
+            oldest = await self.redis.zpopmin(self.INDEX_KEY, excess)
+            if oldest:
+                await self.redis.delete(*(member for member, _ in oldest))
+
+
+class AnalysisCache:
+    """
+    Front end over a backend: key derivation, counters, and failure
+    isolation (a broken cache never fails an analysis).
+    """
+
+    def __init__(self, backend: Optional[AnalysisCacheBackend]):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(data: bytes) -> str:
+        """Content hash of image bytes."""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def make_key(fingerprint: str, prompt: str, model: str) -> str:
+        """Key for (image fingerprint, prompt hash, model name)."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        return f"analysis:{model}:{prompt_hash}:{fingerprint}"
+
+    async def get(self, key: str) -> Optional[dict]:
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Analysis cache read failed: %s", e)
+            return None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(value)
+
+    async def set(self, key: str, value: dict) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            logger.warning("Analysis cache write failed: %s", e)
+
+
+def _build_backend() -> Optional[AnalysisCacheBackend]:
+    """Backend from settings: "memory", "redis" or "none"."""
+    kind = settings.analysis_cache_backend
+    ttl = settings.analysis_cache_ttl
+    max_entries = settings.analysis_cache_max_entries
+    if kind == "redis":
+        return RedisAnalysisBackend(settings.redis_url, ttl, max_entries)
+    if kind == "memory":
+        return MemoryAnalysisBackend(ttl, max_entries)
+    return None
+
+
+# Singleton instance
+analysis_cache = AnalysisCache(_build_backend())
@@ -0,0 +1,163 @@
+"""
+Neural Canvas Backend - Encode Buffer Pool
+Reusable output buffers for encoders. Encoded payloads are handed out as
+``memoryview``s over a pooled buffer, so uploads and cache writes read
+them in place: the only copy left is the one a consumer makes when it
+genuinely needs its own ``bytes`` (e.g. the Gemini SDK).
+"""
+
+import io
+import threading
+from collections import deque
+from typing import Optional, Union
+
+from app.config import settings
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class _EncodeStream(io.BytesIO):
+    """
+    BytesIO that tracks the furthest byte written, so a pooled stream can
+    be rewound and overwritten without ``truncate()`` (which frees the
+    allocation) and without exposing stale bytes from an earlier payload.
+    """
+
+    end = 0
+
+    def write(self, data) -> int:
+        written = super().write(data)
+        self.end = max(self.end, self.tell())
+        return written
+
+
+class ViewReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview (no copy up front)."""
+
+    def __init__(self, view: BytesLike):
+        super().__init__()
+        self._view = view if isinstance(view, memoryview) else memoryview(view)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+
+class PooledBuffer:
+    """
+    An encoded payload in a pooled stream. ``view`` is valid until
+    ``release()`` (or the end of a ``with`` block), after which the stream
+    goes back to the pool and is overwritten by the next encode.
+    """
+
+    def __init__(self, pool: "BufferPool", stream: _EncodeStream):
+        self._pool = pool
+        self._stream: Optional[_EncodeStream] = stream
+        self._base: Optional[memoryview] = None
+        self._view: Optional[memoryview] = None
+
+    @property
+    def stream(self) -> _EncodeStream:
+        if self._stream is None:
+            raise ValueError("Buffer already released")
+        return self._stream
+
+    @property
+    def view(self) -> memoryview:
+        if self._view is None:
+            self._base = self.stream.getbuffer()
+            self._view = self._base[:self.stream.end]
+        return self._view
+
+    def __len__(self) -> int:
+        return self.stream.end
+
+    def tobytes(self) -> bytes:
+        """An owned copy, for consumers that require ``bytes``."""
+        return bytes(self.view)
+
+    def reader(self) -> ViewReader:
+        """File object over the payload, e.g. for boto3 or ``Image.open``."""
+        return ViewReader(self.view)
+
+    def release(self) -> None:
+        if self._stream is None:
+            return
+        # Exported views pin the BytesIO; drop them before reuse (a view a
+        # consumer re-exported stays valid, and the pool then skips the stream)
+        if self._view is not None:
+            try:
+                self._view.release()
+                self._base.release()
+            except BufferError:
+                pass
+        self._view = self._base = None
+        self._pool._give_back(self._stream)
+        self._stream = None
+
+    def __enter__(self) -> "PooledBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class BufferPool:
+    """Thread-safe free list of encode streams, bounded in count and size."""
+
+    def __init__(self, max_buffers: int, max_buffer_bytes: int):
+        self.max_buffers = max_buffers
+        self.max_buffer_bytes = max_buffer_bytes
+        self.created = 0
+        self._free: deque[_EncodeStream] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PooledBuffer:
+        """A rewound stream to encode into (reused when one is free)."""
+        with self._lock:
+            stream = self._free.pop() if self._free else None
+        if stream is None:
+            stream = _EncodeStream()
+            self.created += 1
+        stream.seek(0)
+        stream.end = 0
+        return PooledBuffer(self, stream)
+
+    def _give_back(self, stream: _EncodeStream) -> None:
+        # Outsized one-offs (huge PNGs) aren't worth pinning in memory
+        if stream.end > self.max_buffer_bytes:
+            return
+        try:
+            stream.write(b"")  # Raises while a consumer still holds a view
+        except BufferError:
+            return
+        with self._lock:
+            if len(self._free) < self.max_buffers:
+                self._free.append(stream)
+
+
+# Singleton instance (per process)
+buffer_pool = BufferPool(
+    max_buffers=settings.buffer_pool_max_buffers,
+    max_buffer_bytes=settings.buffer_pool_max_buffer_bytes,
+)
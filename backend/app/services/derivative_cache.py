@@ -0,0 +1,191 @@
+"""
+Neural Canvas Backend - Derivative Cache
+Content-addressed on-disk cache for encoded derivatives (thumbnails,
+resizes, filtered versions). Keys combine the source content hash (or a
+stable source ID, e.g. an asset's), the operation, its parameters and the
+encoder version, so re-running the same
+operation on an unchanged asset is a file read instead of a
+decode/resample/encode cycle.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import PIL
+
+from app.config import settings
+from app.services.encoders import PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Bump when derivative output changes for the same inputs (e.g. a new
+# resampling path); encoder profile settings and the Pillow version are
+# folded in automatically
+ENCODER_REVISION = 2
+
+
+def encoder_version() -> str:
+    """Revision, Pillow version and a digest of the encoder profile table."""
+    profiles = hashlib.sha256(repr(sorted(PROFILES.items())).encode()).hexdigest()[:12]
+    return f"{ENCODER_REVISION}/pillow-{PIL.__version__}/profiles-{profiles}"
+
+
+ENCODER_VERSION = encoder_version()
+
+
+class DerivativeCache:
+    """
+    Size-capped LRU cache of derivative bytes on local disk.
+
+    Entries fan out as ``root/ab/cd/<key>`` and are written atomically
+    (temp file + rename), so concurrent workers sharing the directory never
+    see partial files. Recency is tracked in memory and persisted through
+    file mtimes, which seed the LRU order on startup.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index: OrderedDict[str, int] = OrderedDict()  # key -> size
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """SHA-256 of source bytes."""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def make_key(source_hash: str, operation: str, params: Optional[dict] = None) -> str:
+        """Cache key for (source, operation, params, encoder version)."""
+        payload = json.dumps(
+            [source_hash, operation, params or {}, ENCODER_VERSION],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    def _load_index(self) -> None:
+        """Seed the LRU order from files already on disk (oldest mtime first)."""
+        entries = []
+        if self.root.exists():
+            for path in self.root.glob("*/*/*"):
+                if path.name.startswith("."):
+                    continue  # In-flight temp file
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._size += size
+        self._loaded = True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached bytes, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        with self._lock:
+            if not self._loaded:
+                self._load_index()
+
+        # Read without the lock; only the index update is serialized
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                # Never cached, or evicted by another process
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._size -= size
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if key not in self._index:
+                self._index[key] = len(data)
+                self._size += len(data)
+            self._index.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store bytes atomically and evict least-recently-used entries."""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Derivative cache write failed: %s", e)
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            return
+
+        with self._lock:
+            if not self._loaded:
+                self._load_index()
+            self._size -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop oldest entries until under the size cap (lock held)."""
+        while self._size > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current footprint."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Singleton instance
+derivative_cache = DerivativeCache(
+    settings.derivative_cache_dir
+    or os.path.join(tempfile.gettempdir(), "neural_canvas", "derivatives"),
+    settings.derivative_cache_max_bytes,
+)
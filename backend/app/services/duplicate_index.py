@@ -0,0 +1,243 @@
+"""
+Neural Canvas Backend - Near-Duplicate Index
+Per-owner multi-index hash tables over 64-bit perceptual hashes.
+Hashes are split into ``radius + 1`` chunks; by the pigeonhole principle
+two hashes within Hamming distance ``radius`` share at least one chunk
+exactly, so only same-bucket candidates are compared (no pairwise scan).
+"""
+
+from collections import OrderedDict, defaultdict
+from typing import Hashable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from app.config import settings
+
+HASH_BITS = 64
+
+# Never use chunks wider than 16 bits
+MIN_CHUNKS = 4
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits."""
+    return (a ^ b).bit_count()
+
+
+def hash_to_hex(value: int) -> str:
+    """Fixed-width hex form stored on the asset."""
+    return f"{value:016x}"
+
+
+def hex_to_hash(value: str) -> int:
+    return int(value, 16)
+
+
+class MultiIndexHashTable:
+    """
+    Exact Hamming-radius search for up to ``chunks - 1`` differing bits.
+
+    ``hashes`` (id -> int) is the source of truth; NumPy arrays sorted by
+    each chunk are rebuilt lazily after changes, and candidate pairs are
+    generated by comparing sorted neighbours at increasing offsets, so
+    all work is vectorized.
+    """
+
+    def __init__(self, chunks: int):
+        self.chunks = chunks
+        # (shift, mask) per chunk; widths differ by at most one bit
+        self._slices = []
+        start = 0
+        for i in range(chunks):
+            width = HASH_BITS // chunks + (1 if i < HASH_BITS % chunks else 0)
+            self._slices.append((start, (1 << width) - 1))
+            start += width
+        self.hashes: dict[str, int] = {}
+        self._ids: list[str] = []
+        # Distinct hash values and the ids sharing each one: runs of
+        # identical hashes (blank or solid images) are searched only once
+        self._values = np.zeros(0, dtype=np.uint64)
+        self._members: list[list[int]] = []
+        self._sorted: list[tuple[np.ndarray, np.ndarray]] = []  # (order, keys)
+        self._groups: dict[int, list[list[str]]] = {}
+        self._dirty = False
+
+    @property
+    def max_radius(self) -> int:
+        return self.chunks - 1
+
+    def add(self, item_id: str, value: int) -> None:
+        self.hashes[item_id] = value
+        self._dirty = True
+
+    def remove(self, item_id: str) -> None:
+        if self.hashes.pop(item_id, None) is not None:
+            self._dirty = True
+
+    def _refresh(self) -> None:
+        if not self._dirty and len(self._ids) == len(self.hashes):
+            return
+        self._ids = list(self.hashes)
+        values = np.fromiter(self.hashes.values(), dtype=np.uint64, count=len(self._ids))
+        self._values, inverse = np.unique(values, return_inverse=True)
+        self._members = [[] for _ in range(len(self._values))]
+        for index, unique in enumerate(inverse.tolist()):
+            self._members[unique].append(index)
+        self._sorted = []
+        for shift, mask in self._slices:
+            keys = (self._values >> np.uint64(shift)) & np.uint64(mask)
+            order = np.argsort(keys, kind="stable")
+            self._sorted.append((order, keys[order]))
+        self._groups = {}
+        self._dirty = False
+
+    def _check_radius(self, radius: int) -> None:
+        if radius > self.max_radius:
+            raise ValueError(f"radius {radius} exceeds index limit {self.max_radius}")
+
+    def query(self, value: int, radius: int) -> list[tuple[str, int]]:
+        """Items within ``radius`` of ``value`` as (id, distance), nearest first."""
+        self._check_radius(radius)
+        self._refresh()
+        candidates = []
+        for (shift, mask), (order, keys) in zip(self._slices, self._sorted):
+            key = (value >> shift) & mask
+            lo, hi = np.searchsorted(keys, [key, key + 1])
+            candidates.append(order[lo:hi])
+        if not candidates:
+            return []
+        idx = np.unique(np.concatenate(candidates))
+        dist = np.bitwise_count(self._values[idx] ^ np.uint64(value))
+        keep = np.argsort(dist, kind="stable")
+        return [
+            (self._ids[member], int(d))
+            for i, d in zip(idx[keep], dist[keep])
+            if d <= radius
+            for member in self._members[i]
+        ]
+
+    def _value_pairs(self, radius: int) -> list[tuple[int, int, int]]:
+        """Pairs of distinct hash values within ``radius`` (indexes into ``_values``)."""
+        n = len(self._values)
+        found_a, found_b, found_d = [], [], []
+        for order, keys in self._sorted:
+            # Equal keys are adjacent; offset k pairs each value with the
+            # k-th next one in its run, until no run is longer than k
+            for k in range(1, n):
+                same = keys[:-k] == keys[k:]
+                if not same.any():
+                    break
+                a = order[:-k][same]
+                b = order[k:][same]
+                dist = np.bitwise_count(self._values[a] ^ self._values[b])
+                close = dist <= radius
+                found_a.append(np.minimum(a, b)[close])
+                found_b.append(np.maximum(a, b)[close])
+                found_d.append(dist[close])
+        if not found_a:
+            return []
+        pair_keys = np.concatenate(found_a).astype(np.int64) * n + np.concatenate(found_b)
+        pair_keys, first = np.unique(pair_keys, return_index=True)
+        dists = np.concatenate(found_d)[first]
+        return [(*divmod(int(key), n), int(dist)) for key, dist in zip(pair_keys, dists)]
+
+    def pairs(self, radius: int) -> Iterator[tuple[str, str, int]]:
+        """All unordered pairs within ``radius`` (each reported once)."""
+        self._check_radius(radius)
+        self._refresh()
+        for members in self._members:
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    yield self._ids[a], self._ids[b], 0
+        for value_a, value_b, dist in self._value_pairs(radius):
+            for a in self._members[value_a]:
+                for b in self._members[value_b]:
+                    first, second = min(a, b), max(a, b)
+                    yield self._ids[first], self._ids[second], dist
+
+    def groups(self, radius: int) -> list[list[str]]:
+        """Connected components of the within-``radius`` graph (size >= 2)."""
+        self._check_radius(radius)
+        self._refresh()
+        if radius in self._groups:
+            return self._groups[radius]
+
+        # Union distinct values only; identical hashes ride along
+        parent = list(range(len(self._values)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for value_a, value_b, _ in self._value_pairs(radius):
+            root_a, root_b = find(value_a), find(value_b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        members: dict[int, list[str]] = defaultdict(list)
+        for value, ids in enumerate(self._members):
+            members[find(value)].extend(self._ids[i] for i in ids)
+        groups = sorted(
+            (sorted(group) for group in members.values() if len(group) > 1),
+            key=lambda group: (-len(group), group[0]),
+        )
+        self._groups[radius] = groups
+        return groups
+
+
+class DuplicateIndex:
+    """
+    LRU registry of per-owner tables, one per chunk count. Tables are
+    built from the owner's stored hashes on first use and tagged with the
+    version of those hashes they were built from (see
+    ``crud.asset.get_hash_version``); a table whose version no longer
+    matches, e.g. changed by another process, is rebuilt.
+    """
+
+    def __init__(self, max_tables: int = 256):
+        self.max_tables = max_tables
+        # (owner, chunks) -> (version, table)
+        self._tables: OrderedDict[tuple[str, int], tuple[Hashable, MultiIndexHashTable]] = OrderedDict()
+
+    @staticmethod
+    def chunks_for(radius: int) -> int:
+        return max(MIN_CHUNKS, radius + 1)
+
+    def get(self, owner_id: str, radius: int, version: Hashable) -> Optional[MultiIndexHashTable]:
+        """Cached table for owner/radius, or None if missing or stale."""
+        key = (owner_id, self.chunks_for(radius))
+        entry = self._tables.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._tables.move_to_end(key)
+        return entry[1]
+
+    def build(
+        self, owner_id: str, radius: int, hashes: Iterable[tuple[str, str]], version: Hashable
+    ) -> MultiIndexHashTable:
+        """(Re)build from (asset_id, hex hash) rows read at ``version``."""
+        table = MultiIndexHashTable(self.chunks_for(radius))
+        for asset_id, value in hashes:
+            table.add(asset_id, hex_to_hash(value))
+        key = (owner_id, table.chunks)
+        self._tables[key] = (version, table)
+        self._tables.move_to_end(key)
+        while len(self._tables) > self.max_tables:
+            self._tables.popitem(last=False)
+        return table
+
+    def add(self, owner_id: str, asset_id: str, value: int) -> None:
+        for (owner, _), (_, table) in self._tables.items():
+            if owner == owner_id:
+                table.add(asset_id, value)
+
+    def remove(self, owner_id: str, asset_id: str) -> None:
+        for (owner, _), (_, table) in self._tables.items():
+            if owner == owner_id:
+                table.remove(asset_id)
+
+
+# Singleton instance
+duplicate_index = DuplicateIndex(settings.duplicate_index_max_tables)
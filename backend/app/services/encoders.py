@@ -0,0 +1,113 @@
+"""
+Neural Canvas Backend - Encoder Profiles
+Output formats (JPEG, WebP, AVIF where Pillow supports it) and named
+speed/size tiers, plus ``Accept`` header negotiation for derivative
+endpoints.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from PIL import features
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "AVIF": "image/avif",
+}
+
+# Most compact first; negotiation picks the first one the client accepts
+PREFERENCE = ("AVIF", "WEBP", "JPEG")
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """Quality and encoder effort per format for one speed/size tier."""
+    name: str
+    jpeg_quality: int
+    progressive: bool
+    optimize: bool
+    webp_quality: int
+    webp_method: int  # 0 (fastest) - 6 (smallest)
+    avif_quality: int
+    avif_speed: int  # 0 (smallest) - 10 (fastest)
+
+
+PROFILES: dict[str, EncoderProfile] = {
+    # Interactive previews: cheapest encode that still looks right
+    "fast": EncoderProfile("fast", 78, False, False, 75, 0, 50, 10),
+    # Default for on-demand derivatives
+    "balanced": EncoderProfile("balanced", 82, True, False, 80, 4, 60, 8),
+    # Stored renditions: encoded once, served many times
+    "archive": EncoderProfile("archive", 85, True, True, 82, 6, 65, 4),
+}
+
+
+@lru_cache(maxsize=1)
+def supported_formats() -> tuple[str, ...]:
+    """Output formats this Pillow build can encode, in preference order."""
+    available = {"JPEG": True, "WEBP": features.check("webp"), "AVIF": features.check("avif")}
+    return tuple(fmt for fmt in PREFERENCE if available[fmt])
+
+
+def normalize_format(format: str) -> str:
+    """
+    Canonical Pillow format name; raises ValueError for a negotiable
+    format this build can't encode. Other Pillow formats pass through.
+    """
+    fmt = format.upper()
+    if fmt == "JPG":
+        fmt = "JPEG"
+    if fmt in MIME_TYPES and fmt not in supported_formats():
+        raise ValueError(f"Unsupported output format: {format}")
+    return fmt
+
+
+def get_profile(name: str) -> EncoderProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown encoder profile: {name}") from None
+
+
+def save_options(format: str, quality: Optional[int], profile: Optional[str]) -> dict:
+    """
+    ``Image.save`` keyword arguments. Without a profile only ``quality``
+    is set; an explicit ``quality`` overrides the profile's.
+    """
+    if profile is None:
+        return {"quality": quality if quality is not None else 85}
+    tier = get_profile(profile)
+    if format == "WEBP":
+        return {"quality": quality or tier.webp_quality, "method": tier.webp_method}
+    if format == "AVIF":
+        return {"quality": quality or tier.avif_quality, "speed": tier.avif_speed}
+    return {
+        "quality": quality or tier.jpeg_quality,
+        "progressive": tier.progressive,
+        "optimize": tier.optimize,
+    }
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Best supported format the ``Accept`` header allows (JPEG fallback)."""
+    if not accept:
+        return "JPEG"
+    accepted = set()
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(media_type.strip().lower())
+    for fmt in supported_formats():
+        if MIME_TYPES[fmt] in accepted:
+            return fmt
+    return "JPEG"
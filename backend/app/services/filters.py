@@ -0,0 +1,195 @@
+"""
+Neural Canvas Backend - Filter Engine
+Colour filters as precomputed lookup tables and colour matrices,
+applied in a single Pillow pass (no per-pixel Python callbacks).
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Sequence, Union
+from PIL import Image, ImageFilter
+
+# ITU-R 601-2 luma weights, same as Image.convert("L")
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+IDENTITY_LUT: tuple[int, ...] = tuple(range(256))
+
+
+@dataclass(frozen=True)
+class PointOp:
+    """Per-channel 256-entry lookup tables for R, G and B."""
+    luts: tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]]
+
+    @classmethod
+    def uniform(cls, lut: tuple[int, ...]) -> "PointOp":
+        """Same table on every channel."""
+        return cls((lut, lut, lut))
+
+
+@dataclass(frozen=True)
+class MatrixOp:
+    """
+    Rank-1 colour matrix: each output channel is a gain times the same
+    weighted sum of the input channels, clipped to 0-255.
+    """
+    weights: tuple[float, float, float]
+    gains: tuple[float, float, float]
+
+    @property
+    def matrix(self) -> tuple[float, ...]:
+        """12-tuple for ``Image.convert("RGB", matrix)``."""
+        return tuple(
+            value
+            for gain in self.gains
+            for value in (*(gain * w for w in self.weights), 0.0)
+        )
+
+
+@dataclass(frozen=True)
+class SpatialOp:
+    """Neighbourhood filter; cannot be expressed per pixel."""
+    kernel: ImageFilter.Filter
+
+
+@dataclass(frozen=True)
+class ProjectionOp:
+    """
+    Fused colour run containing at least one rank-1 matrix.
+    Input channels go through ``pre`` tables, are projected to a single
+    weighted gray value, and every later step is folded into ``post``
+    tables indexed by that gray value (one per output channel).
+    """
+    pre: tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]]
+    weights: tuple[float, float, float]
+    post: tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]]
+
+
+FilterOp = Union[PointOp, MatrixOp, SpatialOp, ProjectionOp]
+
+
+def scale_lut(factor: float) -> tuple[int, ...]:
+    """Multiply-and-clip table (matches ImageEnhance.Brightness)."""
+    return tuple(min(255, int(i * factor)) for i in range(256))
+
+
+FILTERS: dict[str, FilterOp] = {
+    "grayscale": MatrixOp(LUMA_WEIGHTS, (1.0, 1.0, 1.0)),
+    "sepia": MatrixOp(LUMA_WEIGHTS, (1.07, 0.74, 0.43)),
+    "brighten": PointOp.uniform(scale_lut(1.3)),
+    "darken": PointOp.uniform(scale_lut(0.7)),
+    "sharpen": SpatialOp(ImageFilter.SHARPEN),
+    "blur": SpatialOp(ImageFilter.GaussianBlur(radius=2)),
+}
+
+
+def _compose_luts(first, second):
+    """Per-channel table composition: ``second[c][first[c][i]]``."""
+    return tuple(
+        tuple(outer[value] for value in inner) for inner, outer in zip(first, second)
+    )
+
+
+def _fuse_run(ops: Sequence[FilterOp]) -> FilterOp:
+    """Fold a run of PointOps and MatrixOps into one op."""
+    luts = (IDENTITY_LUT, IDENTITY_LUT, IDENTITY_LUT)
+    weights = None
+    post = None
+    for op in ops:
+        if isinstance(op, PointOp):
+            if weights is None:
+                luts = _compose_luts(luts, op.luts)
+            else:
+                post = _compose_luts(post, op.luts)
+        elif weights is None:
+            # First projection: output depends on the gray value only
+            weights = op.weights
+            post = tuple(
+                tuple(min(255, int(gain * gray + 0.5)) for gray in range(256))
+                for gain in op.gains
+            )
+        else:
+            # Later projections re-mix the current outputs, still per gray value
+            mixed = [
+                sum(w * channel[gray] for w, channel in zip(op.weights, post))
+                for gray in range(256)
+            ]
+            post = tuple(
+                tuple(min(255, int(gain * value + 0.5)) for value in mixed)
+                for gain in op.gains
+            )
+
+    if weights is None:
+        return PointOp(luts)
+    return ProjectionOp(luts, weights, post)
+
+
+def fuse(ops: Sequence[FilterOp]) -> list[FilterOp]:
+    """
+    Compile a filter chain into as few pixel passes as possible.
+    Consecutive colour ops are folded symbolically; spatial ops are
+    pass boundaries and run as-is.
+    """
+    passes: list[FilterOp] = []
+    run: list[FilterOp] = []
+    for op in ops:
+        if isinstance(op, SpatialOp):
+            if run:
+                passes.append(run[0] if len(run) == 1 else _fuse_run(run))
+                run = []
+            passes.append(op)
+        else:
+            run.append(op)
+    if run:
+        passes.append(run[0] if len(run) == 1 else _fuse_run(run))
+    return passes
+
+
+def margin(op: FilterOp) -> int:
+    """Rows of neighbouring context a pass reads beyond each output row."""
+    if not isinstance(op, SpatialOp):
+        return 0
+    kernel = op.kernel
+    if isinstance(kernel, ImageFilter.GaussianBlur):
+        radius = kernel.radius
+        if isinstance(radius, (tuple, list)):
+            radius = max(radius)
+        # Extended box blurs reach about 3 sigma
+        return math.ceil(radius * 3) + 1
+    filterargs = getattr(kernel, "filterargs", None)
+    if filterargs:
+        return max(filterargs[0]) // 2
+    return 8
+
+
+def apply_op(image: Image.Image, op: FilterOp) -> Image.Image:
+    """Apply a single filter op in one pass."""
+    if isinstance(op, SpatialOp):
+        # Kernels can't run on palette indices
+        if image.mode in ("P", "1"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        return image.filter(op.kernel)
+
+    if isinstance(op, ProjectionOp):
+        if op.pre != (IDENTITY_LUT, IDENTITY_LUT, IDENTITY_LUT):
+            image = apply_op(image, PointOp(op.pre))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        gray = image.convert("L", (*op.weights, 0.0))
+        # Gray -> RGB through a 256-colour palette built from the post tables
+        gray.putpalette(bytes(v for rgb in zip(*op.post) for v in rgb))
+        return gray.convert("RGB")
+
+    if isinstance(op, PointOp):
+        red, green, blue = op.luts
+        if image.mode == "L" and red == green == blue:
+            return image.point(red)
+        if image.mode == "RGBA":
+            return image.point(red + green + blue + IDENTITY_LUT)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image.point(red + green + blue)
+
+    # MatrixOp: alpha is dropped, as with convert("L").convert("RGB")
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.convert("RGB", op.matrix)
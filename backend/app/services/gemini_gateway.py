@@ -0,0 +1,229 @@
+"""
+Neural Canvas Backend - Gemini Gateway
+Rate-aware front door for Gemini calls:
+- Token buckets for requests/minute and tokens/minute (in-process, or
+  Redis-backed so every API worker and Celery process shares the quota)
+- Bounded in-flight concurrency with AIMD: halve on 429/503, grow back
+  by ~1 slot per window of successful calls
+- Retries honour Retry-After / RetryInfo, otherwise jittered exponential
+  backoff, and pause all callers in the process until the window passes
+"""
+
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Awaitable, Callable, Optional, TypeVar, Union
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Status codes that mean "slow down" rather than "this request is bad"
+THROTTLE_STATUSES = (429, 503)
+
+# Rough per-image cost for a <=1024px JPEG (Gemini bills 258 tokens per tile)
+IMAGE_TOKEN_ESTIMATE = 1032
+OUTPUT_TOKEN_ESTIMATE = 256
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def estimate_tokens(prompt: str, images: int = 1) -> int:
+    """Approximate request cost for the tokens/minute bucket."""
+    return len(prompt) // 4 + images * IMAGE_TOKEN_ESTIMATE + OUTPUT_TOKEN_ESTIMATE
+
+
+class TokenBucket:
+    """In-process token bucket refilled continuously at ``per_minute / 60`` per second."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: int = 1) -> None:
+        amount = min(float(amount), self.capacity)
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+# Atomic refill-and-take; returns seconds to wait (0 = granted)
+_REDIS_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = math.min(tonumber(ARGV[3]), capacity)
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) * 2)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket:
+    """Token bucket shared across processes through a Redis hash."""
+
+    def __init__(self, redis_client, key: str, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.key = key
+        self._script = redis_client.register_script(_REDIS_BUCKET_SCRIPT)
+
+    async def acquire(self, amount: int = 1) -> None:
+        while True:
+            wait = float(await self._script(keys=[self.key], args=[self.capacity, self.rate, amount]))
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    """HTTP status from a google-genai APIError (``code``) or httpx error."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-suggested delay from a Retry-After header or RetryInfo detail."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(getattr(error, "details", "")))
+    return float(match.group(1)) if match else None
+
+
+class GeminiGateway:
+    """Throttles, bounds and retries Gemini calls for one process."""
+
+    def __init__(
+        self,
+        requests: Union[TokenBucket, "RedisTokenBucket"],
+        tokens: Union[TokenBucket, "RedisTokenBucket"],
+        max_in_flight: int,
+        max_retries: int = 5,
+    ):
+        self.requests = requests
+        self.tokens = tokens
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self.throttled = 0
+        self._resume_at = 0.0
+        self._slots = asyncio.Condition()
+
+    async def _acquire_slot(self) -> None:
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < max(1, int(self.limit)))
+            self.in_flight += 1
+
+    async def _release_slot(self) -> None:
+        async with self._slots:
+            self.in_flight -= 1
+            self._slots.notify_all()
+
+    def _on_success(self) -> None:
+        # Additive increase: about +1 slot per `limit` successes
+        self.limit = min(float(self.max_in_flight), self.limit + 1.0 / self.limit)
+
+    def _on_throttle(self, delay: float) -> None:
+        # Multiplicative decrease once per congestion window: calls already
+        # in flight when the burst hit don't halve the limit again
+        self.throttled += 1
+        now = time.monotonic()
+        if now >= self._resume_at:
+            self.limit = max(1.0, self.limit / 2)
+        # Hold everyone back for the window
+        self._resume_at = max(self._resume_at, now + delay)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Run ``fn`` within quota, retrying throttled attempts with backoff."""
+        attempt = 0
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.requests.acquire(1)
+            if tokens:
+                await self.tokens.acquire(tokens)
+
+            await self._acquire_slot()
+            try:
+                result = await fn()
+            except Exception as e:
+                if _status_of(e) not in THROTTLE_STATUSES or attempt >= self.max_retries:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                self._on_throttle(delay)
+                logger.warning(
+                    "Gemini throttled (%s), retry %d in %.1fs, in-flight limit %d",
+                    _status_of(e), attempt + 1, delay, int(self.limit),
+                )
+                attempt += 1
+                continue
+            finally:
+                await self._release_slot()
+
+            self._on_success()
+            return result
+
+
+def _build_gateway() -> GeminiGateway:
+    """Gateway from settings; Redis buckets when GEMINI_RATE_BACKEND=redis."""
+    rpm = settings.gemini_requests_per_minute
+    tpm = settings.gemini_tokens_per_minute
+    if settings.gemini_rate_backend == "redis":
+        import redis.asyncio as redis
+
+        client = redis.from_url(settings.redis_url)
+        requests = RedisTokenBucket(client, "gemini:bucket:requests", rpm)
+        tokens = RedisTokenBucket(client, "gemini:bucket:tokens", tpm)
+    else:
+        requests = TokenBucket(rpm)
+        tokens = TokenBucket(tpm)
+    return GeminiGateway(
+        requests,
+        tokens,
+        max_in_flight=settings.gemini_max_in_flight,
+        max_retries=settings.gemini_max_retries,
+    )
+
+
+# Singleton instance
+gemini_gateway = _build_gateway()
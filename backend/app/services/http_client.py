@@ -0,0 +1,52 @@
+"""
+Neural Canvas Backend - Shared HTTP Client
+One pooled, keep-alive httpx client per process, so image downloads
+reuse TCP/TLS connections (HTTP/2 multiplexed) instead of handshaking
+per request. Opened in the FastAPI lifespan and per Celery worker process.
+Redirects are not followed: callers vet the URL they fetch (e.g. with
+``storage_service.owns_url``), and a 3xx must not send a server-side
+fetch to a host that was never checked.
+"""
+
+import logging
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=settings.http_http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.http_timeout,
+                connect=settings.http_connect_timeout,
+            ),
+        )
+        logger.info(
+            "HTTP client initialized (http2=%s, max_connections=%d)",
+            settings.http_http2,
+            settings.http_max_connections,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the process-wide client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
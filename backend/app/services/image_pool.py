@@ -0,0 +1,131 @@
+"""
+Neural Canvas Backend - Image Worker Pool
+Process pool for CPU-bound Pillow work called from async code.
+Pixel and encoded buffers cross the process boundary through
+shared memory; only small descriptors are pickled.
+"""
+
+import io
+from multiprocessing import shared_memory
+from PIL import Image
+
+# Descriptors passed between processes:
+#   bytes:  (shm_name, length)
+#   pixels: (shm_name, length, mode, (width, height))
+BytesRef = tuple[str, int]
+PixelRef = tuple[str, int, str, tuple[int, int]]
+
+
+# === SHARED MEMORY HELPERS ===
+
+def share_bytes(data: bytes | memoryview) -> tuple[shared_memory.SharedMemory, BytesRef]:
+    """Copy bytes into a new shared memory block."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[: len(data)] = data
+    return shm, (shm.name, len(data))
+
+
+def share_image(image: Image.Image) -> tuple[shared_memory.SharedMemory, PixelRef]:
+    """Copy decoded pixels into a new shared memory block."""
+    if image.mode == "P":
+        # Palette would be lost in the raw buffer
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    shm, (name, length) = share_bytes(image.tobytes())
+    return shm, (name, length, image.mode, image.size)
+
+
+def take_bytes(ref: BytesRef) -> bytes:
+    """Read and release a shared bytes block created by the other side."""
+    name, length = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:length])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def take_image(ref: PixelRef) -> Image.Image:
+    """Rebuild an image from, then release, a shared pixel block."""
+    name, length, mode, size = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return Image.frombytes(mode, size, shm.buf[:length])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _read_image(ref: PixelRef) -> Image.Image:
+    """Rebuild an image from a shared pixel block owned by the caller."""
+    name, length, mode, size = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return Image.frombytes(mode, size, shm.buf[:length])
+    finally:
+        shm.close()
+
+
+def _read_bytes(ref: BytesRef) -> bytes:
+    """Read a shared bytes block owned by the caller."""
+    name, length = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:length])
+    finally:
+        shm.close()
+
+
+def _return_image(image: Image.Image) -> PixelRef:
+    """Hand a result image back; the caller unlinks the block."""
+    shm, ref = share_image(image)
+    shm.close()
+    return ref
+
+
+def _return_bytes(data: bytes | memoryview) -> BytesRef:
+    """Hand result bytes back; the caller unlinks the block."""
+    shm, ref = share_bytes(data)
+    shm.close()
+    return ref
+
+
+# === WORKER ENTRY POINTS (run inside pool processes) ===
+
+def _processor():
+    # Imported lazily so spawned workers only load it once, on first task
+    from app.services.image_processor import image_processor
+    return image_processor
+
+
+def decode_worker(ref: BytesRef) -> PixelRef:
+    """Decode encoded image bytes into raw pixels."""
+    image = Image.open(io.BytesIO(_read_bytes(ref)))
+    image.load()
+    return _return_image(image)
+
+
+def filter_worker(ref: PixelRef, filter_types: list[str]) -> PixelRef:
+    """Apply a (fused) stack of named filters."""
+    return _return_image(_processor().apply_filters(_read_image(ref), filter_types))
+
+
+def resize_worker(
+    ref: PixelRef, max_width: int, max_height: int, quality: int
+) -> BytesRef:
+    """Resize and encode to JPEG."""
+    return _return_bytes(
+        _processor().resize_image(_read_image(ref), max_width, max_height, quality)
+    )
+
+
+def encode_worker(ref: PixelRef, format: str, quality: int) -> BytesRef:
+    """Encode raw pixels (straight from the pooled encode buffer into shared memory)."""
+    with _processor().encode_buffer(_read_image(ref), format, quality) as encoded:
+        return _return_bytes(encoded.view)
+
+
+
+def derive_worker(ref: BytesRef, operation: str, params: dict) -> BytesRef:
+    """Render an encoded derivative from source bytes."""
+    return _return_bytes(_processor().render_derivative(_read_bytes(ref), operation, params))
@@ -0,0 +1,208 @@
+"""
+Neural Canvas Backend - Image Probe
+Header-only metadata for stored images: a ranged GET of the first few KB
+is parsed by Pillow without decoding pixels, giving format, dimensions,
+EXIF orientation and capture time. Oversized images (decompression
+bombs) are rejected before anything downloads them in full.
+"""
+
+import asyncio
+import io
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Sequence
+
+from PIL import Image, UnidentifiedImageError
+
+from app.config import settings
+from app.services.http_client import get_http_client
+from app.services.image_processor import ImageRejectedError
+from app.services.storage_service import storage_service
+
+# EXIF tags (IFD0 / Exif sub-IFD)
+EXIF_IFD = 0x8769
+ORIENTATION = 0x0112
+DATETIME = 0x0132
+DATETIME_ORIGINAL = 0x9003
+
+# Orientations that rotate by 90 degrees (displayed width/height swap)
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+CONTENT_RANGE = re.compile(r"bytes \d+-\d+/(\d+)")
+
+# Enough for every format signature Pillow sniffs
+SIGNATURE_BYTES = 16
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    """Metadata read from an image header. Width/height are as displayed."""
+    format: str
+    mime_type: str
+    width: int
+    height: int
+    orientation: int = 1
+    captured_at: Optional[datetime] = None
+    file_size: Optional[int] = None
+
+    def asset_fields(self) -> dict:
+        """Server-verified values for ``AssetCreate``/``Asset`` columns."""
+        fields = {"width": self.width, "height": self.height, "mime_type": self.mime_type}
+        if self.file_size is not None:
+            fields["file_size"] = self.file_size
+        if self.captured_at is not None:
+            fields["captured_at"] = self.captured_at
+        return fields
+
+
+def _has_signature(data: bytes) -> bool:
+    """True if any Pillow format plugin recognizes the leading bytes."""
+    Image.init()
+    return any(
+        accept is not None and accept(data[:SIGNATURE_BYTES])
+        for _, accept in Image.OPEN.values()
+    )
+
+
+def _parse_exif_datetime(value) -> Optional[datetime]:
+    try:
+        return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def probe_bytes(
+    data: bytes, file_size: Optional[int] = None, max_pixels: Optional[int] = None
+) -> Optional[ProbeResult]:
+    """
+    Parse an image header from a (possibly truncated) prefix.
+    Returns None if the prefix ends before the header does; raises
+    ImageRejectedError for non-images and images over ``max_pixels``.
+    """
+    max_pixels = max_pixels or settings.image_max_pixels
+    if len(data) >= SIGNATURE_BYTES and not _has_signature(data):
+        raise ImageRejectedError("Not an image")
+    try:
+        image = Image.open(io.BytesIO(data))  # Lazy: reads the header only
+    except Image.DecompressionBombError as e:
+        raise ImageRejectedError(str(e)) from None
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError, EOFError):
+        if file_size is not None and len(data) >= file_size:
+            raise ImageRejectedError("Not an image") from None
+        return None  # Known signature, header cut off: read more
+
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageRejectedError(f"Image too large: {width}x{height}")
+
+    try:
+        exif = image.getexif()
+    except Exception:
+        exif = Image.Exif()
+    orientation = exif.get(ORIENTATION, 1)
+    if not isinstance(orientation, int) or not 1 <= orientation <= 8:
+        orientation = 1
+    captured = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    return ProbeResult(
+        format=image.format,
+        mime_type=Image.MIME.get(image.format, "application/octet-stream"),
+        width=width,
+        height=height,
+        orientation=orientation,
+        captured_at=_parse_exif_datetime(captured) if captured else None,
+        file_size=file_size,
+    )
+
+
+class ImageProbe:
+    """Ranged-GET probing of stored images (shared pooled HTTP client)."""
+
+    async def _read_object_prefix(self, object_key: str, length: int) -> tuple[bytes, Optional[int]]:
+        """First ``length`` bytes of a stored object (through the backend) and its size."""
+        info = await storage_service.head_object_async(object_key)
+        if info is None:
+            raise ImageRejectedError("Object not found")
+        if info.size == 0:
+            raise ImageRejectedError("Empty object")
+        return await storage_service.read_object_async(object_key, 0, length), info.size
+
+    async def _read_prefix(self, url: str, length: int) -> tuple[bytes, Optional[int]]:
+        """First ``length`` bytes of ``url`` and the full object size, if known."""
+        object_key = storage_service.local_key(url)
+        if object_key is not None:
+            return await self._read_object_prefix(object_key, length)
+
+        headers = {"Range": f"bytes=0-{length - 1}"}
+        async with get_http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 416:  # Empty object
+                raise ImageRejectedError("Empty object")
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if content_type and not content_type.startswith(("image/", "application/octet-stream")):
+                raise ImageRejectedError(f"Not an image: {content_type}")
+
+            total = None
+            match = CONTENT_RANGE.match(response.headers.get("content-range", ""))
+            if response.status_code == 206 and match:
+                total = int(match.group(1))
+            elif response.status_code == 200 and response.headers.get("content-length"):
+                total = int(response.headers["content-length"])
+
+            # Servers that ignore Range send the whole body: stop reading early
+            chunks, received = [], 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                received += len(chunk)
+                if received >= length:
+                    break
+            data = b"".join(chunks)[:length]
+            if total is None and received < length:
+                total = len(data)
+            return data, total
+
+    async def probe(self, url: str) -> ProbeResult:
+        """
+        Header metadata for the image at ``url``. Reads
+        ``image_probe_bytes`` first and doubles the range (up to
+        ``image_probe_max_bytes``) for headers behind large EXIF/ICC blocks.
+        """
+        return await self._probe(lambda length: self._read_prefix(url, length))
+
+    async def probe_object(self, object_key: str) -> ProbeResult:
+        """
+        ``probe`` for an object in our storage, read through the backend
+        (works for private buckets, which have no fetchable public URL).
+        Raises StorageError if the backend can't be read.
+        """
+        return await self._probe(lambda length: self._read_object_prefix(object_key, length))
+
+    async def _probe(self, read_prefix) -> ProbeResult:
+        length = settings.image_probe_bytes
+        while True:
+            data, total = await read_prefix(length)
+            result = probe_bytes(data, total)
+            if result is not None:
+                return result
+            if length >= settings.image_probe_max_bytes or (total is not None and len(data) >= total):
+                raise ImageRejectedError("No image header found")
+            length = min(length * 2, settings.image_probe_max_bytes)
+
+    async def probe_many(
+        self, urls: Sequence[str], concurrency: Optional[int] = None
+    ) -> list[ProbeResult | Exception]:
+        """Probe ``urls`` concurrently; failures are returned in place."""
+        semaphore = asyncio.Semaphore(concurrency or settings.image_probe_concurrency)
+
+        async def bounded(url: str) -> ProbeResult:
+            async with semaphore:
+                return await self.probe(url)
+
+        return await asyncio.gather(*(bounded(url) for url in urls), return_exceptions=True)
+
+
+# Singleton instance
+image_probe = ImageProbe()
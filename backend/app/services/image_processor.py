@@ -7,11 +7,23 @@ Industry Best Practice: Server processes, Client previews.
 
 import os
 import io
-import base64
-from typing import Optional
-from PIL import Image
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Sequence, Union
+from PIL import Image, UnidentifiedImageError
 import httpx
 
+from app.config import settings
+from app.services import encoders, filters, image_pool, palette, smart_crop, tiling
+from app.services.buffer_pool import BytesLike, PooledBuffer, ViewReader, buffer_pool
+from app.services.http_client import get_http_client
+from app.services.storage_service import storage_service
+from app.services.derivative_cache import derivative_cache
+from app.services.analysis_cache import analysis_cache
+from app.services.gemini_gateway import gemini_gateway, estimate_tokens
+
 # Google GenAI SDK (current SDK as of 2025, replaces deprecated google-generativeai)
 # Per Context7 docs: pip install google-genai && from google import genai
 from google import genai
@@ -21,6 +33,81 @@ from google.genai import types
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_CLIENT = genai.Client() if GEMINI_API_KEY else None
 
+# Draft decodes land at or just above the target size; reduce() then shrinks
+# by integer factors until within this gap before the final LANCZOS pass.
+DRAFT_REDUCING_GAP = 2.0
+
+# dHash grid: 8x8 comparisons -> 64-bit hash
+DHASH_SIZE = 8
+
+# Default prompt for comprehensive analysis
+DEFAULT_ANALYSIS_PROMPT = """
+        Analyze this image and return a JSON object with:
+        {
+            "tags": ["tag1", "tag2", ...],  // 5-10 descriptive tags
+            "caption": "A descriptive caption",
+            "mood": "The overall mood/feeling",
+            "colors": ["#hex1", "#hex2", ...]  // Dominant colors
+        }
+        Return ONLY valid JSON, no markdown.
+        """
+
+# Analysis inputs step down through these qualities to meet the byte budget
+ANALYSIS_QUALITY_STEPS = (90, 80, 70, 60, 50)
+
+# Multi-image variant: one result per labelled image, shaped by the schema below
+BATCH_ANALYSIS_PROMPT = """
+        You are given {count} images. Each image is preceded by its label
+        "Image <index>". Analyze every image independently and return one
+        entry per image with:
+        - index: the image's label number
+        - tags: 5-10 descriptive tags
+        - caption: a descriptive caption
+        - mood: the overall mood/feeling
+        - colors: dominant colors as hex strings
+        """
+
+BATCH_ANALYSIS_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "index": types.Schema(type=types.Type.INTEGER),
+            "tags": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+            "caption": types.Schema(type=types.Type.STRING),
+            "mood": types.Schema(type=types.Type.STRING),
+            "colors": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+        },
+        required=["index", "tags", "caption", "mood", "colors"],
+    ),
+)
+
+# Streaming downloads give up if no image signature is recognised by then;
+# a recognised format keeps sniffing (e.g. JPEGs with large APPn segments)
+HEADER_SNIFF_BYTES = 1024 * 1024
+
+
+class ImageRejectedError(ValueError):
+    """Download refused: not an image, or over the byte/pixel budget."""
+
+
+@dataclass(frozen=True)
+class RenditionSpec:
+    """A named JPEG derivative fitted inside a bounding box."""
+    name: str
+    max_width: int
+    max_height: int
+    quality: int = 85
+
+
+# Standard derivatives produced for every upload
+DEFAULT_RENDITIONS: tuple[RenditionSpec, ...] = (
+    RenditionSpec("display", 1920, 1080, quality=85),
+    RenditionSpec("grid", 960, 960, quality=80),
+    RenditionSpec("analysis", 1024, 1024, quality=90),
+    RenditionSpec("thumbnail", 300, 300, quality=75),
+)
+
 
 class ImageProcessor:
     """
@@ -31,137 +118,946 @@ class ImageProcessor:
     def __init__(self):
         self.client = GEMINI_CLIENT
         self.model_name = "gemini-2.0-flash"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.cache = derivative_cache
+        self.analysis_cache = analysis_cache
+        self.gateway = gemini_gateway
+
+    # === PROCESS POOL ===
+
+    def start_pool(self, max_workers: int = 0) -> None:
+        """
+        Start the worker pool for CPU-bound work (0 = one worker per CPU).
+        Uses spawn so workers never inherit the event loop or open sockets.
+        """
+        if self._pool is not None:
+            return
+        workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def shutdown_pool(self) -> None:
+        """Stop the worker pool, waiting for in-flight work."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def _run_pooled(self, func, shm, *args):
+        """Run a worker on a shared block, releasing the block afterwards."""
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, func, *args)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def decode_async(self, data: bytes) -> Image.Image:
+        """Decode image bytes off the event loop."""
+        if self._pool is None:
+            def decode() -> Image.Image:
+                image = Image.open(io.BytesIO(data))
+                image.load()
+                return image
+            return await asyncio.to_thread(decode)
+
+        shm, ref = image_pool.share_bytes(data)
+        result = await self._run_pooled(image_pool.decode_worker, shm, ref)
+        return image_pool.take_image(result)
+
+    async def apply_filter_async(
+        self, image: Image.Image, filter_type: str
+    ) -> Image.Image:
+        """Apply a filter off the event loop (see ``apply_filter``)."""
+        return await self.apply_filters_async(image, [filter_type])
+
+    async def apply_filters_async(
+        self, image: Image.Image, filter_types: Sequence[str]
+    ) -> Image.Image:
+        """Apply a fused filter stack off the event loop (see ``apply_filters``)."""
+        if self._pool is None:
+            return await asyncio.to_thread(self.apply_filters, image, filter_types)
+
+        shm, ref = image_pool.share_image(image)
+        result = await self._run_pooled(
+            image_pool.filter_worker, shm, ref, list(filter_types)
+        )
+        return image_pool.take_image(result)
+
+    async def resize_async(
+        self,
+        image: Image.Image,
+        max_width: int = 1920,
+        max_height: int = 1080,
+        quality: int = 85,
+    ) -> bytes:
+        """Resize and encode off the event loop (see ``resize_image``)."""
+        if self._pool is None:
+            return await asyncio.to_thread(
+                self.resize_image, image, max_width, max_height, quality
+            )
+
+        shm, ref = image_pool.share_image(image)
+        result = await self._run_pooled(
+            image_pool.resize_worker, shm, ref, max_width, max_height, quality
+        )
+        return image_pool.take_bytes(result)
+
+    async def encode_async(
+        self, image: Image.Image, format: str = "JPEG", quality: int = 85
+    ) -> bytes:
+        """Encode off the event loop (see ``encode_image``)."""
+        if self._pool is None:
+            return await asyncio.to_thread(self.encode_image, image, format, quality)
+
+        shm, ref = image_pool.share_image(image)
+        result = await self._run_pooled(image_pool.encode_worker, shm, ref, format, quality)
+        return image_pool.take_bytes(result)
+
+    # === PERCEPTUAL HASH ===
+
+    def dhash(self, image: Image.Image) -> int:
+        """
+        64-bit difference hash: shrink to 9x8 gray and set one bit per
+        horizontally adjacent pair that gets darker. Near-identical shots
+        land within a few bits of each other. Drafts lazily-opened JPEGs.
+        """
+        self._draft(image, (DHASH_SIZE + 1, DHASH_SIZE))
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        small = image.resize(
+            (DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS, reducing_gap=DRAFT_REDUCING_GAP
+        ).convert("L")
+        pixels = small.tobytes()
+        value = 0
+        for row in range(DHASH_SIZE):
+            offset = row * (DHASH_SIZE + 1)
+            for col in range(DHASH_SIZE):
+                value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+        return value
+
+    # === PALETTE ===
+
+    def extract_palette(
+        self, image: Image.Image, count: int = palette.DEFAULT_COLOR_COUNT, draft: bool = False
+    ) -> list[dict]:
+        """
+        Dominant colours as ``[{"hex": "#rrggbb", "weight": w}]``, heaviest
+        first, from local k-means (no Gemini call). ``draft`` as in ``resize_image``.
+        """
+        return palette.extract_palette(image, count, draft)
+
+    def extract_palettes(
+        self, images: Sequence[Image.Image], count: int = palette.DEFAULT_COLOR_COUNT, draft: bool = False
+    ) -> list[list[dict]]:
+        """Palettes for a batch of images in one vectorized pass."""
+        return palette.extract_palettes(images, count, draft)
+
+    # === SMART CROP ===
+
+    def smart_crop(
+        self,
+        image: Image.Image,
+        box: Optional[Sequence[float]] = None,
+        focal_point: Optional[dict] = None,
+        composition: str = "center",
+        size: tuple[int, int] = (1920, 1080),
+        quality: int = 85,
+        draft: bool = False,
+    ) -> bytes:
+        """
+        Hero crop at the aspect ratio of ``size`` (16:9 by default), fitted
+        within ``size`` and returned as JPEG bytes.
+
+        Uses the subject ``box`` / ``focal_point`` like the frontend's
+        ``calculateSmartCrop``; with neither, the focal point comes from an
+        edge-energy map. ``draft`` as in ``resize_image``.
+        """
+        aspect = size[0] / size[1]
+        if draft:
+            # Decode just large enough that the crop still covers ``size``
+            _, _, crop_w, crop_h = smart_crop.calculate_smart_crop(
+                image.width, image.height, aspect=aspect
+            )
+            scale = min(1.0, max(size[0] / crop_w, size[1] / crop_h))
+            self._draft(image, (int(image.width * scale) + 1, int(image.height * scale) + 1))
+        if not box and not focal_point:
+            focal_point = smart_crop.energy_focus(image, aspect)
+
+        x, y, crop_w, crop_h = smart_crop.calculate_smart_crop(
+            image.width, image.height, box, focal_point, composition, aspect
+        )
+        left, top = round(x), round(y)
+        region = (left, top, left + round(crop_w), top + round(crop_h))
+        if tiling.should_tile(image) and region[2] - left > size[0]:
+            cropped = tiling.resize_tiled(image, size, "RGB", DRAFT_REDUCING_GAP, box=region)
+            return self.encode_image(cropped, quality=quality)
+        cropped = image.crop(region)
+        if cropped.width > size[0]:
+            cropped = cropped.resize(size, Image.Resampling.LANCZOS, reducing_gap=DRAFT_REDUCING_GAP)
+        return self.encode_image(cropped, quality=quality)
+
+    # === CACHED DERIVATIVES ===
+
+    def _derivative_key(self, source: bytes, operation: str, params: dict) -> str:
+        return self.cache.make_key(self.cache.content_hash(source), operation, params)
+
+    def render_derivative(self, source: bytes, operation: str, params: dict) -> bytes:
+        """
+        Decode source bytes and produce an encoded derivative (uncached).
+        Operations: thumbnail (size, format, profile), resize (max_width,
+        max_height, quality, format, profile), filter (filters, quality), analysis (max_edge, max_bytes),
+        smart_crop (box, focal_point, composition, width, height, quality).
+        """
+        image = Image.open(io.BytesIO(source))
+        if operation == "thumbnail":
+            return self.create_thumbnail(
+                image,
+                tuple(params.get("size", (300, 300))),
+                draft=True,
+                format=params.get("format", "JPEG"),
+                profile=params.get("profile"),
+            )
+        if operation == "resize":
+            return self.resize_image(
+                image,
+                params.get("max_width", 1920),
+                params.get("max_height", 1080),
+                params.get("quality", None if params.get("profile") else 85),
+                draft=True,
+                format=params.get("format", "JPEG"),
+                profile=params.get("profile"),
+            )
+        if operation == "analysis":
+            return self.prepare_analysis_input(
+                image, params.get("max_edge"), params.get("max_bytes"), draft=True
+            )
+        if operation == "smart_crop":
+            return self.smart_crop(
+                image,
+                params.get("box"),
+                params.get("focal_point"),
+                params.get("composition", "center"),
+                (params.get("width", 1920), params.get("height", 1080)),
+                params.get("quality", 85),
+                draft=True,
+            )
+        if operation == "filter":
+            filtered = self.apply_filters(image, params.get("filters", []))
+            return self.encode_image(filtered, quality=params.get("quality", 90))
+        raise ValueError(f"Unknown derivative operation: {operation}")
+
+    def derive(self, source: bytes, operation: str, params: Optional[dict] = None) -> bytes:
+        """Encoded derivative of source bytes, served from the derivative cache when possible."""
+        params = params or {}
+        key = self._derivative_key(source, operation, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        data = self.render_derivative(source, operation, params)
+        self.cache.put(key, data)
+        return data
+
+    async def derive_async(
+        self, source: bytes, operation: str, params: Optional[dict] = None
+    ) -> bytes:
+        """Cached derivative off the event loop; misses render in the worker pool."""
+        params = params or {}
+        key = await asyncio.to_thread(self._derivative_key, source, operation, params)
+
+        async def loaded() -> bytes:
+            return source
+
+        return await self.derive_for_key_async(key, loaded, operation, params)
+
+    def source_derivative_key(self, source_id: str, operation: str, params: Optional[dict] = None) -> str:
+        """
+        Derivative cache key for a source named by a stable ``source_id``
+        (e.g. asset ID plus storage URL) rather than by its content hash, so
+        a cache hit needs neither the source bytes nor a hash of them.
+        """
+        return self.cache.make_key(f"id:{source_id}", operation, params)
 
-    async def download_image(self, url: str) -> Image.Image:
-        """Download image from URL and return PIL Image."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+    async def derive_for_key_async(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[bytes]],
+        operation: str,
+        params: Optional[dict] = None,
+    ) -> bytes:
+        """Derivative cached under ``key``; ``load`` fetches the source only on a miss."""
+        params = params or {}
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        source = await load()
+        if self._pool is None:
+            data = await asyncio.to_thread(self.render_derivative, source, operation, params)
+        else:
+            shm, ref = image_pool.share_bytes(source)
+            result = await self._run_pooled(
+                image_pool.derive_worker, shm, ref, operation, params
+            )
+            data = image_pool.take_bytes(result)
+
+        await asyncio.to_thread(self.cache.put, key, data)
+        return data
+
+    # === DOWNLOAD / ENCODE ===
+
+    async def download_bytes(self, url: str) -> bytes:
+        """Download raw image bytes from URL (shared pooled client)."""
+        object_key = storage_service.local_key(url)
+        if object_key is not None:
+            # Local backend: read the file directly instead of looping over HTTP
+            return await storage_service.read_object_async(object_key)
+        response = await get_http_client().get(url)
+        response.raise_for_status()
+        return response.content
+
+    async def download_image(self, url: str, stream: bool = False) -> Image.Image:
+        """
+        Download image from URL and return PIL Image.
+
+        With ``stream=True`` the body is read into a single buffer with
+        early header/size rejection (see ``_stream_decode``); the result
+        is already loaded, so prefer the default lazy mode when a draft
+        decode (thumbnails) is wanted.
+        """
+        if not stream:
+            return Image.open(io.BytesIO(await self.download_bytes(url)))
+
+        async with get_http_client().stream("GET", url) as response:
             response.raise_for_status()
-            return Image.open(io.BytesIO(response.content))
+            return await self._stream_decode(response)
+
+    async def _stream_decode(
+        self,
+        response: httpx.Response,
+        max_bytes: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+    ) -> Image.Image:
+        """
+        Collect a streaming response into one buffer (pre-sized from
+        Content-Length) and decode it once. The header is sniffed from the
+        first chunks (without copying them), so non-images and pixel-budget
+        bombs are rejected before the body is read; oversized payloads abort
+        as soon as the byte budget is exceeded.
+        """
+        max_bytes = max_bytes or settings.image_max_download_bytes
+        max_pixels = max_pixels or settings.image_max_pixels
+
+        content_type = response.headers.get("content-type", "")
+        if content_type and not content_type.startswith(("image/", "application/octet-stream")):
+            raise ImageRejectedError(f"Not an image: {content_type}")
+        declared = int(response.headers.get("content-length") or 0)
+        if declared > max_bytes:
+            raise ImageRejectedError(f"Image too large: {declared} bytes")
+
+        buffer = bytearray(declared)
+        received = 0
+        checked = False
+        sniff_at = 0  # Sniff the first chunk, then each time the prefix doubles
+        async for chunk in response.aiter_bytes():
+            if received + len(chunk) > max_bytes:
+                raise ImageRejectedError(f"Image exceeds {max_bytes} bytes")
+            buffer[received:received + len(chunk)] = chunk  # Grows past a short Content-Length
+            received += len(chunk)
+            if not checked and received >= sniff_at:
+                with memoryview(buffer) as view:
+                    prefix = view[:received]
+                    checked = self._check_header(prefix, max_pixels)
+                    if not checked and received > HEADER_SNIFF_BYTES and not self._has_signature(prefix):
+                        raise ImageRejectedError("No image header found")
+                    del prefix  # Buffer can't grow while exported
+                sniff_at = received * 2
+        del buffer[received:]
+
+        if not checked and not self._check_header(buffer, max_pixels):
+            raise ImageRejectedError("No image header found")
+        image = Image.open(ViewReader(buffer))
+        image.load()
+        return image
+
+    @staticmethod
+    def _has_signature(prefix: BytesLike) -> bool:
+        """True if ``prefix`` starts with the magic bytes of a format Pillow reads."""
+        Image.init()
+        head = bytes(prefix[:64])
+        return any(accept and accept(head) for _, accept in Image.OPEN.values())
+
+    @staticmethod
+    def _check_header(prefix: BytesLike, max_pixels: int) -> bool:
+        """
+        True once ``prefix`` holds a recognisable image header within the
+        pixel budget; False if more bytes are needed (or it isn't an image).
+        """
+        try:
+            with Image.open(ViewReader(prefix)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError as e:
+            raise ImageRejectedError(str(e))
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+            return False
+        if width * height > max_pixels:
+            raise ImageRejectedError(f"Image too large: {width}x{height}")
+        return True
+
+    def encode_image(
+        self,
+        image: Image.Image,
+        format: str = "JPEG",
+        quality: Optional[int] = 85,
+        profile: Optional[str] = None,
+        optimize: bool = False,
+    ) -> bytes:
+        """
+        Encode an image, flattening to RGB where JPEG requires it.
+
+        ``format`` may be JPEG, WEBP or AVIF (if this Pillow build has
+        it). A named ``profile`` ("fast", "balanced", "archive") sets
+        quality, progressive JPEG and encoder effort; pass ``quality=None``
+        to use the profile's quality. ``optimize`` applies without a profile.
+        """
+        with self.encode_buffer(image, format, quality, profile, optimize) as encoded:
+            return encoded.tobytes()
+
+    def encode_buffer(
+        self,
+        image: Image.Image,
+        format: str = "JPEG",
+        quality: Optional[int] = 85,
+        profile: Optional[str] = None,
+        optimize: bool = False,
+    ) -> PooledBuffer:
+        """
+        Like ``encode_image``, but encodes into a pooled buffer and returns
+        it without copying; read ``.view`` and ``release()`` it (or use it
+        as a context manager) once consumed.
+        """
+        format = encoders.normalize_format(format)
+        if format == "JPEG":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        options = encoders.save_options(format, quality, profile)
+        if profile is None and optimize and format == "JPEG":
+            options["optimize"] = True
+        encoded = buffer_pool.acquire()
+        try:
+            image.save(encoded.stream, format=format, **options)
+        except Exception:
+            encoded.release()
+            raise
+        return encoded
+
+    def _draft(self, image: Image.Image, size: tuple[int, int]) -> Image.Image:
+        """
+        Configure a not-yet-decoded image for reduced-resolution decoding.
+        JPEGs decode at the smallest DCT scale (1/2, 1/4, 1/8) that still
+        covers ``size``; already-loaded images are left untouched.
+        """
+        if image.format == "JPEG":
+            image.draft(image.mode, size)
+        return image
 
     def resize_image(
         self,
         image: Image.Image,
         max_width: int = 1920,
         max_height: int = 1080,
-        quality: int = 85,
+        quality: Optional[int] = 85,
+        draft: bool = False,
+        format: str = "JPEG",
+        profile: Optional[str] = None,
     ) -> bytes:
         """
         Resize image while preserving aspect ratio.
-        Returns JPEG bytes.
+        Returns encoded bytes (JPEG unless ``format`` says otherwise;
+        ``profile`` as in ``encode_image``, else optimized baseline JPEG).
+
+        With ``draft=True`` a lazily-opened source is decoded at reduced
+        resolution (see ``_draft``) and non-JPEG sources are shrunk with
+        ``reduce()`` before the final LANCZOS pass. Note that drafting
+        mutates the source image, so only use it on single-use images.
         """
         # Calculate new dimensions
         ratio = min(max_width / image.width, max_height / image.height)
         if ratio < 1:
             new_size = (int(image.width * ratio), int(image.height * ratio))
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+            if draft:
+                self._draft(image, new_size)
+            if tiling.should_tile(image):
+                image = tiling.resize_tiled(image, new_size, reducing_gap=DRAFT_REDUCING_GAP)
+            elif draft:
+                image = image.resize(
+                    new_size, Image.Resampling.LANCZOS, reducing_gap=DRAFT_REDUCING_GAP
+                )
+            else:
+                image = image.resize(new_size, Image.Resampling.LANCZOS)
 
-        # Convert to RGB if necessary (for JPEG)
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-
-        # Save to bytes
-        buffer = io.BytesIO()
-        image.save(buffer, format="JPEG", quality=quality, optimize=True)
-        return buffer.getvalue()
+        return self.encode_image(image, format, quality, profile, optimize=True)
 
     def create_thumbnail(
-        self, image: Image.Image, size: tuple[int, int] = (300, 300)
+        self,
+        image: Image.Image,
+        size: tuple[int, int] = (300, 300),
+        draft: bool = False,
+        format: str = "JPEG",
+        profile: Optional[str] = None,
     ) -> bytes:
-        """Create a thumbnail preserving aspect ratio."""
-        thumb = image.copy()
-        thumb.thumbnail(size, Image.Resampling.LANCZOS)
+        """
+        Create a thumbnail preserving aspect ratio (quality 75 JPEG unless
+        ``format``/``profile`` say otherwise, see ``encode_image``).
 
-        if thumb.mode in ("RGBA", "P"):
-            thumb = thumb.convert("RGB")
+        With ``draft=True`` the source is decoded at reduced resolution
+        instead of being copied at full size (see ``resize_image``).
+        """
+        if draft:
+            self._draft(image, size)
+        if tiling.should_tile(image):
+            # Straight to the fitted size, without a full-size copy
+            ratio = min(size[0] / image.width, size[1] / image.height, 1)
+            fitted = (max(1, round(image.width * ratio)), max(1, round(image.height * ratio)))
+            thumb = tiling.resize_tiled(image, fitted, reducing_gap=DRAFT_REDUCING_GAP)
+        elif draft:
+            thumb = image.copy()
+            thumb.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=DRAFT_REDUCING_GAP)
+        else:
+            thumb = image.copy()
+            thumb.thumbnail(size, Image.Resampling.LANCZOS)
 
-        buffer = io.BytesIO()
-        thumb.save(buffer, format="JPEG", quality=75)
-        return buffer.getvalue()
+        return self.encode_image(thumb, format, None if profile else 75, profile)
+
+    def render_set(
+        self,
+        image: Image.Image,
+        specs: Sequence[RenditionSpec] = DEFAULT_RENDITIONS,
+        profile: Optional[str] = None,
+    ) -> dict[str, bytes]:
+        """
+        Produce several JPEG renditions from a single decode.
+        Returns ``{spec.name: jpeg_bytes}``; see ``render_set_buffers``.
+        """
+        buffers = self.render_set_buffers(image, specs, profile)
+        renditions = {}
+        for name, encoded in buffers.items():
+            renditions[name] = encoded.tobytes()
+            encoded.release()
+        return renditions
+
+    def render_set_buffers(
+        self,
+        image: Image.Image,
+        specs: Sequence[RenditionSpec] = DEFAULT_RENDITIONS,
+        profile: Optional[str] = None,
+    ) -> dict[str, PooledBuffer]:
+        """
+        Produce several JPEG renditions from a single decode, as pooled
+        buffers (release each once uploaded).
+
+        The source is drafted to the largest requested size, decoded and
+        converted to RGB once, then downscaled in a cascade: each rendition
+        is resampled from the previous (larger) one rather than from the
+        original. ``profile`` sets progressive/effort options (spec
+        qualities still apply).
+        """
+        def fitted(spec: RenditionSpec) -> tuple[int, int]:
+            ratio = min(spec.max_width / image.width, spec.max_height / image.height, 1)
+            return (max(1, int(image.width * ratio)), max(1, int(image.height * ratio)))
+
+        # Same aspect ratio throughout, so each target fits inside the previous
+        targets = sorted(
+            ((spec, fitted(spec)) for spec in specs),
+            key=lambda item: item[1][0] * item[1][1],
+            reverse=True,
+        )
+        if not targets:
+            return {}
+
+        self._draft(image, targets[0][1])
+        current = image
+        if tiling.should_tile(current):
+            # First (largest) rendition in strips, instead of a full RGB copy
+            current = tiling.resize_tiled(current, targets[0][1], "RGB", DRAFT_REDUCING_GAP)
+        elif current.mode != "RGB":
+            current = current.convert("RGB")
+
+        renditions: dict[str, PooledBuffer] = {}
+        try:
+            for spec, size in targets:
+                if current.size != size:
+                    current = current.resize(
+                        size, Image.Resampling.LANCZOS, reducing_gap=DRAFT_REDUCING_GAP
+                    )
+                renditions[spec.name] = self.encode_buffer(
+                    current, "JPEG", spec.quality, profile, optimize=True
+                )
+        except Exception:
+            for encoded in renditions.values():
+                encoded.release()
+            raise
+        return renditions
+
+    # === ANALYSIS INPUT ===
+
+    def _analysis_params(self) -> dict:
+        return {
+            "max_edge": settings.gemini_input_max_edge,
+            "max_bytes": settings.gemini_input_max_bytes,
+        }
+
+    def prepare_analysis_input(
+        self,
+        image: Image.Image,
+        max_edge: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        draft: bool = False,
+    ) -> bytes:
+        """
+        Downscale to ``max_edge`` on the long side and encode a JPEG within
+        ``max_bytes``, stepping quality down (then size) until it fits.
+        Tagging and captioning gain nothing from more pixels, and every
+        byte is uploaded to Gemini. ``draft`` as in ``resize_image``.
+        """
+        max_edge = max_edge or settings.gemini_input_max_edge
+        max_bytes = max_bytes or settings.gemini_input_max_bytes
+
+        ratio = min(1.0, max_edge / max(image.width, image.height))
+        size = (max(1, int(image.width * ratio)), max(1, int(image.height * ratio)))
+        if draft:
+            self._draft(image, size)
+        if tiling.should_tile(image):
+            image = tiling.resize_tiled(image, size, "RGB", DRAFT_REDUCING_GAP)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != size:
+            image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=DRAFT_REDUCING_GAP)
+
+        # Attempts are sized in a pooled buffer; only the one sent is copied out
+        while True:
+            for quality in ANALYSIS_QUALITY_STEPS:
+                with self.encode_buffer(image, quality=quality) as encoded:
+                    if len(encoded) <= max_bytes or (
+                        max(image.size) <= 64 and quality == ANALYSIS_QUALITY_STEPS[-1]
+                    ):
+                        # Fits, or budget unreachable: send the smallest attempt
+                        return encoded.tobytes()
+            image = image.resize(
+                (max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)),
+                Image.Resampling.LANCZOS,
+            )
+
+    async def prepare_analysis_input_async(self, source: bytes) -> bytes:
+        """Analysis input for source bytes, reusing a cached rendition when present."""
+        return await self.derive_async(source, "analysis", self._analysis_params())
+
+    def seed_analysis_input(self, source: bytes, rendition: BytesLike) -> bool:
+        """
+        Cache an already-rendered small JPEG (e.g. the "analysis" rendition)
+        as the analysis input for ``source`` if it fits the current limits,
+        so later analysis skips the decode. Returns whether it was stored.
+        """
+        params = self._analysis_params()
+        if len(rendition) > params["max_bytes"]:
+            return False
+        if max(Image.open(ViewReader(rendition)).size) > params["max_edge"]:
+            return False
+        self.cache.put(self._derivative_key(source, "analysis", params), rendition)
+        return True
 
     async def analyze_with_gemini(
-        self, image: Image.Image, prompt: Optional[str] = None
+        self,
+        image: Union[Image.Image, bytes],
+        prompt: Optional[str] = None,
+        fingerprint: Optional[str] = None,
     ) -> dict:
         """
         Analyze image using Google Gemini Vision API (server-side).
         Returns structured analysis with tags, caption, etc.
+
+        Images are downscaled and encoded to the analysis-input budget
+        (see ``prepare_analysis_input``). ``image`` may also be pre-encoded
+        JPEG bytes, e.g. the "analysis" rendition from ``render_set``,
+        which are sent as-is.
+
+        Results are cached per (fingerprint, prompt, model). Pass the
+        source content hash as ``fingerprint`` to look up before encoding;
+        otherwise the hash of the encoded payload is used.
         """
         if not self.client:
             return {"error": "Gemini API key not configured", "tags": [], "caption": None}
 
-        # Default prompt for comprehensive analysis
-        analysis_prompt = prompt or """
-        Analyze this image and return a JSON object with:
-        {
-            "tags": ["tag1", "tag2", ...],  // 5-10 descriptive tags
-            "caption": "A descriptive caption",
-            "mood": "The overall mood/feeling",
-            "colors": ["#hex1", "#hex2", ...]  // Dominant colors
-        }
-        Return ONLY valid JSON, no markdown.
+        analysis_prompt = prompt or DEFAULT_ANALYSIS_PROMPT
+
+        if fingerprint is not None:
+            cache_key = self.analysis_cache.make_key(fingerprint, analysis_prompt, self.model_name)
+            cached = await self.analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if isinstance(image, bytes):
+            image_bytes = image
+        else:
+            image_bytes = await asyncio.to_thread(self.prepare_analysis_input, image)
+
+        if fingerprint is None:
+            cache_key = self.analysis_cache.make_key(
+                self.analysis_cache.fingerprint(image_bytes), analysis_prompt, self.model_name
+            )
+            cached = await self.analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        return await self._generate_analysis(image_bytes, analysis_prompt, cache_key)
+
+    async def analyze_source(self, data: bytes, prompt: Optional[str] = None) -> dict:
+        """
+        Analyze downloaded source bytes, checking the analysis cache by
+        content hash before anything is decoded or re-encoded. The payload
+        is the bounded analysis input, from the derivative cache if present.
         """
+        if not self.client:
+            return {"error": "Gemini API key not configured", "tags": [], "caption": None}
 
-        # Convert PIL image to base64
-        buffer = io.BytesIO()
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-        image.save(buffer, format="JPEG", quality=90)
-        image_bytes = buffer.getvalue()
-        image_b64 = base64.b64encode(image_bytes).decode("utf-8")
+        analysis_prompt = prompt or DEFAULT_ANALYSIS_PROMPT
+        fingerprint = await asyncio.to_thread(self.analysis_cache.fingerprint, data)
+        cache_key = self.analysis_cache.make_key(fingerprint, analysis_prompt, self.model_name)
+        cached = await self.analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        payload = await self.prepare_analysis_input_async(data)
+        return await self._generate_analysis(payload, analysis_prompt, cache_key)
+
+    async def analyze_batch_with_gemini(
+        self,
+        images: Sequence[bytes],
+        prompt: Optional[str] = None,
+        fingerprints: Optional[Sequence[str]] = None,
+    ) -> list[dict]:
+        """
+        Analyze several encoded JPEGs, packing up to ``gemini_batch_size``
+        of them into each Gemini request. Results come back in input order;
+        cached items are skipped and single leftovers use the one-image path.
+
+        Pass source content hashes as ``fingerprints`` to share cache
+        entries with ``analyze_source``.
+        """
+        if not self.client:
+            return [
+                {"error": "Gemini API key not configured", "tags": [], "caption": None}
+                for _ in images
+            ]
+
+        analysis_prompt = prompt or DEFAULT_ANALYSIS_PROMPT
+        results: list[Optional[dict]] = [None] * len(images)
+        pending: list[tuple[int, str]] = []  # (position, cache key)
+        for i, image_bytes in enumerate(images):
+            fingerprint = (
+                fingerprints[i] if fingerprints is not None
+                else self.analysis_cache.fingerprint(image_bytes)
+            )
+            cache_key = self.analysis_cache.make_key(fingerprint, analysis_prompt, self.model_name)
+            cached = await self.analysis_cache.get(cache_key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, cache_key))
+
+        size = max(1, settings.gemini_batch_size)
+        chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+
+        async def run(chunk: list[tuple[int, str]]) -> list[dict]:
+            if len(chunk) == 1:
+                i, cache_key = chunk[0]
+                return [await self._generate_analysis(images[i], analysis_prompt, cache_key)]
+            return await self._generate_batch_analysis(
+                [images[i] for i, _ in chunk], prompt, [key for _, key in chunk]
+            )
+
+        outputs = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        for chunk, output in zip(chunks, outputs):
+            for (i, _), result in zip(chunk, output):
+                results[i] = result
+        return results
+
+    async def analyze_sources(
+        self, sources: Sequence[bytes], prompt: Optional[str] = None
+    ) -> list[dict]:
+        """
+        Batch counterpart of ``analyze_source``: cache lookups by content
+        hash, then downscale the misses and analyze them in multi-image
+        requests.
+        """
+        if not self.client:
+            return [
+                {"error": "Gemini API key not configured", "tags": [], "caption": None}
+                for _ in sources
+            ]
+
+        analysis_prompt = prompt or DEFAULT_ANALYSIS_PROMPT
+        fingerprints = await asyncio.gather(*(
+            asyncio.to_thread(self.analysis_cache.fingerprint, data) for data in sources
+        ))
+        results: list[Optional[dict]] = [None] * len(sources)
+        misses = []
+        for i, fingerprint in enumerate(fingerprints):
+            cache_key = self.analysis_cache.make_key(fingerprint, analysis_prompt, self.model_name)
+            cached = await self.analysis_cache.get(cache_key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append(i)
+
+        # A corrupt or oversized image fails only its own entry, not the
+        # batch (which may hold other requests' images via AnalysisBatcher)
+        payloads = await asyncio.gather(
+            *(self.prepare_analysis_input_async(sources[i]) for i in misses),
+            return_exceptions=True,
+        )
+        prepared = []
+        for i, payload in zip(misses, payloads):
+            if isinstance(payload, BaseException):
+                results[i] = {"error": f"Could not prepare image: {payload}", "tags": [], "caption": None}
+            else:
+                prepared.append((i, payload))
+        analyzed = await self.analyze_batch_with_gemini(
+            [payload for _, payload in prepared], prompt, [fingerprints[i] for i, _ in prepared]
+        )
+        for (i, _), result in zip(prepared, analyzed):
+            results[i] = result
+        return results
+
+    @staticmethod
+    def _parse_response_json(text: str):
+        """Parse a JSON response body, tolerating markdown fences."""
+        import json
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.split("```")[1]
+            if text.startswith("json"):
+                text = text[4:]
+        return json.loads(text)
+
+    async def _generate_batch_analysis(
+        self, payloads: Sequence[bytes], prompt: Optional[str], cache_keys: Sequence[str]
+    ) -> list[dict]:
+        """
+        One Gemini call for several labelled images; split the response
+        back out by index and cache each successful result.
+        """
+        count = len(payloads)
+        if prompt is None:
+            batch_prompt = BATCH_ANALYSIS_PROMPT.format(count=count)
+            config = types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=BATCH_ANALYSIS_SCHEMA,
+            )
+        else:
+            # Custom prompts define their own fields; only the envelope is fixed
+            batch_prompt = (
+                f"{prompt}\nYou are given {count} images, each preceded by its label "
+                f'"Image <index>". Return a JSON array with one object per image, '
+                f'applying the instructions above and including its "index".'
+            )
+            config = types.GenerateContentConfig(response_mime_type="application/json")
+
+        contents = []
+        for index, payload in enumerate(payloads):
+            contents.append(f"Image {index}")
+            contents.append(types.Part.from_bytes(data=payload, mime_type="image/jpeg"))
+        contents.append(batch_prompt)
 
         try:
-            # Using new google-genai SDK client pattern
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name,
-                contents=[
-                    types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-                    analysis_prompt,
-                ]
+            response = await self.gateway.call(
+                lambda: self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=contents,
+                    config=config,
+                ),
+                tokens=estimate_tokens(batch_prompt, images=count),
             )
-            # Parse response
-            text = response.text.strip()
-            # Clean markdown fences if present
-            if text.startswith("```"):
-                text = text.split("```")[1]
-                if text.startswith("json"):
-                    text = text[4:]
-            import json
-            return json.loads(text)
+            entries = self._parse_response_json(response.text)
+            if not isinstance(entries, list):
+                raise ValueError("Batch response is not a list")
+        except Exception as e:
+            return [{"error": str(e), "tags": [], "caption": None} for _ in payloads]
+
+        by_index = {}
+        for entry in entries:
+            if isinstance(entry, dict) and isinstance(entry.get("index"), int):
+                by_index[entry.pop("index")] = entry
+
+        results = []
+        for index, cache_key in enumerate(cache_keys):
+            analysis = by_index.get(index)
+            if analysis is None:
+                results.append({"error": "Missing from batch response", "tags": [], "caption": None})
+                continue
+            await self.analysis_cache.set(cache_key, analysis)
+            results.append(analysis)
+        return results
+
+    async def _generate_analysis(
+        self, image_bytes: bytes, analysis_prompt: str, cache_key: str
+    ) -> dict:
+        """Call Gemini with an encoded JPEG and cache a successful result."""
+        try:
+            # Using new google-genai SDK client pattern, throttled by the gateway
+            response = await self.gateway.call(
+                lambda: self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=[
+                        types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
+                        analysis_prompt,
+                    ]
+                ),
+                tokens=estimate_tokens(analysis_prompt),
+            )
+            # Parse response (markdown fences stripped if present)
+            analysis = self._parse_response_json(response.text)
         except Exception as e:
             return {"error": str(e), "tags": [], "caption": None}
 
+        await self.analysis_cache.set(cache_key, analysis)
+        return analysis
+
     def apply_filter(
         self, image: Image.Image, filter_type: str
     ) -> Image.Image:
         """
         Apply basic filters to image.
-        Supports: grayscale, sepia, brighten, darken
-        """
-        from PIL import ImageEnhance, ImageFilter
-
-        if filter_type == "grayscale":
-            return image.convert("L").convert("RGB")
-        elif filter_type == "sepia":
-            # Convert to grayscale then apply sepia tone
-            gray = image.convert("L")
-            sepia = Image.merge("RGB", (
-                gray.point(lambda x: min(255, x * 1.07)),
-                gray.point(lambda x: x * 0.74),
-                gray.point(lambda x: x * 0.43),
-            ))
-            return sepia
-        elif filter_type == "brighten":
-            enhancer = ImageEnhance.Brightness(image)
-            return enhancer.enhance(1.3)
-        elif filter_type == "darken":
-            enhancer = ImageEnhance.Brightness(image)
-            return enhancer.enhance(0.7)
-        elif filter_type == "sharpen":
-            return image.filter(ImageFilter.SHARPEN)
-        elif filter_type == "blur":
-            return image.filter(ImageFilter.GaussianBlur(radius=2))
-        else:
+        Supports: grayscale, sepia, brighten, darken, sharpen, blur
+        Colour filters run as a single LUT or colour-matrix pass; large
+        images are processed in strips (see ``tiling``).
+        """
+        op = filters.FILTERS.get(filter_type)
+        if op is None:
             return image  # Unknown filter, return unchanged
+        if tiling.should_tile(image):
+            return tiling.apply_ops_tiled(image, [op])
+        return filters.apply_op(image, op)
+
+    def apply_filters(
+        self, image: Image.Image, filter_types: Sequence[str]
+    ) -> Image.Image:
+        """
+        Apply a stack of filters in order, fused into as few passes as
+        possible: colour filters between spatial ones (sharpen, blur)
+        collapse into a single transform. Unknown filters are skipped.
+        Images above the tiling threshold are processed in strips.
+        """
+        ops = [filters.FILTERS[name] for name in filter_types if name in filters.FILTERS]
+        passes = filters.fuse(ops)
+        if tiling.should_tile(image):
+            return tiling.apply_ops_tiled(image, passes)
+        for op in passes:
+            image = filters.apply_op(image, op)
+        return image
 
 
 # Singleton instance
@@ -0,0 +1,116 @@
+"""
+Neural Canvas Backend - Palette Engine
+Dominant colours computed locally: every image is sampled onto a small
+fixed grid and clustered with k-means in NumPy, batched across images so
+a whole batch is one set of array operations. No AI round trip needed.
+"""
+
+from typing import Sequence
+
+import numpy as np
+from PIL import Image
+
+from app.services import tiling
+
+# Pixels clustered per image (SAMPLE_SIZE x SAMPLE_SIZE)
+SAMPLE_SIZE = 64
+
+DEFAULT_COLOR_COUNT = 5
+KMEANS_ITERATIONS = 10
+
+# Pixels at or below this alpha don't count towards the palette
+ALPHA_CUTOFF = 16
+
+
+def sample_pixels(image: Image.Image, draft: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Shrink to the sample grid; return (pixels float32 (N, 3), weights (N,)).
+    With ``draft=True`` lazily-opened JPEGs decode at 1/8 scale (mutates
+    the image, so only for single-use images).
+    """
+    if draft and image.format == "JPEG":
+        image.draft("RGB", (SAMPLE_SIZE, SAMPLE_SIZE))
+    if tiling.should_tile(image):
+        image = tiling.resize_tiled(image, (SAMPLE_SIZE, SAMPLE_SIZE))
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX)
+        array = np.asarray(rgba, dtype=np.float32).reshape(-1, 4)
+        weights = (array[:, 3] > ALPHA_CUTOFF).astype(np.float32)
+        return array[:, :3], weights
+    rgb = image.convert("RGB").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX)
+    array = np.asarray(rgb, dtype=np.float32).reshape(-1, 3)
+    return array, np.ones(len(array), dtype=np.float32)
+
+
+def _initial_centroids(pixels: np.ndarray, weights: np.ndarray, count: int) -> np.ndarray:
+    """Deterministic seeds: pixels at evenly spaced luma quantiles."""
+    luma = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    luma = np.where(weights > 0, luma, np.inf)  # Transparent pixels sort last
+    order = np.argsort(luma, axis=1)
+    visible = np.maximum(1, (weights > 0).sum(axis=1))
+    ranks = ((np.arange(count) + 0.5) / count)[None, :] * visible[:, None]
+    picks = np.take_along_axis(order, ranks.astype(np.int64), axis=1)
+    return np.take_along_axis(pixels, picks[..., None], axis=1)
+
+
+def kmeans(
+    pixels: np.ndarray, weights: np.ndarray, count: int, iterations: int = KMEANS_ITERATIONS
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batched weighted k-means.
+    pixels (B, N, 3), weights (B, N) -> centroids (B, K, 3), cluster weights (B, K).
+    """
+    centroids = _initial_centroids(pixels, weights, count)
+    clusters = np.arange(count)
+    for _ in range(iterations):
+        # |p - c|^2 without the per-pixel |p|^2 term (constant for argmin)
+        distances = (centroids ** 2).sum(axis=-1)[:, None, :] - 2 * pixels @ centroids.transpose(0, 2, 1)
+        labels = distances.argmin(axis=2)
+        members = (labels[..., None] == clusters) * weights[..., None]  # (B, N, K)
+        totals = members.sum(axis=1)
+        sums = members.transpose(0, 2, 1) @ pixels
+        updated = sums / np.maximum(totals, 1e-9)[..., None]
+        centroids = np.where(totals[..., None] > 0, updated, centroids)
+    return centroids, totals
+
+
+def to_hex(rgb: Sequence[float]) -> str:
+    r, g, b = (int(round(min(255.0, max(0.0, float(v))))) for v in rgb)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def extract_palettes(
+    images: Sequence[Image.Image], count: int = DEFAULT_COLOR_COUNT, draft: bool = False
+) -> list[list[dict]]:
+    """
+    Dominant colours for each image as ``[{"hex": "#rrggbb", "weight": w}]``,
+    heaviest first; weights are fractions of visible pixels. Clusters that
+    round to the same hex colour are merged.
+    """
+    if not images:
+        return []
+    samples = [sample_pixels(image, draft) for image in images]
+    pixels = np.stack([s[0] for s in samples])
+    weights = np.stack([s[1] for s in samples])
+    centroids, totals = kmeans(pixels, weights, count)
+
+    palettes = []
+    for image_centroids, image_totals in zip(centroids, totals):
+        visible = float(image_totals.sum())
+        merged: dict[str, float] = {}
+        for rgb, total in zip(image_centroids, image_totals):
+            if total > 0:
+                key = to_hex(rgb)
+                merged[key] = merged.get(key, 0.0) + float(total)
+        palettes.append([
+            {"hex": key, "weight": round(total / visible, 4)}
+            for key, total in sorted(merged.items(), key=lambda item: -item[1])
+        ])
+    return palettes
+
+
+def extract_palette(
+    image: Image.Image, count: int = DEFAULT_COLOR_COUNT, draft: bool = False
+) -> list[dict]:
+    """Dominant colours of one image (see ``extract_palettes``)."""
+    return extract_palettes([image], count, draft)[0]
@@ -0,0 +1,127 @@
+"""
+Neural Canvas Backend - Smart Crop
+Server-side port of the frontend hero crop (utils/smartCrop.ts
+``calculateSmartCrop``), plus an edge-energy fallback for images without
+a subject box or focal point.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from app.services import tiling
+
+HERO_ASPECT = 16 / 9
+
+COMPOSITION_RULES = ("center", "thirds", "golden")
+
+# Long edge of the grayscale map used for edge energy
+ENERGY_SIZE = 256
+
+# Fraction of window energy traded away at the far edge, so near-ties
+# favour the centre
+CENTER_BIAS = 0.1
+
+
+def calculate_smart_crop(
+    width: int,
+    height: int,
+    box: Optional[Sequence[float]] = None,
+    focal_point: Optional[dict] = None,
+    composition: str = "center",
+    aspect: float = HERO_ASPECT,
+) -> tuple[float, float, float, float]:
+    """
+    Largest ``aspect`` crop inside the image as (x, y, width, height).
+
+    Centred on ``focal_point`` ({"x", "y"} normalized), else on the centre
+    of ``box`` ([ymin, xmin, ymax, xmax] normalized); "thirds"/"golden"
+    shift the subject onto a composition line; the box is then kept in
+    frame with a 10% margin where the crop allows. Same rules as the
+    frontend, so server and browser crops agree.
+    """
+    cx = width / 2
+    cy = height / 2
+    if focal_point:
+        cx = focal_point["x"] * width
+        cy = focal_point["y"] * height
+    elif box and len(box) == 4:
+        y1, x1, y2, x2 = box
+        cx = ((x1 + x2) / 2) * width
+        cy = ((y1 + y2) / 2) * height
+
+    if width / height > aspect:
+        crop_h = height
+        crop_w = crop_h * aspect
+    else:
+        crop_w = width
+        crop_h = crop_w / aspect
+
+    x = cx - crop_w / 2
+    y = cy - crop_h / 2
+
+    if composition in ("thirds", "golden"):
+        ratio_left = 0.33 if composition == "thirds" else 0.382
+        ratio_right = 0.66 if composition == "thirds" else 0.618
+        left_x = cx - crop_w * ratio_left
+        right_x = cx - crop_w * ratio_right
+        can_left = left_x >= 0 and left_x + crop_w <= width
+        can_right = right_x >= 0 and right_x + crop_w <= width
+        if can_left and not can_right:
+            x = left_x
+        elif can_right:
+            # Both valid defaults to right (classic cinematic framing)
+            x = right_x
+
+    if box and len(box) == 4:
+        by1, bx1, by2, bx2 = box
+        if x > bx1 * width:
+            x = bx1 * width - crop_w * 0.1
+        if x + crop_w < bx2 * width:
+            x = bx2 * width - crop_w + crop_w * 0.1
+        if y > by1 * height:
+            y = by1 * height - crop_h * 0.1
+        if y + crop_h < by2 * height:
+            y = by2 * height - crop_h + crop_h * 0.1
+
+    x = min(max(x, 0), width - crop_w)
+    y = min(max(y, 0), height - crop_h)
+    return x, y, crop_w, crop_h
+
+
+def _best_window(profile: np.ndarray, window: int) -> int:
+    """Start of the ``window``-long span with the most (centre-biased) energy."""
+    sums = np.convolve(profile, np.ones(window, dtype=np.float32), mode="valid")
+    if len(sums) == 1 or not sums.any():
+        return (len(sums) - 1) // 2
+    offsets = np.abs(np.arange(len(sums)) - (len(sums) - 1) / 2) / ((len(sums) - 1) / 2)
+    return int(np.argmax(sums * (1 - CENTER_BIAS * offsets)))
+
+
+def energy_focus(image: Image.Image, aspect: float = HERO_ASPECT) -> dict:
+    """
+    Focal point ({"x", "y"} normalized) from an edge-energy map: the
+    centre of the ``aspect`` window holding the most gradient magnitude.
+    Only the free axis moves, since the crop spans the other one.
+    """
+    if tiling.should_tile(image):
+        ratio = ENERGY_SIZE / max(image.size)
+        image = tiling.resize_tiled(
+            image, (max(1, round(image.width * ratio)), max(1, round(image.height * ratio))), "RGB"
+        )
+    gray = image.convert("L")
+    gray.thumbnail((ENERGY_SIZE, ENERGY_SIZE), Image.Resampling.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32)
+    if min(pixels.shape) < 2:
+        return {"x": 0.5, "y": 0.5}
+    energy = np.abs(np.diff(pixels, axis=1))[:-1, :] + np.abs(np.diff(pixels, axis=0))[:, :-1]
+    rows, cols = energy.shape
+
+    if cols / rows > aspect:
+        window = max(1, min(cols, round(rows * aspect)))
+        start = _best_window(energy.sum(axis=0), window)
+        return {"x": (start + window / 2) / cols, "y": 0.5}
+    window = max(1, min(rows, round(cols / aspect)))
+    start = _best_window(energy.sum(axis=1), window)
+    return {"x": 0.5, "y": (start + window / 2) / rows}
@@ -0,0 +1,528 @@
+"""
+Neural Canvas Backend - Storage Backends
+Object storage behind ``StorageService``: S3-compatible (Cloudflare R2,
+AWS S3, Backblaze B2) via boto3, or the local filesystem for offline and
+single-node runs and load tests. Backends raise StorageError; the service
+decides how failures surface.
+"""
+
+import hashlib
+import hmac
+import logging
+import mimetypes
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Sequence
+from urllib.parse import quote, unquote, urlencode, urlsplit
+
+import boto3
+from botocore.auth import SIGV4_TIMESTAMP, S3SigV4QueryAuth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config
+from botocore.credentials import Credentials
+from botocore.exceptions import BotoCoreError, ClientError
+from boto3.s3.transfer import TransferConfig
+
+from app.config import settings
+from app.services.buffer_pool import BytesLike, ViewReader
+
+logger = logging.getLogger(__name__)
+
+
+# Multipart threshold: 50MB (per Context7 best practices)
+MB = 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=50 * MB,
+    max_concurrency=10,
+    multipart_chunksize=10 * MB,
+    use_threads=True,
+)
+
+# Local object file names longer than this are hashed instead of quoted
+MAX_LOCAL_NAME = 200
+
+
+class StorageError(Exception):
+    """A storage operation failed (missing object, network, permissions)."""
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """Object metadata from a HEAD request / stat."""
+    key: str
+    size: int
+    content_type: Optional[str] = None
+
+
+class StorageBackend(ABC):
+    """Minimal object-store interface used by ``StorageService``."""
+
+    name: str = ""
+    public_url: str = ""
+    # True if objects are readable in-process (no network round trip)
+    is_local: bool = False
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url.rstrip('/')}/{key}" if self.public_url else key
+
+    def is_public_url(self, url: str) -> bool:
+        """True if ``url`` is under ``public_url`` (fetchable over plain HTTP)."""
+        return bool(self.public_url) and url.startswith(f"{self.public_url.rstrip('/')}/")
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        """
+        Object key behind one of our stored URLs: a public URL, or a bare
+        key (what ``url_for`` stores when there is no public URL). None
+        for anything else.
+        """
+        if self.is_public_url(url):
+            return unquote(url[len(self.public_url.rstrip("/")) + 1:])
+        parts = urlsplit(url)
+        if url and not parts.scheme and not parts.netloc and not url.startswith("/"):
+            return url
+        return None
+
+    @abstractmethod
+    def put(
+        self, key: str, data: BytesLike, content_type: str, metadata: Optional[dict] = None
+    ) -> None:
+        """Store ``data`` under ``key`` (replacing any existing object)."""
+
+    def put_small(
+        self, key: str, data: BytesLike, content_type: str, metadata: Optional[dict] = None
+    ) -> None:
+        """``put`` for objects below the multipart threshold (bulk uploads)."""
+        self.put(key, data, content_type, metadata)
+
+    @abstractmethod
+    def put_file(self, path: str, key: str) -> None:
+        """Store a file from disk under ``key``."""
+
+    @abstractmethod
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Bytes ``[start, end)`` of an object (to the end if ``end`` is None)."""
+
+    @abstractmethod
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        """Metadata for ``key``, or None if there is no such object."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key`` (no error if it doesn't exist)."""
+
+    @abstractmethod
+    def presigned_get_url(self, key: str, expiration: int, signed_at: Optional[float] = None) -> str:
+        """
+        Time-limited read URL for ``key``, valid for ``expiration`` seconds
+        from ``signed_at`` (epoch seconds; default now). A fixed
+        ``signed_at`` makes the URL deterministic: every process signing
+        the same key at the same time produces the same URL.
+        """
+
+    # --- Direct client uploads ---
+
+    supports_multipart: bool = False
+
+    @abstractmethod
+    def presigned_put_url(self, key: str, content_type: str, expiration: int) -> str:
+        """Time-limited URL a client can PUT the object body to."""
+
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        """Start a multipart upload; returns its upload id."""
+        raise StorageError(f"Multipart uploads not supported by {self.name} storage")
+
+    def presigned_part_url(self, key: str, upload_id: str, part_number: int, expiration: int) -> str:
+        raise StorageError(f"Multipart uploads not supported by {self.name} storage")
+
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, parts: Sequence[tuple[int, str]]
+    ) -> None:
+        """Assemble uploaded ``(part number, ETag)`` parts into the object."""
+        raise StorageError(f"Multipart uploads not supported by {self.name} storage")
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        raise StorageError(f"Multipart uploads not supported by {self.name} storage")
+
+
+class _SigV4QueryAuthAt(S3SigV4QueryAuth):
+    """SigV4 query-string signing at a given time instead of the current one."""
+
+    def __init__(self, credentials: Credentials, region_name: str, expires: int, signed_at: datetime):
+        super().__init__(credentials, "s3", region_name, expires=expires)
+        self.signed_at = signed_at
+
+    def add_auth(self, request):
+        request.context["timestamp"] = self.signed_at.strftime(SIGV4_TIMESTAMP)
+        self._modify_request_before_signing(request)
+        string_to_sign = self.string_to_sign(request, self.canonical_request(request))
+        self._inject_signature_to_request(request, self.signature(string_to_sign, request))
+
+
+class S3Backend(StorageBackend):
+    """
+    S3-compatible bucket through a shared boto3 client. With
+    ``credentials``, read URLs for a fixed ``signed_at`` are signed locally
+    (path-style) so they are identical across processes.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        public_url: str = "",
+        credentials: Optional[Credentials] = None,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.public_url = public_url
+        self.credentials = credentials
+
+    @classmethod
+    def from_settings(cls) -> "S3Backend":
+        client = boto3.client(
+            "s3",
+            region_name="auto",
+            endpoint_url=settings.r2_endpoint_url,
+            aws_access_key_id=settings.r2_access_key_id,
+            aws_secret_access_key=settings.r2_secret_access_key,
+            # Keep-alive connections for the widest fan-out (bulk PUTs or
+            # async workers), plus multipart parts
+            config=Config(
+                max_pool_connections=(
+                    max(settings.storage_max_concurrency, settings.storage_upload_parallelism)
+                    + TRANSFER_CONFIG.max_concurrency
+                ),
+            ),
+        )
+        logger.info("R2 storage client initialized: %s", settings.r2_endpoint_url)
+        return cls(
+            client,
+            settings.r2_bucket,
+            settings.r2_public_url,
+            Credentials(settings.r2_access_key_id, settings.r2_secret_access_key),
+        )
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        """Also maps bucket URLs on the endpoint (path-style or virtual-host) to keys."""
+        key = super().key_for_url(url)
+        endpoint = getattr(self.client.meta, "endpoint_url", None)
+        if key is not None or not isinstance(endpoint, str):
+            return key
+        parts, base = urlsplit(url), urlsplit(endpoint)
+        if parts.scheme != base.scheme:
+            return None
+        if parts.netloc == base.netloc and parts.path.startswith(f"/{self.bucket}/"):
+            key = parts.path[len(self.bucket) + 2:]
+        elif parts.netloc == f"{self.bucket}.{base.netloc}":
+            key = parts.path[1:]
+        return unquote(key) if key else None
+
+    def put(
+        self, key: str, data: BytesLike, content_type: str, metadata: Optional[dict] = None
+    ) -> None:
+        try:
+            self.client.upload_fileobj(
+                ViewReader(data),
+                self.bucket,
+                key,
+                ExtraArgs=self._extra_args(content_type, metadata),
+                Config=TRANSFER_CONFIG,
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def put_small(
+        self, key: str, data: BytesLike, content_type: str, metadata: Optional[dict] = None
+    ) -> None:
+        # Single PUT: no transfer-manager overhead
+        body = data if isinstance(data, bytes) else ViewReader(data)
+        try:
+            self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=body, **self._extra_args(content_type, metadata)
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    @staticmethod
+    def _extra_args(content_type: str, metadata: Optional[dict]) -> dict:
+        extra_args = {"ContentType": content_type}
+        if metadata:
+            extra_args["Metadata"] = metadata
+        return extra_args
+
+    def put_file(self, path: str, key: str) -> None:
+        try:
+            self.client.upload_file(path, self.bucket, key, Config=TRANSFER_CONFIG)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        params = {"Bucket": self.bucket, "Key": key}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        try:
+            return self.client.get_object(**params)["Body"].read()
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise StorageError(str(e)) from e
+        except BotoCoreError as e:
+            raise StorageError(str(e)) from e
+        return ObjectInfo(key, response["ContentLength"], response.get("ContentType"))
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def presigned_get_url(self, key: str, expiration: int, signed_at: Optional[float] = None) -> str:
+        if signed_at is not None and self.credentials is not None:
+            return self._presigned_get_url_at(key, expiration, signed_at)
+        if signed_at is not None:
+            # No credentials to sign with locally: sign now, same expiry
+            expiration = max(1, int(signed_at + expiration - time.time()))
+        try:
+            return self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=expiration,
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def _presigned_get_url_at(self, key: str, expiration: int, signed_at: float) -> str:
+        request = AWSRequest(
+            method="GET",
+            url=f"{self.client.meta.endpoint_url.rstrip('/')}/{self.bucket}/{quote(key, safe='/~')}",
+        )
+        try:
+            _SigV4QueryAuthAt(
+                self.credentials,
+                self.client.meta.region_name,
+                expiration,
+                datetime.fromtimestamp(int(signed_at), timezone.utc),
+            ).add_auth(request)
+        except BotoCoreError as e:
+            raise StorageError(str(e)) from e
+        return request.prepare().url
+
+    supports_multipart = True
+
+    def presigned_put_url(self, key: str, content_type: str, expiration: int) -> str:
+        try:
+            return self.client.generate_presigned_url(
+                "put_object",
+                Params={"Bucket": self.bucket, "Key": key, "ContentType": content_type},
+                ExpiresIn=expiration,
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        try:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=key, ContentType=content_type
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+        return response["UploadId"]
+
+    def presigned_part_url(self, key: str, upload_id: str, part_number: int, expiration: int) -> str:
+        try:
+            return self.client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": self.bucket,
+                    "Key": key,
+                    "UploadId": upload_id,
+                    "PartNumber": part_number,
+                },
+                ExpiresIn=expiration,
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, parts: Sequence[tuple[int, str]]
+    ) -> None:
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": number, "ETag": etag} for number, etag in sorted(parts)
+                    ]
+                },
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+
+class LocalBackend(StorageBackend):
+    """
+    Objects as files under ``root``. Paths fan out by key hash as
+    ``root/ab/cd/<quoted key>`` so no directory grows unbounded, writes
+    are atomic (temp file + rename), and reads go through ``mmap`` so a
+    range read touches only the pages it needs. Served over HTTP by the
+    ``/storage`` router (FileResponse: range requests, sendfile/pathsend
+    where the server supports it), which also accepts HMAC-signed PUTs
+    from ``presigned_put_url`` in place of a bucket's presigned uploads.
+    """
+
+    name = "local"
+    is_local = True
+
+    def __init__(self, root: str, public_url: str = "", signing_key: str = ""):
+        self.root = Path(root)
+        self.public_url = public_url
+        self.signing_key = (signing_key or settings.jwt_secret).encode()
+
+    @classmethod
+    def from_settings(cls) -> "LocalBackend":
+        root = settings.storage_local_root or os.path.join(
+            tempfile.gettempdir(), "neural-canvas-storage"
+        )
+        return cls(root, settings.storage_local_url, settings.jwt_secret)
+
+    def path_for(self, key: str) -> Path:
+        """File path of ``key`` (the key never becomes a path component as-is)."""
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        name = quote(key, safe="")
+        if len(name) > MAX_LOCAL_NAME:
+            name = digest
+        return self.root / digest[:2] / digest[2:4] / name
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator[BinaryIO]:
+        """
+        Temp file that replaces ``key`` atomically when the block exits
+        cleanly (and is discarded if it raises), for streamed writes.
+        """
+        path = self.path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        except OSError as e:
+            raise StorageError(str(e)) from e
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                yield tmp
+            os.replace(tmp_path, path)
+        except BaseException as e:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            if isinstance(e, OSError):
+                raise StorageError(str(e)) from e
+            raise
+
+    def _write(self, key: str, write) -> None:
+        with self.writer(key) as tmp:
+            write(tmp)
+
+    def put(
+        self, key: str, data: BytesLike, content_type: str, metadata: Optional[dict] = None
+    ) -> None:
+        # Content type is derived from the key on read; metadata isn't kept
+        self._write(key, lambda tmp: tmp.write(data))
+
+    def put_file(self, path: str, key: str) -> None:
+        def copy(tmp):
+            with open(path, "rb") as source:
+                shutil.copyfileobj(source, tmp, length=MB)
+        self._write(key, copy)
+
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        try:
+            with open(self.path_for(key), "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size == 0:
+                    return b""
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[start:size if end is None else min(end, size)]
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            size = self.path_for(key).stat().st_size
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise StorageError(str(e)) from e
+        return ObjectInfo(key, size, mimetypes.guess_type(key)[0] or "application/octet-stream")
+
+    def delete(self, key: str) -> None:
+        try:
+            self.path_for(key).unlink(missing_ok=True)
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def presigned_get_url(self, key: str, expiration: int, signed_at: Optional[float] = None) -> str:
+        # Local objects are public, like the R2 bucket behind public_url
+        return self.url_for(key)
+
+    def put_signature(self, key: str, expires: int) -> str:
+        message = f"PUT\n{key}\n{expires}".encode()
+        return hmac.new(self.signing_key, message, hashlib.sha256).hexdigest()
+
+    def verify_put(self, key: str, expires: int, signature: str) -> bool:
+        """True if ``signature`` authorizes a PUT of ``key`` and hasn't expired."""
+        return expires >= time.time() and hmac.compare_digest(
+            self.put_signature(key, expires), signature
+        )
+
+    def presigned_put_url(self, key: str, content_type: str, expiration: int) -> str:
+        # Accepted by PUT /storage/{key}, the local stand-in for a bucket PUT
+        expires = int(time.time()) + expiration
+        query = urlencode({"expires": expires, "signature": self.put_signature(key, expires)})
+        return f"{self.url_for(key)}?{query}"
+
+
+def create_backend() -> Optional[StorageBackend]:
+    """
+    Backend for ``settings.storage_backend``: "s3", "local", or "auto"
+    (S3 when R2 credentials are configured). None when S3 is not
+    configured (uploads disabled). The local backend serves objects
+    unauthenticated, so it is only used when chosen explicitly.
+    """
+    has_credentials = bool(
+        settings.r2_access_key_id and settings.r2_secret_access_key and settings.r2_endpoint_url
+    )
+    if settings.storage_backend == "local":
+        backend = LocalBackend.from_settings()
+        logger.warning("Using local storage at %s (%s)", backend.root, backend.public_url)
+        return backend
+    if not has_credentials:
+        logger.warning(
+            "R2 credentials not configured, uploads disabled "
+            "(set STORAGE_BACKEND=local for development storage)"
+        )
+        return None
+    return S3Backend.from_settings()
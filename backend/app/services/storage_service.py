@@ -2,161 +2,504 @@
 Neural Canvas Backend - Cloud Storage Service
 Implements S3-compatible file uploads (Cloudflare R2, AWS S3, Backblaze B2)
 per Context7/boto3 best practices:
+- Pluggable backends: R2/S3, or the local filesystem for offline runs
 - Multipart uploads for large files
 - Progress tracking
 - Retry logic with TransferConfig
+- Async counterparts (``*_async``) on a bounded, dedicated thread pool
+- Parallel bulk PUTs for many small objects (``upload_many``)
+- Presigned direct client uploads, multipart for large files
 """
 
+import asyncio
+import functools
 import logging
-from typing import Optional
-from io import BytesIO
-
-import boto3
-from botocore.exceptions import ClientError
-from boto3.s3.transfer import TransferConfig
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
 
 from app.config import settings
+from app.services.buffer_pool import BytesLike
+from app.services.storage_backends import (
+    MB,
+    TRANSFER_CONFIG,
+    ObjectInfo,
+    StorageBackend,
+    StorageError,
+    create_backend,
+)
 
 logger = logging.getLogger(__name__)
 
+MAX_UPLOAD_PARTS = 10_000
 
-# Multipart threshold: 50MB (per Context7 best practices)
-MB = 1024 * 1024
-TRANSFER_CONFIG = TransferConfig(
-    multipart_threshold=50 * MB,
-    max_concurrency=10,
-    multipart_chunksize=10 * MB,
-    use_threads=True,
-)
+
+@dataclass
+class UploadItem:
+    """One object for ``upload_many``."""
+    object_key: str
+    data: BytesLike
+    content_type: str = "image/jpeg"
+    metadata: Optional[dict] = None
+
+
+@dataclass
+class UploadResult:
+    object_key: str
+    url: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.url is not None
+
+
+@dataclass
+class BulkUploadReport:
+    """Per-object results (in input order) and aggregate throughput."""
+    results: list[UploadResult] = field(default_factory=list)
+    total_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for result in self.results if result.ok)
+
+    @property
+    def failed(self) -> list[UploadResult]:
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def objects_per_second(self) -> float:
+        return len(self.results) / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.total_bytes / MB / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class DirectUpload:
+    """
+    Where a client uploads an object itself: one presigned PUT
+    (``url``), or a multipart upload (``upload_id``) with one presigned
+    URL per ``part_size`` chunk in ``part_urls`` (part numbers from 1).
+    """
+    object_key: str
+    url: Optional[str] = None
+    upload_id: Optional[str] = None
+    part_size: Optional[int] = None
+    part_urls: list[str] = field(default_factory=list)
 
 
 class StorageService:
     """
-    Cloud storage service for processed images.
-    Configured for Cloudflare R2 (S3-compatible).
+    Cloud storage service for processed images, over a pluggable backend
+    (Cloudflare R2 / S3, or the local filesystem; see ``storage_backends``).
     """
 
-    def __init__(self):
-        self.s3_client = None
-        self.bucket = settings.r2_bucket
-        self.public_url = settings.r2_public_url
-        self._initialize_client()
-
-    def _initialize_client(self):
-        """Initialize S3-compatible client for R2."""
-        if settings.r2_access_key_id and settings.r2_secret_access_key and settings.r2_endpoint_url:
-            self.s3_client = boto3.client(
-                "s3",
-                region_name="auto",
-                endpoint_url=settings.r2_endpoint_url,
-                aws_access_key_id=settings.r2_access_key_id,
-                aws_secret_access_key=settings.r2_secret_access_key,
-            )
-            logger.info("R2 storage client initialized: %s", settings.r2_endpoint_url)
-        else:
-            logger.warning("R2 credentials not configured, uploads disabled")
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend if backend is not None else create_backend()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._bulk_executor: Optional[ThreadPoolExecutor] = None
+        self._bulk_lock = threading.Lock()
+
+    @property
+    def public_url(self) -> str:
+        return self.backend.public_url if self.backend else ""
+
+    def owns_url(self, url: str) -> bool:
+        """
+        True if ``url`` is one of our objects: a public URL, a bucket URL
+        or a stored key (safe to fetch server-side, see ``local_key``).
+        """
+        return self.object_key(url) is not None
+
+    def object_key(self, url: str) -> Optional[str]:
+        """Object key behind an owned URL or stored key (None for foreign URLs)."""
+        return self.backend.key_for_url(url) if self.backend else None
+
+    def local_key(self, url: str) -> Optional[str]:
+        """
+        Object key for an owned URL that is read through the backend, not
+        over HTTP: everything on the local backend, and anything outside
+        the public URL (private buckets, where URLs are stored as keys).
+        """
+        key = self.object_key(url)
+        if key is None or (not self.backend.is_local and self.backend.is_public_url(url)):
+            return None
+        return key
 
     def upload_image(
         self,
-        image_bytes: bytes,
+        image_bytes: BytesLike,
         object_key: str,
         content_type: str = "image/jpeg",
         metadata: Optional[dict] = None,
     ) -> Optional[str]:
         """
-        Upload image bytes to R2.
+        Upload image bytes. Accepts any bytes-like object, e.g. a pooled
+        encode buffer's ``view``, and streams it without a copy.
         
         Returns:
             Public URL if successful, None on failure
         """
-        if not self.s3_client:
-            logger.error("R2 client not initialized")
+        if not self.backend:
+            logger.error("Storage backend not configured")
             return None
 
         try:
-            extra_args = {"ContentType": content_type}
-            if metadata:
-                extra_args["Metadata"] = metadata
-
-            self.s3_client.upload_fileobj(
-                BytesIO(image_bytes),
-                self.bucket,
-                object_key,
-                ExtraArgs=extra_args,
-                Config=TRANSFER_CONFIG,
-            )
+            self.backend.put(object_key, image_bytes, content_type, metadata)
+        except StorageError as e:
+            logger.error("Upload failed: %s", e)
+            return None
 
-            url = f"{self.public_url}/{object_key}" if self.public_url else object_key
-            logger.info("Uploaded to R2: %s", url)
-            return url
+        url = self.backend.url_for(object_key)
+        logger.info("Uploaded to %s: %s", self.backend.name, url)
+        return url
 
-        except ClientError as e:
-            logger.error("R2 upload failed: %s", e)
-            return None
+    def _put_small(self, item: UploadItem) -> UploadResult:
+        """Single PUT (no transfer-manager overhead) for one small object."""
+        try:
+            self.backend.put_small(item.object_key, item.data, item.content_type, item.metadata)
+            return UploadResult(item.object_key, url=self.backend.url_for(item.object_key))
+        except Exception as e:
+            return UploadResult(item.object_key, error=str(e))
+
+    def _upload_item(self, item: UploadItem) -> UploadResult:
+        if len(item.data) >= TRANSFER_CONFIG.multipart_threshold:
+            url = self.upload_image(item.data, item.object_key, item.content_type, item.metadata)
+            return UploadResult(item.object_key, url=url, error=None if url else "Upload failed")
+        return self._put_small(item)
+
+    def _bulk_pool(self) -> ThreadPoolExecutor:
+        """Long-lived pool shared by every ``upload_many`` call (created on first use)."""
+        with self._bulk_lock:
+            if self._bulk_executor is None:
+                self._bulk_executor = ThreadPoolExecutor(
+                    max_workers=settings.storage_upload_parallelism,
+                    thread_name_prefix="storage-bulk",
+                )
+            return self._bulk_executor
+
+    def _start_report(self, items: Sequence[UploadItem]) -> BulkUploadReport:
+        report = BulkUploadReport(total_bytes=sum(len(item.data) for item in items))
+        if items and not self.backend:
+            logger.error("Storage backend not configured")
+            report.results = [
+                UploadResult(item.object_key, error="Storage not configured") for item in items
+            ]
+        return report
+
+    def _finish_report(self, report: BulkUploadReport, started: float) -> BulkUploadReport:
+        report.seconds = time.perf_counter() - started
+        logger.info(
+            "Bulk upload: %d/%d objects, %.1f MB in %.2fs (%.0f objects/s, %.1f MB/s)",
+            report.succeeded, len(report.results), report.total_bytes / MB, report.seconds,
+            report.objects_per_second, report.megabytes_per_second,
+        )
+        for result in report.failed:
+            logger.error("Upload failed for %s: %s", result.object_key, result.error)
+        return report
+
+    def upload_many(
+        self,
+        items: Sequence[UploadItem],
+        parallelism: Optional[int] = None,
+    ) -> BulkUploadReport:
+        """
+        Upload many objects in parallel over the client's shared
+        connection pool. Small objects (thumbnails, renditions) go out as
+        plain PUTs on a long-lived pool of ``storage_upload_parallelism``
+        threads, at most ``parallelism`` of this call's at a time;
+        anything above the multipart threshold uses the regular transfer
+        path. Failures are reported per object, never raised.
+        """
+        report = self._start_report(items)
+        if not items or report.results:
+            return report
+
+        pool = self._bulk_pool()
+        in_flight = threading.BoundedSemaphore(max(1, parallelism or settings.storage_upload_parallelism))
+        started = time.perf_counter()
+        futures = []
+        for item in items:
+            in_flight.acquire()
+            future = pool.submit(self._upload_item, item)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+        report.results = [future.result() for future in futures]
+        return self._finish_report(report, started)
 
     def upload_file(
         self,
         file_path: str,
         object_key: Optional[str] = None,
     ) -> Optional[str]:
-        """Upload a file from disk to R2."""
-        import os
-        
-        if not self.s3_client:
-            logger.error("R2 client not initialized")
+        """Upload a file from disk."""
+        if not self.backend:
+            logger.error("Storage backend not configured")
             return None
 
         if object_key is None:
             object_key = os.path.basename(file_path)
 
         try:
-            self.s3_client.upload_file(
-                file_path,
-                self.bucket,
-                object_key,
-                Config=TRANSFER_CONFIG,
-            )
-            
-            url = f"{self.public_url}/{object_key}" if self.public_url else object_key
-            logger.info("Uploaded file to R2: %s", url)
-            return url
-
-        except ClientError as e:
-            logger.error("R2 file upload failed: %s", e)
+            self.backend.put_file(file_path, object_key)
+        except StorageError as e:
+            logger.error("File upload failed: %s", e)
             return None
 
+        url = self.backend.url_for(object_key)
+        logger.info("Uploaded file to %s: %s", self.backend.name, url)
+        return url
+
+    def read_object(self, object_key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        Bytes ``[start, end)`` of an object (a ranged GET on S3, an mmap
+        slice locally). Raises StorageError if it's missing or unreadable.
+        """
+        if not self.backend:
+            raise StorageError("Storage not configured")
+        return self.backend.get(object_key, start, end)
+
+    def head_object(self, object_key: str) -> Optional[ObjectInfo]:
+        """Size and content type of an object, or None if it doesn't exist."""
+        if not self.backend:
+            raise StorageError("Storage not configured")
+        return self.backend.head(object_key)
+
     def delete_object(self, object_key: str) -> bool:
-        """Delete an object from R2."""
-        if not self.s3_client:
+        """Delete an object."""
+        if not self.backend:
             return False
 
         try:
-            self.s3_client.delete_object(Bucket=self.bucket, Key=object_key)
-            logger.info("Deleted from R2: %s", object_key)
+            self.backend.delete(object_key)
+            logger.info("Deleted from %s: %s", self.backend.name, object_key)
             return True
-        except ClientError as e:
-            logger.error("R2 delete failed: %s", e)
+        except StorageError as e:
+            logger.error("Delete failed: %s", e)
             return False
 
     def generate_presigned_url(
         self,
         object_key: str,
         expiration: int = 3600,
+        signed_at: Optional[float] = None,
     ) -> Optional[str]:
-        """Generate a presigned URL for temporary access."""
-        if not self.s3_client:
+        """
+        Generate a presigned URL for temporary access, valid for
+        ``expiration`` seconds from ``signed_at`` (default now).
+        """
+        if not self.backend:
             return None
 
         try:
-            return self.s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": self.bucket, "Key": object_key},
-                ExpiresIn=expiration,
-            )
-        except ClientError as e:
+            return self.backend.presigned_get_url(object_key, expiration, signed_at)
+        except StorageError as e:
             logger.error("Presigned URL generation failed: %s", e)
             return None
 
+    def generate_presigned_urls(
+        self,
+        object_keys: Sequence[str],
+        expiration: int = 3600,
+        signed_at: Optional[float] = None,
+    ) -> list[Optional[str]]:
+        """Presigned URLs for many objects (in order; None where signing failed)."""
+        return [self.generate_presigned_url(key, expiration, signed_at) for key in object_keys]
+
+    # === DIRECT CLIENT UPLOADS ===
+
+    def create_direct_upload(
+        self,
+        object_key: str,
+        content_type: str,
+        size: int,
+        expiration: int = 3600,
+    ) -> DirectUpload:
+        """
+        Presigned upload target for a client-side upload of ``size`` bytes,
+        so the payload never passes through the API. Objects at or above
+        the multipart threshold get part URLs (if the backend supports
+        multipart). Raises StorageError.
+        """
+        if not self.backend:
+            raise StorageError("Storage not configured")
+        if size < TRANSFER_CONFIG.multipart_threshold or not self.backend.supports_multipart:
+            return DirectUpload(
+                object_key, url=self.backend.presigned_put_url(object_key, content_type, expiration)
+            )
+
+        # At most 10,000 parts per upload (S3 limit)
+        part_size = max(settings.upload_part_bytes, -(-size // MAX_UPLOAD_PARTS))
+        upload_id = self.backend.create_multipart_upload(object_key, content_type)
+        part_urls = [
+            self.backend.presigned_part_url(object_key, upload_id, number, expiration)
+            for number in range(1, -(-size // part_size) + 1)
+        ]
+        return DirectUpload(object_key, upload_id=upload_id, part_size=part_size, part_urls=part_urls)
+
+    def complete_direct_upload(
+        self,
+        object_key: str,
+        upload_id: Optional[str] = None,
+        parts: Sequence[tuple[int, str]] = (),
+    ) -> Optional[ObjectInfo]:
+        """
+        Finish a client upload (assembling multipart parts if
+        ``upload_id`` is given) and HEAD the result: None if no object
+        arrived. Raises StorageError.
+        """
+        if not self.backend:
+            raise StorageError("Storage not configured")
+        if upload_id:
+            self.backend.complete_multipart_upload(object_key, upload_id, parts)
+        return self.backend.head(object_key)
+
+    def abort_direct_upload(self, object_key: str, upload_id: Optional[str] = None) -> None:
+        """Discard a client upload (parts of a multipart upload, or the object)."""
+        if not self.backend:
+            raise StorageError("Storage not configured")
+        if upload_id:
+            self.backend.abort_multipart_upload(object_key, upload_id)
+        else:
+            self.backend.delete(object_key)
+
+    # === ASYNC API ===
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Run a blocking backend call on the storage thread pool. The pool size
+        (``storage_max_concurrency``) bounds concurrent storage operations; the
+        event loop keeps serving requests meanwhile.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.storage_max_concurrency,
+                thread_name_prefix="storage",
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def upload_image_async(
+        self,
+        image_bytes: BytesLike,
+        object_key: str,
+        content_type: str = "image/jpeg",
+        metadata: Optional[dict] = None,
+    ) -> Optional[str]:
+        """Non-blocking ``upload_image``."""
+        return await self._run(self.upload_image, image_bytes, object_key, content_type, metadata)
+
+    async def upload_many_async(
+        self,
+        items: Sequence[UploadItem],
+        parallelism: Optional[int] = None,
+    ) -> BulkUploadReport:
+        """
+        Non-blocking ``upload_many``: each PUT runs on the storage thread
+        pool, so bulk uploads share the ``storage_max_concurrency`` bound
+        with every other async storage call.
+        """
+        report = self._start_report(items)
+        if not items or report.results:
+            return report
+
+        in_flight = asyncio.Semaphore(max(1, parallelism or settings.storage_upload_parallelism))
+
+        async def upload(item: UploadItem) -> UploadResult:
+            async with in_flight:
+                return await self._run(self._upload_item, item)
+
+        started = time.perf_counter()
+        report.results = list(await asyncio.gather(*(upload(item) for item in items)))
+        return self._finish_report(report, started)
+
+    async def read_object_async(
+        self,
+        object_key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> bytes:
+        """Non-blocking ``read_object``."""
+        return await self._run(self.read_object, object_key, start, end)
+
+    async def head_object_async(self, object_key: str) -> Optional[ObjectInfo]:
+        """Non-blocking ``head_object``."""
+        return await self._run(self.head_object, object_key)
+
+    async def upload_file_async(
+        self,
+        file_path: str,
+        object_key: Optional[str] = None,
+    ) -> Optional[str]:
+        """Non-blocking ``upload_file``."""
+        return await self._run(self.upload_file, file_path, object_key)
+
+    async def delete_object_async(self, object_key: str) -> bool:
+        """Non-blocking ``delete_object``."""
+        return await self._run(self.delete_object, object_key)
+
+    async def generate_presigned_url_async(
+        self,
+        object_key: str,
+        expiration: int = 3600,
+        signed_at: Optional[float] = None,
+    ) -> Optional[str]:
+        """Non-blocking ``generate_presigned_url``."""
+        return await self._run(self.generate_presigned_url, object_key, expiration, signed_at)
+
+    async def generate_presigned_urls_async(
+        self,
+        object_keys: Sequence[str],
+        expiration: int = 3600,
+        signed_at: Optional[float] = None,
+    ) -> list[Optional[str]]:
+        """Non-blocking ``generate_presigned_urls`` (one pool hop for the batch)."""
+        return await self._run(self.generate_presigned_urls, object_keys, expiration, signed_at)
+
+    async def create_direct_upload_async(
+        self,
+        object_key: str,
+        content_type: str,
+        size: int,
+        expiration: int = 3600,
+    ) -> DirectUpload:
+        """Non-blocking ``create_direct_upload``."""
+        return await self._run(self.create_direct_upload, object_key, content_type, size, expiration)
+
+    async def complete_direct_upload_async(
+        self,
+        object_key: str,
+        upload_id: Optional[str] = None,
+        parts: Sequence[tuple[int, str]] = (),
+    ) -> Optional[ObjectInfo]:
+        """Non-blocking ``complete_direct_upload``."""
+        return await self._run(self.complete_direct_upload, object_key, upload_id, parts)
+
+    async def abort_direct_upload_async(
+        self,
+        object_key: str,
+        upload_id: Optional[str] = None,
+    ) -> None:
+        """Non-blocking ``abort_direct_upload``."""
+        return await self._run(self.abort_direct_upload, object_key, upload_id)
+
+    def shutdown(self) -> None:
+        """Stop the storage thread pools (in-flight calls finish first)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._bulk_lock:
+            if self._bulk_executor is not None:
+                self._bulk_executor.shutdown(wait=True)
+                self._bulk_executor = None
+
 
 # Singleton instance
 storage_service = StorageService()
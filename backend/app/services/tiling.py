@@ -0,0 +1,142 @@
+"""
+Neural Canvas Backend - Tiled Processing
+Memory-bounded variants of filters and resizes for very large images.
+Work happens on full-width horizontal strips of at most
+``image_tile_max_pixels`` pixels (plus overlap for spatial filters) and is
+composed into a pre-allocated output, so besides the decoded source only
+one strip and the output are resident (no full-size copies or mode
+conversions).
+"""
+
+import math
+from typing import Iterator, Optional, Sequence
+
+from PIL import Image
+
+from app.config import settings
+from app.services import filters
+
+# Resampling support (in output pixels) of LANCZOS, plus a rounding row
+LANCZOS_SUPPORT = 3
+
+
+def should_tile(image: Image.Image) -> bool:
+    """True above the configured megapixel threshold."""
+    return image.width * image.height > settings.image_tile_threshold_mp * 1_000_000
+
+
+def strip_rows(width: int, margin: int = 0, multiple: int = 1) -> int:
+    """Rows per strip so a strip plus its margins stays within the pixel cap."""
+    rows = settings.image_tile_max_pixels // max(1, width) - 2 * margin
+    rows = max(multiple, rows - rows % multiple)
+    return rows
+
+
+def strips(height: int, rows: int) -> Iterator[tuple[int, int]]:
+    """(top, bottom) row ranges covering ``height``."""
+    for top in range(0, height, rows):
+        yield top, min(height, top + rows)
+
+
+def _output_mode(image: Image.Image, mode: Optional[str]) -> str:
+    if mode is not None:
+        return mode
+    if image.mode in ("RGBA", "LA", "PA") or image.has_transparency_data:
+        return "RGBA"
+    return "RGB"
+
+
+def apply_ops_tiled(image: Image.Image, ops: Sequence[filters.FilterOp]) -> Image.Image:
+    """
+    Run fused filter passes strip by strip. Each strip carries enough
+    overlap for the spatial passes in the chain, which is cropped off
+    before pasting, so the result matches a whole-image run.
+    """
+    if not ops:
+        return image
+    margin = sum(filters.margin(op) for op in ops)
+    rows = strip_rows(image.width, margin)
+    output: Optional[Image.Image] = None
+    for top, bottom in strips(image.height, rows):
+        context_top = max(0, top - margin)
+        context_bottom = min(image.height, bottom + margin)
+        band = image.crop((0, context_top, image.width, context_bottom))
+        for op in ops:
+            band = filters.apply_op(band, op)
+        band = band.crop((0, top - context_top, image.width, bottom - context_top))
+        if output is None:
+            output = Image.new(band.mode, image.size)
+        output.paste(band, (0, top))
+    return output
+
+
+def reduce_tiled(
+    image: Image.Image,
+    factor: int,
+    mode: Optional[str] = None,
+    box: Optional[tuple[int, int, int, int]] = None,
+) -> Image.Image:
+    """
+    ``Image.reduce(factor)`` of ``box`` (default: whole image) in strips.
+    Box reduction has no overlap, so strips aligned to multiples of
+    ``factor`` give an identical result.
+    """
+    mode = _output_mode(image, mode)
+    left, top, right, bottom = box or (0, 0, image.width, image.height)
+    width, height = right - left, bottom - top
+    rows = strip_rows(width, multiple=factor)
+    output = Image.new(mode, (math.ceil(width / factor), math.ceil(height / factor)))
+    for strip_top, strip_bottom in strips(height, rows):
+        band = image.crop((left, top + strip_top, right, top + strip_bottom))
+        if band.mode != mode:
+            band = band.convert(mode)
+        output.paste(band.reduce(factor), (0, strip_top // factor))
+    return output
+
+
+def resize_tiled(
+    image: Image.Image,
+    size: tuple[int, int],
+    mode: Optional[str] = None,
+    reducing_gap: float = 2.0,
+    box: Optional[tuple[int, int, int, int]] = None,
+) -> Image.Image:
+    """
+    LANCZOS resize of ``box`` (default: whole image) to ``size`` in
+    strips, converted to ``mode`` (RGB, or RGBA when the source has
+    alpha). Large downscales first reduce by an integer factor in strips
+    (as ``reducing_gap`` does); the remaining resample works on output
+    bands with source overlap for the filter support.
+    """
+    mode = _output_mode(image, mode)
+    left, top, right, bottom = box or (0, 0, image.width, image.height)
+    width, height = right - left, bottom - top
+    factor = int(min(width / size[0], height / size[1]) / reducing_gap)
+    if factor >= 2:
+        image = reduce_tiled(image, factor, mode, (left, top, right, bottom))
+        left, top, right, bottom = 0, 0, image.width, image.height
+        width, height = image.size
+        if not should_tile(image):
+            return image.resize(size, Image.Resampling.LANCZOS)
+
+    scale_y = height / size[1]
+    margin = math.ceil(LANCZOS_SUPPORT * max(1.0, scale_y)) + 1
+    source_rows = strip_rows(width, margin)
+    band_rows = max(1, int(source_rows / scale_y))
+
+    output = Image.new(mode, size)
+    for out_top, out_bottom in strips(size[1], band_rows):
+        src_top = top + out_top * scale_y
+        src_bottom = top + out_bottom * scale_y
+        context_top = max(top, math.floor(src_top) - margin)
+        context_bottom = min(bottom, math.ceil(src_bottom) + margin)
+        band = image.crop((left, context_top, right, context_bottom))
+        if band.mode != mode:
+            band = band.convert(mode)
+        part = band.resize(
+            (size[0], out_bottom - out_top),
+            Image.Resampling.LANCZOS,
+            box=(0, src_top - context_top, width, src_bottom - context_top),
+        )
+        output.paste(part, (0, out_top))
+    return output
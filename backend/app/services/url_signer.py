@@ -0,0 +1,128 @@
+"""
+Neural Canvas Backend - Presigned URL Cache
+Read URLs for a private bucket, signed once per (object key, expiry
+window) and reused until the window ends. URLs are signed as of the
+window's start, so a given asset has the same URL for ``storage_url_ttl``
+seconds in every API process (and after cache eviction): browser and CDN
+caches hit instead of seeing a fresh signature on every listing, and a
+100-item page costs at most one batch of signings (run off the event
+loop) rather than 100.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from app.config import settings
+from app.services.storage_service import StorageService, storage_service
+
+
+class UrlSigner:
+    """
+    Per-process LRU of presigned GET URLs.
+
+    Time is split into windows of ``window`` seconds. A URL for window
+    ``n`` is signed at the start of window ``n`` to expire at the end of
+    window ``n + 1``, and is served only until window ``n`` ends, so every
+    URL handed out has at least ``window`` seconds of validity left. The
+    cache only saves signing work; the URLs themselves depend on nothing
+    but the key and the window.
+    """
+
+    def __init__(
+        self,
+        storage: StorageService,
+        window: int,
+        max_entries: int,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.storage = storage
+        self.window = window
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # object key -> (window index, signed URL)
+        self._entries: OrderedDict[str, tuple[int, str]] = OrderedDict()
+
+    def _lookup(self, key: str, window: int) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != window:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: str, window: int, url: str) -> None:
+        self._entries[key] = (window, url)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _signing(self, window: int) -> tuple[int, int]:
+        """Expiration and signing time shared by every URL of ``window``."""
+        return 2 * self.window, window * self.window
+
+    def _split(self, keys: Iterable[str]) -> tuple[dict[str, str], list[str], int]:
+        """Cached URLs, keys still to sign (deduplicated), and the current window."""
+        window = int(self.clock() // self.window)
+        signed, missing = {}, []
+        for key in dict.fromkeys(keys):
+            url = self._lookup(key, window)
+            if url is None:
+                missing.append(key)
+            else:
+                signed[key] = url
+        self.hits += len(signed)
+        self.misses += len(missing)
+        return signed, missing, window
+
+    def _merge(
+        self, signed: dict[str, str], keys: list[str], urls: list[Optional[str]], window: int
+    ) -> dict[str, str]:
+        for key, url in zip(keys, urls):
+            if url is not None:  # Failures aren't cached; the next request retries
+                self._store(key, window, url)
+                signed[key] = url
+        return signed
+
+    def sign_many(self, keys: Iterable[str]) -> dict[str, str]:
+        """Presigned URLs for ``keys``; keys that failed to sign are omitted."""
+        signed, missing, window = self._split(keys)
+        if missing:
+            urls = self.storage.generate_presigned_urls(missing, *self._signing(window))
+            signed = self._merge(signed, missing, urls, window)
+        return signed
+
+    async def sign_many_async(self, keys: Iterable[str]) -> dict[str, str]:
+        """``sign_many`` with all cache misses signed in one storage-pool call."""
+        signed, missing, window = self._split(keys)
+        if missing:
+            urls = await self.storage.generate_presigned_urls_async(
+                missing, *self._signing(window)
+            )
+            signed = self._merge(signed, missing, urls, window)
+        return signed
+
+    def sign(self, key: str) -> Optional[str]:
+        return self.sign_many([key]).get(key)
+
+    async def sign_urls_async(self, urls: Iterable[Optional[str]]) -> dict[str, str]:
+        """
+        Map public URLs in our bucket to presigned ones. URLs we don't own
+        (or that failed to sign) are left out, so callers keep the original.
+        """
+        keys = {}
+        for url in urls:
+            key = self.storage.object_key(url) if url else None
+            if key is not None:
+                keys[url] = key
+        signed = await self.sign_many_async(keys.values())
+        return {url: signed[key] for url, key in keys.items() if key in signed}
+
+
+# Singleton instance (per process)
+url_signer = UrlSigner(
+    storage_service,
+    window=settings.storage_url_ttl,
+    max_entries=settings.url_signer_max_entries,
+)
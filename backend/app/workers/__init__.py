@@ -3,7 +3,11 @@
 from app.workers.celery_config import celery_app
 from app.workers.tasks import (
     analyze_image,
+    analyze_images,
+    analyze_pending_images,
     generate_thumbnail,
+    generate_renditions,
+    generate_renditions_batch,
     process_batch,
     cleanup_expired_jobs,
 )
@@ -11,7 +15,11 @@ from app.workers.tasks import (
 __all__ = [
     "celery_app",
     "analyze_image",
+    "analyze_images",
+    "analyze_pending_images",
     "generate_thumbnail",
+    "generate_renditions",
+    "generate_renditions_batch",
     "process_batch",
     "cleanup_expired_jobs",
 ]
@@ -47,8 +47,12 @@ celery_app.conf.update(
     # Task routing
     task_routes={
         "app.workers.tasks.analyze_image": {"queue": "ai"},
+        "app.workers.tasks.analyze_images": {"queue": "ai"},
+        "app.workers.tasks.analyze_pending_images": {"queue": "ai"},
         "app.workers.tasks.process_batch": {"queue": "processing"},
         "app.workers.tasks.generate_thumbnail": {"queue": "low"},
+        "app.workers.tasks.generate_renditions": {"queue": "processing"},
+        "app.workers.tasks.generate_renditions_batch": {"queue": "processing"},
     },
 )
 
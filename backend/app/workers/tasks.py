@@ -4,58 +4,221 @@ Background tasks for image processing, AI analysis, and batch operations.
 Per Context7: Proper retry logic, error handling, and progress tracking.
 """
 
+import asyncio
+import io
+import json
+from typing import Optional
+
 from celery import shared_task
+from celery.signals import worker_process_init, worker_process_shutdown
 from celery.utils.log import get_task_logger
+from celery.utils.time import get_exponential_backoff_interval
+from PIL import Image
 
 logger = get_task_logger(__name__)
 
+# One event loop per worker process, so the shared HTTP client's pooled
+# connections (bound to the loop that opened them) survive across tasks.
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _run(coro):
+    """Run a coroutine on this worker process's persistent event loop."""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+# Micro-batch queue for analyze_image (Redis list of JSON items)
+PENDING_ANALYSIS_KEY = "analysis:pending"
+FLUSH_SCHEDULED_KEY = "analysis:flush-scheduled"
+
+_redis_client = None
+
+
+def _redis():
+    """Shared synchronous Redis client for queue bookkeeping."""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        from app.config import settings
+        _redis_client = redis.Redis.from_url(settings.redis_url)
+    return _redis_client
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Open the pooled HTTP client when a worker process starts."""
+    from app.services.http_client import get_http_client
+    get_http_client()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Close pooled connections and the loop when a worker process exits."""
+    from app.services.http_client import close_http_client
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _worker_loop.run_until_complete(close_http_client())
+        _worker_loop.close()
+
 
 @shared_task(
     bind=True,
     autoretry_for=(Exception,),
     retry_backoff=True,
+    retry_backoff_max=300,
+    retry_jitter=True,  # 429s are absorbed by the Gemini gateway; avoid lockstep retries
     retry_kwargs={"max_retries": 3},
     name="app.workers.tasks.analyze_image",
 )
 def analyze_image(self, asset_id: str, image_url: str):
     """
-    Analyze an image with Gemini AI.
-    Per Context7: Uses exponential backoff retry.
+    Queue an image for Gemini analysis in the next micro-batch.
+    A batch is dispatched as soon as GEMINI_BATCH_SIZE images are pending,
+    otherwise after GEMINI_BATCH_MAX_WAIT seconds. The result (tags,
+    caption) is written to the Asset row by ``analyze_images``, which sets
+    ``analyzed`` (or ``processing_status="failed"`` once retries run out).
     
     Args:
         asset_id: Database asset ID
         image_url: URL to the image
     """
-    logger.info(f"[TASK] Analyzing image: {asset_id}")
+    logger.info(f"[TASK] Queueing analysis: {asset_id}")
+    
+    from app.config import settings
+    
+    client = _redis()
+    pending = client.rpush(
+        PENDING_ANALYSIS_KEY, json.dumps({"asset_id": asset_id, "image_url": image_url})
+    )
+    if pending >= settings.gemini_batch_size:
+        analyze_pending_images.delay()
+    elif client.set(
+        FLUSH_SCHEDULED_KEY, 1, nx=True, px=int(settings.gemini_batch_max_wait * 1000)
+    ):
+        analyze_pending_images.apply_async(countdown=settings.gemini_batch_max_wait)
+    
+    return {"asset_id": asset_id, "status": "queued", "pending": pending}
+
+
+@shared_task(name="app.workers.tasks.analyze_pending_images")
+def analyze_pending_images():
+    """
+    Drain one micro-batch of queued analyses and dispatch it as an
+    ``analyze_images`` task (so its retries apply). Re-dispatches itself
+    while more work is pending.
+    """
+    from app.config import settings
     
+    client = _redis()
+    raw = client.lpop(PENDING_ANALYSIS_KEY, settings.gemini_batch_size) or []
+    if client.llen(PENDING_ANALYSIS_KEY):
+        analyze_pending_images.delay()
+    if not raw:
+        return {"status": "completed", "dispatched": 0}
     try:
-        # Import here to avoid circular imports
-        from app.services.image_processor import image_processor
-        from app.services.storage_service import storage_service
-        import asyncio
-        
-        # Download image
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        image = loop.run_until_complete(image_processor.download_image(image_url))
-        
-        # Analyze with Gemini
-        analysis = loop.run_until_complete(image_processor.analyze_with_gemini(image))
-        loop.close()
-        
-        logger.info(f"[TASK] Analysis complete for {asset_id}: {len(analysis.get('tags', []))} tags")
-        
-        return {
-            "asset_id": asset_id,
-            "status": "completed",
+        result = analyze_images.delay([json.loads(item) for item in raw])
+    except Exception as e:
+        # Couldn't hand the batch over: put it back at the head of the queue
+        client.lpush(PENDING_ANALYSIS_KEY, *reversed(raw))
+        logger.error(f"[TASK] Dispatching {len(raw)} analyses failed, requeued: {e}")
+        raise
+    return {"status": "dispatched", "dispatched": len(raw), "task_id": result.id}
+
+
+async def _save_analyses(completed: list, failed: list) -> None:
+    """Write analysis results to the Asset rows (failed ones are marked as such)."""
+    from app.database import async_session_maker
+    from app.crud.asset import set_asset_analysis, set_asset_status
+    
+    async with async_session_maker() as db:
+        for asset_id, analysis in completed:
+            await set_asset_analysis(db, asset_id, analysis)
+        for asset_id in failed:
+            await set_asset_status(db, asset_id, "failed")
+        await db.commit()
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_jitter=True,  # 429s are absorbed by the Gemini gateway; avoid lockstep retries
+    retry_kwargs={"max_retries": 3},
+    name="app.workers.tasks.analyze_images",
+)
+def analyze_images(self, items: list):
+    """
+    Analyze a micro-batch of images with multi-image Gemini requests and
+    store each result on its Asset row. Items that failed (download or
+    Gemini errors come back per item) are retried on their own with
+    exponential backoff; after the last retry they are marked failed.
+    
+    Args:
+        items: [{"asset_id": ..., "image_url": ...}, ...]
+    """
+    logger.info(f"[TASK] Analyzing {len(items)} images")
+    
+    # Import here to avoid circular imports
+    from app.services.image_processor import image_processor
+    
+    async def download_and_analyze():
+        downloads = await asyncio.gather(
+            *(image_processor.download_bytes(item["image_url"]) for item in items),
+            return_exceptions=True,
+        )
+        sources = [data for data in downloads if not isinstance(data, BaseException)]
+        analyses = iter(await image_processor.analyze_sources(sources))
+        return [
+            {"error": f"Download failed: {data}", "tags": [], "caption": None}
+            if isinstance(data, BaseException) else next(analyses)
+            for data in downloads
+        ]
+    
+    try:
+        analyses = _run(download_and_analyze())
+    except Exception as e:
+        logger.error(f"[TASK] Batch analysis failed for {len(items)} images: {e}")
+        raise  # Re-raise for Celery retry
+    
+    # Error results (whole-batch 429/5xx included) are never stored as analyses
+    completed = [(item, analysis) for item, analysis in zip(items, analyses) if not analysis.get("error")]
+    failed = [(item, analysis) for item, analysis in zip(items, analyses) if analysis.get("error")]
+    final = not failed or self.request.retries >= self.max_retries
+    _run(_save_analyses(
+        [(item["asset_id"], analysis) for item, analysis in completed],
+        [item["asset_id"] for item, _ in failed] if final else [],
+    ))
+    for item, analysis in completed:
+        logger.info(
+            f"[TASK] Analysis complete for {item['asset_id']}: {len(analysis.get('tags', []))} tags"
+        )
+    
+    if not final:
+        logger.warning(
+            f"[TASK] Retrying {len(failed)}/{len(items)} analyses: {failed[0][1]['error']}"
+        )
+        raise self.retry(
+            args=[[item for item, _ in failed]],
+            countdown=get_exponential_backoff_interval(
+                factor=1, retries=self.request.retries, maximum=300, full_jitter=True
+            ),
+        )
+    
+    results = [
+        {
+            "asset_id": item["asset_id"],
+            "status": "failed" if analysis.get("error") else "completed",
             "tags": analysis.get("tags", []),
             "caption": analysis.get("caption"),
             "mood": analysis.get("mood"),
         }
-        
-    except Exception as e:
-        logger.error(f"[TASK] Analysis failed for {asset_id}: {e}")
-        raise  # Re-raise for Celery retry
+        for item, analysis in zip(items, analyses)
+    ]
+    return {"status": "completed", "results": results}
 
 
 @shared_task(
@@ -79,16 +242,12 @@ def generate_thumbnail(self, asset_id: str, image_url: str, size: tuple = (300,
     try:
         from app.services.image_processor import image_processor
         from app.services.storage_service import storage_service
-        import asyncio
         
         # Download image
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        image = loop.run_until_complete(image_processor.download_image(image_url))
-        loop.close()
+        data = _run(image_processor.download_bytes(image_url))
         
-        # Create thumbnail
-        thumb_bytes = image_processor.create_thumbnail(image, size)
+        # Create thumbnail (derivative cache first, then draft decode)
+        thumb_bytes = image_processor.derive(data, "thumbnail", {"size": list(size)})
         
         # Upload to S3
         thumb_key = f"thumbnails/{asset_id}.jpg"
@@ -107,6 +266,145 @@ def generate_thumbnail(self, asset_id: str, image_url: str, size: tuple = (300,
         raise
 
 
+def _render_and_upload(sources: list) -> dict:
+    """
+    Render the standard renditions of each (asset_id, image bytes) source,
+    each from a single decode, then upload every asset's renditions in one
+    ``upload_many`` call so the bulk pool stays busy across assets.
+    
+    Returns:
+        asset_id -> {"urls": {name: url or None}} or {"error": message}
+    """
+    from app.services.image_processor import image_processor
+    from app.services.storage_service import UploadItem, storage_service
+    
+    outcomes = {}
+    rendered = []
+    items, owners = [], []
+    try:
+        for asset_id, data in sources:
+            # Cascade display -> grid -> analysis -> thumbnail into pooled
+            # buffers that are uploaded in place
+            try:
+                renditions = image_processor.render_set_buffers(
+                    Image.open(io.BytesIO(data)), profile="archive"
+                )
+            except Exception as e:
+                outcomes[asset_id] = {"error": f"Rendering failed: {e}"}
+                continue
+            rendered.append(renditions)
+            
+            # Later analysis of this source reuses the small rendition
+            image_processor.seed_analysis_input(data, renditions["analysis"].view)
+            
+            # Analysis input is only sent to Gemini, never stored
+            for name, encoded in renditions.items():
+                if name != "analysis":
+                    items.append(UploadItem(f"renditions/{asset_id}/{name}.jpg", encoded.view))
+                    owners.append((asset_id, name))
+            outcomes[asset_id] = {"urls": {}}
+        
+        report = storage_service.upload_many(items)
+    finally:
+        for renditions in rendered:
+            for encoded in renditions.values():
+                encoded.release()
+    
+    for (asset_id, name), result in zip(owners, report.results):
+        outcomes[asset_id]["urls"][name] = result.url
+    return outcomes
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 2},
+    name="app.workers.tasks.generate_renditions",
+)
+def generate_renditions(self, asset_id: str, image_url: str):
+    """
+    Generate all standard renditions for an asset from a single decode.
+    For many assets at once use ``generate_renditions_batch``.
+    
+    Args:
+        asset_id: Database asset ID
+        image_url: URL to the original image
+    """
+    logger.info(f"[TASK] Generating renditions for: {asset_id}")
+    
+    try:
+        from app.services.image_processor import image_processor
+        
+        # Download image
+        data = _run(image_processor.download_bytes(image_url))
+        
+        outcome = _render_and_upload([(asset_id, data)])[asset_id]
+        if "error" in outcome:
+            raise RuntimeError(outcome["error"])
+        urls = outcome["urls"]
+        
+        logger.info(f"[TASK] Renditions created for {asset_id}: {sorted(urls)}")
+        
+        return {
+            "asset_id": asset_id,
+            "status": "completed",
+            "urls": urls,
+        }
+        
+    except Exception as e:
+        logger.error(f"[TASK] Rendition generation failed for {asset_id}: {e}")
+        raise
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 2},
+    name="app.workers.tasks.generate_renditions_batch",
+)
+def generate_renditions_batch(self, items: list):
+    """
+    Generate renditions for many assets, with downloads in flight together
+    and all renditions uploaded as one bulk batch. Failures are reported
+    per asset; only storage-wide errors fail (and retry) the task.
+    
+    Args:
+        items: [{"asset_id": ..., "image_url": ...}, ...]
+    """
+    logger.info(f"[TASK] Generating renditions for {len(items)} assets")
+    
+    from app.services.image_processor import image_processor
+    
+    async def download_all():
+        return await asyncio.gather(
+            *(image_processor.download_bytes(item["image_url"]) for item in items),
+            return_exceptions=True,
+        )
+    
+    downloads = _run(download_all())
+    sources, results = [], {}
+    for item, data in zip(items, downloads):
+        if isinstance(data, BaseException):
+            results[item["asset_id"]] = {"error": f"Download failed: {data}"}
+        else:
+            sources.append((item["asset_id"], data))
+    
+    results.update(_render_and_upload(sources))
+    
+    completed = []
+    for item in items:
+        outcome = results[item["asset_id"]]
+        status = "failed" if "error" in outcome or None in outcome["urls"].values() else "completed"
+        completed.append({"asset_id": item["asset_id"], "status": status, **outcome})
+    
+    failed = sum(1 for result in completed if result["status"] == "failed")
+    logger.info(f"[TASK] Renditions batch complete: {len(items) - failed}/{len(items)} assets")
+    
+    return {"status": "completed", "results": completed}
+
+
 @shared_task(
     bind=True,
     autoretry_for=(Exception,),
@@ -121,8 +419,9 @@ def process_batch(self, job_id: str, asset_ids: list, operation: str, params: di
     Args:
         job_id: Batch job ID for tracking
         asset_ids: List of asset IDs to process
-        operation: Operation type (analyze, filter, resize)
-        params: Operation-specific parameters
+        operation: Operation type (analyze, renditions, thumbnail)
+        params: Operation-specific parameters ("renditions" takes
+            ``image_urls``: asset_id -> original URL)
     """
     logger.info(f"[TASK] Processing batch {job_id}: {len(asset_ids)} assets, op={operation}")
     
@@ -133,12 +432,39 @@ def process_batch(self, job_id: str, asset_ids: list, operation: str, params: di
         "failed_ids": [],
     }
     
+    if operation == "analyze":
+        # Already a batch: dispatch full micro-batches without waiting
+        from app.config import settings
+        size = max(1, settings.gemini_batch_size)
+        for start in range(0, len(asset_ids), size):
+            chunk = asset_ids[start:start + size]
+            analyze_images.delay(
+                [{"asset_id": asset_id, "image_url": params.get("image_url")} for asset_id in chunk]
+            )
+            results["processed"] += len(chunk)
+        logger.info(f"[TASK] Batch {job_id} complete: {results['processed']}/{len(asset_ids)}")
+        return results
+    
+    if operation == "renditions":
+        # Whole chunks per task, so each task uploads one large bulk batch
+        from app.config import settings
+        urls = (params or {}).get("image_urls") or {}
+        results["failed_ids"] = [asset_id for asset_id in asset_ids if not urls.get(asset_id)]
+        results["failed"] = len(results["failed_ids"])
+        pending = [asset_id for asset_id in asset_ids if urls.get(asset_id)]
+        size = max(1, settings.rendition_batch_size)
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            generate_renditions_batch.delay(
+                [{"asset_id": asset_id, "image_url": urls[asset_id]} for asset_id in chunk]
+            )
+            results["processed"] += len(chunk)
+        logger.info(f"[TASK] Batch {job_id} complete: {results['processed']}/{len(asset_ids)}")
+        return results
+    
     for asset_id in asset_ids:
         try:
-            if operation == "analyze":
-                # Delegate to analyze_image task
-                analyze_image.delay(asset_id, params.get("image_url"))
-            elif operation == "thumbnail":
+            if operation == "thumbnail":
                 generate_thumbnail.delay(asset_id, params.get("image_url"))
             
             results["processed"] += 1
@@ -0,0 +1,301 @@
+"""
+Neural Canvas Backend - ImageProcessor Benchmarks
+Times the image hot paths (decode, resize_image, create_thumbnail, every
+apply_filter type, encode_image) on synthetic images across sizes, modes
+and formats, and compares against a stored baseline.
+
+Each case runs in a fresh process, so its peak RSS covers only that case
+(source image included). Latency percentiles and throughput come from
+repeated timed runs after one warm-up.
+
+Usage:
+    python benchmarks/bench_image_processor.py                  # full matrix
+    python benchmarks/bench_image_processor.py --quick          # <= 12 MP
+    python benchmarks/bench_image_processor.py --filter resize --sizes 12mp
+    python benchmarks/bench_image_processor.py --quick --save-baseline
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import PIL
+from PIL import Image
+
+from app.services import encoders, filters
+from app.services.image_processor import image_processor
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS not reported
+    resource = None
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+# Name -> (width, height); 0.3 to 50 megapixels
+SIZES = {
+    "0.3mp": (640, 480),
+    "2mp": (1920, 1080),
+    "12mp": (4000, 3000),
+    "24mp": (6000, 4000),
+    "50mp": (8660, 5774),
+}
+QUICK_SIZES = ("0.3mp", "2mp", "12mp")
+
+MODES = ("RGB", "RGBA", "P", "L")
+
+# Source formats for decode; JPEG can't store alpha or palettes
+DECODE_FORMATS = {
+    "JPEG": ("RGB", "L"),
+    "PNG": MODES,
+    "WEBP": ("RGB", "RGBA"),
+}
+
+# Slower than this on p50 (relative to baseline) counts as a regression,
+# unless the absolute change is within timer/scheduler noise
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_MIN_DELTA_MS = 0.5
+
+
+# --- Synthetic inputs ---
+
+def make_image(size: tuple[int, int], mode: str) -> Image.Image:
+    """Deterministic photo-like content: gradients plus sensor-style noise."""
+    gradient = Image.linear_gradient("L")
+    red = gradient.resize(size)
+    green = gradient.rotate(90).resize(size)
+    blue = Image.effect_noise(size, 48)
+    image = Image.merge("RGB", (red, green, blue))
+    if mode == "RGBA":
+        image.putalpha(gradient.rotate(45).resize(size))
+    elif mode == "P":
+        image = image.quantize(256)
+    elif mode == "L":
+        image = image.convert("L")
+    return image
+
+
+def encode_source(image: Image.Image, format: str) -> bytes:
+    buffer = io.BytesIO()
+    options = {"quality": 90} if format in ("JPEG", "WEBP") else {}
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+# --- Cases ---
+
+def build_cases(sizes, modes, name_filter: Optional[str]) -> list[dict]:
+    """Benchmark matrix as picklable case descriptions."""
+    cases = []
+    webp = "WEBP" in encoders.supported_formats()
+    for size in sizes:
+        for mode in modes:
+            base = {"size": size, "mode": mode}
+            for format, source_modes in DECODE_FORMATS.items():
+                if mode in source_modes and (format != "WEBP" or webp):
+                    cases.append({**base, "op": "decode", "arg": format})
+            cases.append({**base, "op": "resize_image", "arg": None})
+            cases.append({**base, "op": "create_thumbnail", "arg": None})
+            for filter_type in filters.FILTERS:
+                cases.append({**base, "op": "apply_filter", "arg": filter_type})
+            for format in encoders.supported_formats():
+                cases.append({**base, "op": "encode", "arg": format})
+    for case in cases:
+        case["name"] = "/".join(
+            part for part in (case["op"], case["arg"], case["mode"], case["size"]) if part
+        )
+    if name_filter:
+        cases = [case for case in cases if name_filter in case["name"]]
+    return cases
+
+
+def _operation(case: dict) -> tuple[Callable[[], object], int]:
+    """(callable to time, megapixels handled per call) for a case."""
+    image = make_image(SIZES[case["size"]], case["mode"])
+    image.load()
+    op, arg = case["op"], case["arg"]
+    if op == "decode":
+        data = encode_source(image, arg)
+        run = lambda: Image.open(io.BytesIO(data)).load()
+    elif op == "resize_image":
+        run = lambda: image_processor.resize_image(image)
+    elif op == "create_thumbnail":
+        run = lambda: image_processor.create_thumbnail(image)
+    elif op == "apply_filter":
+        run = lambda: image_processor.apply_filter(image, arg)
+    elif op == "encode":
+        run = lambda: image_processor.encode_image(image, arg, None, profile="balanced")
+    else:
+        raise ValueError(f"Unknown benchmark op: {op}")
+    return run, image.width * image.height / 1_000_000
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_case(case: dict, repeat: int, min_time: float) -> dict:
+    """Time one case: one warm-up, then ``repeat`` runs (more until ``min_time``)."""
+    run, megapixels = _operation(case)
+    run()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+        if len(samples) >= repeat * 20:
+            break
+    mean = statistics.fmean(samples)
+    peak_rss = None
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+    return {
+        "name": case["name"],
+        "runs": len(samples),
+        "mean_ms": mean * 1000,
+        "p50_ms": _percentile(samples, 0.50) * 1000,
+        "p95_ms": _percentile(samples, 0.95) * 1000,
+        "p99_ms": _percentile(samples, 0.99) * 1000,
+        "ops_per_s": 1 / mean,
+        "mp_per_s": megapixels / mean,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def run_all(cases: list[dict], repeat: int, min_time: float, isolate: bool) -> list[dict]:
+    results = []
+    if not isolate:
+        for case in cases:
+            results.append(run_case(case, repeat, min_time))
+            print_result(results[-1])
+        return results
+    # One fresh process per case so peak RSS isn't a high-water mark of earlier cases
+    context = multiprocessing.get_context("fork" if sys.platform == "linux" else "spawn")
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.append(pool.submit(run_case, case, repeat, min_time).result())
+        print_result(results[-1])
+    return results
+
+
+# --- Reporting ---
+
+def print_result(result: dict) -> None:
+    rss = f"{result['peak_rss_mb']:8.1f}" if result["peak_rss_mb"] is not None else "       -"
+    line = (
+        f"{result['name']:<40} {result['p50_ms']:10.2f} {result['p95_ms']:10.2f} "
+        f"{result['p99_ms']:10.2f} {result['mp_per_s']:9.1f} {rss}"
+    )
+    print(line, flush=True)
+
+
+def compare(
+    results: list[dict], baseline: dict, threshold: float, min_delta_ms: float
+) -> list[str]:
+    """Print p50 deltas against the baseline; return names that regressed."""
+    previous = {entry["name"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    print(f"\nAgainst baseline ({baseline.get('created', 'unknown date')}, "
+          f"threshold +{threshold:.0%} on p50):")
+    for result in results:
+        entry = previous.get(result["name"])
+        if entry is None:
+            print(f"  {result['name']:<40} new")
+            continue
+        delta = result["p50_ms"] / entry["p50_ms"] - 1
+        significant = abs(result["p50_ms"] - entry["p50_ms"]) >= min_delta_ms
+        flag = ""
+        if significant and delta > threshold:
+            flag = "  REGRESSION"
+            regressions.append(result["name"])
+        elif significant and delta < -threshold:
+            flag = "  faster"
+        print(f"  {result['name']:<40} {entry['p50_ms']:10.2f} -> {result['p50_ms']:10.2f} ms "
+              f"({delta:+.1%}){flag}")
+    return regressions
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ImageProcessor hot paths")
+    parser.add_argument("--quick", action="store_true", help=f"Only {', '.join(QUICK_SIZES)}")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, help="Image sizes to run")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--filter", help="Only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Minimum timed runs per case")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds per case")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="Run in-process (faster; peak RSS becomes cumulative)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write results to --baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="Ignore p50 changes smaller than this")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit 1 if any case regressed")
+    parser.add_argument("--output", type=Path, help="Also write results JSON here")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else tuple(SIZES))
+    cases = build_cases(sizes, args.modes, args.filter)
+    print(f"{len(cases)} cases, Pillow {PIL.__version__}, {multiprocessing.cpu_count()} CPUs\n")
+    print(f"{'case':<40} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'MP/s':>9} {'RSS MB':>8}")
+    results = run_all(cases, args.repeat, args.min_time, not args.no_isolate)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        if args.baseline.exists():
+            # Keep entries for cases not run this time
+            kept = json.loads(args.baseline.read_text()).get("results", [])
+            names = {result["name"] for result in results}
+            report["results"] = [e for e in kept if e["name"] not in names] + results
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline} (run with --save-baseline)")
+        return 0
+    regressions = compare(
+        results, json.loads(args.baseline.read_text()), args.threshold, args.min_delta_ms
+    )
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
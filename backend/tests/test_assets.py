@@ -162,3 +162,100 @@ async def test_delete_asset_not_found(authenticated_client: AsyncClient):
     """Test deleting non-existent asset returns 404."""
     response = await authenticated_client.delete("/assets/nonexistent-id")
     assert response.status_code == 404
+
+
+# === DUPLICATES ===
+
+@pytest.mark.asyncio
+async def test_list_duplicate_groups(authenticated_client: AsyncClient, db_session: AsyncSession, test_user):
+    """Test near-identical assets are grouped by perceptual hash."""
+    for asset_id, phash in [
+        ("dup-a", "ffff0000ffff0000"),
+        ("dup-b", "ffff0000ffff0001"),  # 1 bit away
+        ("unique", "0123456789abcdef"),
+        ("unhashed", None),
+    ]:
+        db_session.add(Asset(
+            id=asset_id,
+            owner_id=test_user.id,
+            storage_url=f"https://example.com/{asset_id}.jpg",
+            width=100,
+            height=100,
+            phash=phash,
+        ))
+    await db_session.commit()
+
+    response = await authenticated_client.get("/assets/duplicates", params={"radius": 2})
+
+    assert response.status_code == 200
+    assert response.json() == [{"asset_ids": ["dup-a", "dup-b"]}]
+
+
+# === RENDITIONS ===
+
+@pytest.mark.asyncio
+async def test_rendition_negotiates_format(authenticated_client: AsyncClient, test_asset):
+    """Test the rendition endpoint honours Accept and varies on it."""
+    import io
+    from unittest.mock import AsyncMock, patch
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), color="navy").save(buffer, format="JPEG")
+    with patch("app.routers.assets.storage_service.owns_url", return_value=True), \
+         patch("app.routers.assets.image_processor.download_bytes", AsyncMock(return_value=buffer.getvalue())):
+        webp = await authenticated_client.get(
+            f"/assets/{test_asset.id}/rendition",
+            params={"width": 200, "height": 200},
+            headers={"Accept": "image/webp,image/*;q=0.8"},
+        )
+        jpeg = await authenticated_client.get(
+            f"/assets/{test_asset.id}/rendition", params={"width": 200, "height": 200}
+        )
+
+    assert webp.status_code == 200
+    assert webp.headers["content-type"] == "image/webp"
+    assert "Accept" in webp.headers["vary"]
+    assert Image.open(io.BytesIO(webp.content)).size == (200, 150)
+    assert jpeg.headers["content-type"] == "image/jpeg"
+
+
+@pytest.mark.asyncio
+async def test_rendition_cache_hit_skips_download(authenticated_client: AsyncClient, test_asset, tmp_path):
+    """Test repeat renditions are served from the cache, and revalidate with ETag."""
+    import io
+    from unittest.mock import AsyncMock, patch
+    from PIL import Image
+    from app.services.derivative_cache import DerivativeCache
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), color="olive").save(buffer, format="JPEG")
+    download = AsyncMock(return_value=buffer.getvalue())
+    params = {"width": 120, "height": 120, "format": "jpeg"}
+    with patch("app.routers.assets.storage_service.owns_url", return_value=True), \
+         patch("app.routers.assets.image_processor.download_bytes", download), \
+         patch("app.routers.assets.image_processor.cache", DerivativeCache(str(tmp_path), 10 * 1024 * 1024)):
+        first = await authenticated_client.get(f"/assets/{test_asset.id}/rendition", params=params)
+        second = await authenticated_client.get(f"/assets/{test_asset.id}/rendition", params=params)
+        revalidated = await authenticated_client.get(
+            f"/assets/{test_asset.id}/rendition", params=params,
+            headers={"If-None-Match": first.headers["etag"]},
+        )
+        other_size = await authenticated_client.get(
+            f"/assets/{test_asset.id}/rendition", params={**params, "width": 60},
+            headers={"If-None-Match": first.headers["etag"]},
+        )
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert revalidated.status_code == 304 and not revalidated.content
+    assert other_size.status_code == 200
+    assert download.await_count == 2  # First request and the new size only
+
+
+@pytest.mark.asyncio
+async def test_rendition_requires_managed_storage(authenticated_client: AsyncClient, test_asset):
+    """Test external URLs are never fetched server-side."""
+    response = await authenticated_client.get(f"/assets/{test_asset.id}/rendition")
+    assert response.status_code == 400
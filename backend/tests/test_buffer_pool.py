@@ -0,0 +1,109 @@
+"""
+Neural Canvas Backend - Encode Buffer Pool Tests
+Tests for pooled encode buffers and copy-free uploads.
+"""
+
+import io
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from app.services.buffer_pool import BufferPool, ViewReader
+from app.services.image_processor import image_processor
+from app.services.storage_backends import S3Backend
+from app.services.storage_service import StorageService
+
+
+# === UNIT TESTS ===
+
+def test_buffers_are_reused_without_stale_bytes():
+    """Test a released stream is reused and a shorter payload hides the old tail."""
+    pool = BufferPool(max_buffers=2, max_buffer_bytes=1024)
+    with pool.acquire() as first:
+        first.stream.write(b"x" * 100)
+        assert first.view.tobytes() == b"x" * 100
+    with pool.acquire() as second:
+        second.stream.write(b"short")
+        assert second.view.tobytes() == b"short"
+
+    assert pool.created == 1
+
+
+def test_oversized_buffers_not_pooled():
+    """Test streams over the size cap are dropped instead of pinned."""
+    pool = BufferPool(max_buffers=2, max_buffer_bytes=10)
+    with pool.acquire() as encoded:
+        encoded.stream.write(b"y" * 100)
+    pool.acquire().release()
+
+    assert pool.created == 2
+
+
+def test_held_view_keeps_stream_out_of_pool():
+    """Test a stream still referenced by a consumer is never overwritten."""
+    pool = BufferPool(max_buffers=2, max_buffer_bytes=1024)
+    encoded = pool.acquire()
+    encoded.stream.write(b"payload")
+    held = memoryview(encoded.view)
+    encoded.release()
+
+    with pool.acquire() as other:
+        other.stream.write(b"other")
+
+    assert held.tobytes() == b"payload"
+    assert pool.created == 2
+
+
+def test_released_buffer_rejects_access():
+    pool = BufferPool(max_buffers=1, max_buffer_bytes=1024)
+    encoded = pool.acquire()
+    encoded.release()
+    with pytest.raises(ValueError):
+        encoded.view
+
+
+def test_view_reader_reads_and_seeks():
+    reader = ViewReader(memoryview(b"0123456789"))
+
+    assert reader.read(4) == b"0123"
+    reader.seek(-2, io.SEEK_END)
+    assert reader.read() == b"89"
+    reader.seek(0)
+    assert reader.read() == b"0123456789"
+
+
+def test_encode_buffer_matches_encode_image():
+    """Test the pooled path produces the same JPEG as the bytes API."""
+    image = Image.effect_noise((120, 80), 40).convert("RGB")
+
+    with image_processor.encode_buffer(image, quality=80) as encoded:
+        assert bytes(encoded.view) == image_processor.encode_image(image, quality=80)
+        assert Image.open(encoded.reader()).size == (120, 80)
+
+
+def test_render_set_buffers_match_render_set():
+    image = Image.effect_noise((1200, 800), 40).convert("RGB")
+
+    buffers = image_processor.render_set_buffers(image)
+    try:
+        assert {name: bytes(b.view) for name, b in buffers.items()} == image_processor.render_set(image)
+    finally:
+        for encoded in buffers.values():
+            encoded.release()
+
+
+def test_upload_streams_view_without_copy():
+    """Test uploads read the memoryview through a file object."""
+    client = MagicMock()
+    storage = StorageService(S3Backend(client, "bucket"))
+    uploaded = {}
+    client.upload_fileobj.side_effect = (
+        lambda fileobj, *args, **kwargs: uploaded.setdefault("body", fileobj.read())
+    )
+
+    with image_processor.encode_buffer(Image.new("RGB", (16, 16), "red")) as encoded:
+        url = storage.upload_image(encoded.view, "renditions/a/grid.jpg")
+        assert uploaded["body"] == bytes(encoded.view)
+
+    assert url.endswith("renditions/a/grid.jpg")
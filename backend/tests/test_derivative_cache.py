@@ -0,0 +1,137 @@
+"""
+Neural Canvas Backend - Derivative Cache Tests
+Tests for the content-addressed on-disk derivative cache.
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from app.services import derivative_cache as derivative_cache_module
+from app.services.derivative_cache import DerivativeCache
+from app.services.encoders import EncoderProfile
+from app.services.image_processor import ImageProcessor
+
+
+# === FIXTURES ===
+
+@pytest.fixture
+def cache(tmp_path):
+    """Small cache rooted in a temp directory."""
+    return DerivativeCache(str(tmp_path / "derivatives"), max_bytes=1000)
+
+
+@pytest.fixture
+def source_bytes():
+    """Encoded source image."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300), color="purple").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+# === UNIT TESTS: CACHE ===
+
+def test_put_get_roundtrip(cache):
+    """Test stored bytes are returned and counted as hits."""
+    cache.put("ab" * 32, b"derived")
+
+    assert cache.get("ab" * 32) == b"derived"
+    assert cache.get("cd" * 32) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction(cache):
+    """Test least-recently-used entries go first when over the cap."""
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for key in keys:
+        cache.put(key, b"x" * 400)
+
+    # Two entries fit; the oldest was evicted
+    assert cache.get(keys[0]) is None
+
+    cache.get(keys[1])  # Refresh
+    cache.put("ff" * 32, b"y" * 400)
+
+    assert cache.get(keys[1]) is not None
+    assert cache.get(keys[2]) is None
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] <= 1000
+
+
+def test_index_rebuilt_from_disk(cache):
+    """Test a new instance picks up entries written by another."""
+    cache.put("ab" * 32, b"derived")
+
+    reopened = DerivativeCache(str(cache.root), max_bytes=1000)
+
+    assert reopened.get("ab" * 32) == b"derived"
+    assert reopened.stats()["entries"] == 1
+    assert not list(cache.root.glob("*/*/.tmp-*"))
+
+
+def test_key_covers_operation_and_params():
+    """Test keys differ per operation and parameters."""
+    base = DerivativeCache.make_key("hash", "thumbnail", {"size": [300, 300]})
+
+    assert base == DerivativeCache.make_key("hash", "thumbnail", {"size": [300, 300]})
+    assert base != DerivativeCache.make_key("hash", "thumbnail", {"size": [200, 200]})
+    assert base != DerivativeCache.make_key("hash", "resize", {"size": [300, 300]})
+    assert base != DerivativeCache.make_key("other", "thumbnail", {"size": [300, 300]})
+
+
+def test_encoder_version_tracks_profiles(monkeypatch):
+    """Test changing an encoder profile changes the version baked into keys."""
+    before = derivative_cache_module.encoder_version()
+    monkeypatch.setitem(
+        derivative_cache_module.PROFILES, "fast", EncoderProfile("fast", 70, False, False, 75, 0, 50, 10)
+    )
+
+    assert derivative_cache_module.encoder_version() != before
+    assert before == derivative_cache_module.ENCODER_VERSION
+
+
+def test_file_read_does_not_hold_lock(cache, monkeypatch):
+    """Test the disk read happens outside the index lock."""
+    cache.put("ab" * 32, b"derived")
+    held = []
+    real_read = type(cache._path("ab" * 32)).read_bytes
+
+    def read_bytes(path):
+        held.append(cache._lock.locked())
+        return real_read(path)
+
+    monkeypatch.setattr(type(cache._path("ab" * 32)), "read_bytes", read_bytes)
+
+    assert cache.get("ab" * 32) == b"derived"
+    assert held == [False]
+
+
+# === INTEGRATION: IMAGE PROCESSOR ===
+
+@pytest.mark.parametrize("operation,params", [
+    ("thumbnail", {"size": [100, 100]}),
+    ("resize", {"max_width": 200, "max_height": 200}),
+    ("filter", {"filters": ["brighten", "sepia"]}),
+])
+def test_derive_uses_cache(tmp_path, source_bytes, operation, params):
+    """Test a repeated derivative is served from the cache."""
+    processor = ImageProcessor()
+    processor.cache = DerivativeCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+
+    first = processor.derive(source_bytes, operation, params)
+    second = processor.derive(source_bytes, operation, params)
+
+    assert first == second
+    assert processor.cache.stats()["hits"] == 1
+    assert Image.open(io.BytesIO(first)).format == "JPEG"
+
+
+def test_derive_unknown_operation(tmp_path, source_bytes):
+    """Test unknown operations are rejected."""
+    processor = ImageProcessor()
+    processor.cache = DerivativeCache(str(tmp_path), max_bytes=1024)
+
+    with pytest.raises(ValueError):
+        processor.derive(source_bytes, "explode")
@@ -0,0 +1,133 @@
+"""
+Neural Canvas Backend - Near-Duplicate Index Tests
+Tests for perceptual hashing and the multi-index Hamming search.
+"""
+
+import random
+
+import pytest
+from PIL import Image, ImageFilter
+
+from app.services.duplicate_index import DuplicateIndex, MultiIndexHashTable, hamming
+from app.services.image_processor import ImageProcessor
+
+
+# === FIXTURES ===
+
+@pytest.fixture
+def random_hashes():
+    """Random hashes plus planted near-duplicates."""
+    rng = random.Random(42)
+    hashes = {f"a{i}": rng.getrandbits(64) for i in range(2000)}
+    for i in range(50):
+        base = hashes[f"a{i}"]
+        flips = rng.sample(range(64), rng.randint(0, 5))
+        for bit in flips:
+            base ^= 1 << bit
+        hashes[f"dup{i}"] = base
+    return hashes
+
+
+# === UNIT TESTS: MULTI-INDEX TABLE ===
+
+@pytest.mark.parametrize("radius", [0, 3, 5])
+def test_pairs_match_brute_force(random_hashes, radius):
+    """Test indexed pair search finds exactly the brute-force pairs."""
+    table = MultiIndexHashTable(chunks=max(4, radius + 1))
+    for item_id, value in random_hashes.items():
+        table.add(item_id, value)
+
+    found = {(a, b) for a, b, _ in table.pairs(radius)}
+
+    ids = sorted(random_hashes)
+    expected = {
+        (a, b)
+        for i, a in enumerate(ids)
+        for b in ids[i + 1:]
+        if hamming(random_hashes[a], random_hashes[b]) <= radius
+    }
+    assert found == expected
+
+
+def test_query_and_remove(random_hashes):
+    """Test point queries honour removals."""
+    table = MultiIndexHashTable(chunks=4)
+    for item_id, value in random_hashes.items():
+        table.add(item_id, value)
+
+    matches = dict(table.query(random_hashes["a0"], 3))
+    assert matches["a0"] == 0
+
+    table.remove("a0")
+    assert "a0" not in dict(table.query(random_hashes["a0"], 3))
+
+    with pytest.raises(ValueError):
+        table.query(0, 4)
+
+
+def test_groups_are_connected_components():
+    """Test chained near-duplicates collapse into one group."""
+    table = MultiIndexHashTable(chunks=4)
+    table.add("a", 0b0000)
+    table.add("b", 0b0011)  # 2 bits from a
+    table.add("c", 0b1111)  # 2 bits from b, 4 from a
+    table.add("d", 1 << 63 | 1 << 62 | 1 << 61 | 1 << 60 | 1 << 59)
+
+    assert table.groups(2) == [["a", "b", "c"]]
+
+
+def test_registry_detects_stale_tables():
+    """Test cached tables are rebuilt when the stored hash version changes."""
+    index = DuplicateIndex()
+    index.build("owner", 3, [("a", "0" * 16)], version=(1, "t1"))
+
+    assert index.get("owner", 3, version=(1, "t1")) is not None
+    # Same count, but one asset deleted and another added elsewhere
+    assert index.get("owner", 3, version=(1, "t2")) is None
+
+
+def test_registry_is_lru_bounded():
+    index = DuplicateIndex(max_tables=2)
+    for owner in ("a", "b"):
+        index.build(owner, 3, [], version=0)
+    index.get("a", 3, version=0)
+    index.build("c", 3, [], version=0)
+
+    assert index.get("b", 3, version=0) is None
+    assert index.get("a", 3, version=0) is not None
+    assert index.get("c", 3, version=0) is not None
+
+
+def test_identical_hash_runs_collapse():
+    """Test thousands of identical hashes (blank images) group in one pass."""
+    table = MultiIndexHashTable(chunks=4)
+    for i in range(5000):
+        table.add(f"blank{i:04d}", 0)
+    table.add("near", 0b11)
+    table.add("far", (1 << 64) - 1)
+
+    groups = table.groups(3)
+
+    assert len(groups) == 1 and len(groups[0]) == 5001 and "far" not in groups[0]
+    assert len(table._values) == 3
+    assert len(dict(table.query(0, 0))) == 5000
+    small = MultiIndexHashTable(chunks=4)
+    for item_id in ("x", "y", "z"):
+        small.add(item_id, 7)
+    assert {(a, b) for a, b, _ in small.pairs(0)} == {("x", "y"), ("x", "z"), ("y", "z")}
+
+
+# === UNIT TESTS: DHASH ===
+
+def test_dhash_near_duplicates_are_close():
+    """Test a re-encoded, slightly blurred copy hashes within a few bits."""
+    processor = ImageProcessor()
+    image = Image.linear_gradient("L").resize((640, 480)).convert("RGB")
+    image.paste((200, 40, 40), (100, 100, 300, 260))
+    variant = image.filter(ImageFilter.GaussianBlur(1)).resize((320, 240))
+    different = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+
+    base = processor.dhash(image)
+
+    assert hamming(base, processor.dhash(variant)) <= 4
+    assert hamming(base, processor.dhash(different)) > 10
@@ -0,0 +1,156 @@
+"""
+Neural Canvas Backend - Gemini Gateway Tests
+Tests for rate limiting, adaptive concurrency and throttled retries.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.services import gemini_gateway as gateway_module
+from app.services.gemini_gateway import (
+    GeminiGateway,
+    TokenBucket,
+    _retry_after,
+    estimate_tokens,
+)
+
+
+class _APIError(Exception):
+    """Stand-in for google-genai's APIError (``code`` + ``details``)."""
+
+    def __init__(self, code: int, details=None):
+        super().__init__(f"{code}")
+        self.code = code
+        self.details = details
+
+
+# === FIXTURES ===
+
+@pytest.fixture
+def gateway():
+    """Generous buckets so only the behaviour under test applies."""
+    return GeminiGateway(TokenBucket(60_000), TokenBucket(10_000_000), max_in_flight=8, max_retries=3)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Keep retry backoff from slowing the suite."""
+    monkeypatch.setattr(gateway_module, "BACKOFF_BASE_SECONDS", 0.001)
+
+
+# === UNIT TESTS: TOKEN BUCKET ===
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    """Test acquiring beyond capacity waits for the refill rate."""
+    bucket = TokenBucket(per_minute=600)  # 10/s
+
+    await bucket.acquire(600)
+    start = time.monotonic()
+    await bucket.acquire(2)
+
+    assert time.monotonic() - start >= 0.15
+
+
+def test_retry_after_parsing():
+    """Test delays are read from RetryInfo details."""
+    error = _APIError(429, {"error": {"details": [{"retryDelay": "7s"}]}})
+
+    assert _retry_after(error) == 7.0
+    assert _retry_after(_APIError(429)) is None
+
+
+def test_estimate_tokens_counts_images():
+    assert estimate_tokens("x" * 400, images=2) > estimate_tokens("x" * 400)
+
+
+# === UNIT TESTS: GATEWAY ===
+
+@pytest.mark.asyncio
+async def test_throttle_retries_and_halves_limit(gateway):
+    """Test a 429 is retried and shrinks the in-flight limit."""
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise _APIError(429)
+        return "ok"
+
+    assert await gateway.call(flaky) == "ok"
+    assert len(calls) == 2
+    assert gateway.throttled == 1
+    assert gateway.limit < 8
+
+
+@pytest.mark.asyncio
+async def test_burst_of_throttles_halves_limit_once(gateway):
+    """Test in-flight calls throttled by the same burst shrink the limit only once."""
+    started = asyncio.Event()
+    calls = 0
+    limits = []
+
+    async def burst():
+        nonlocal calls
+        calls += 1
+        limits.append(gateway.limit)
+        if calls <= 8:
+            if calls == 8:
+                started.set()
+            await started.wait()  # All 8 in flight when the 429s land
+            raise _APIError(429, {"retryDelay": "0.05s"})
+        return "ok"
+
+    results = await asyncio.gather(*(gateway.call(burst) for _ in range(8)))
+
+    assert results == ["ok"] * 8
+    assert gateway.throttled == 8
+    assert limits[8] == 4.0  # Limit seen by the first retry
+
+
+@pytest.mark.asyncio
+async def test_non_throttle_error_not_retried(gateway):
+    """Test request errors surface immediately."""
+    calls = []
+
+    async def bad():
+        calls.append(1)
+        raise _APIError(400)
+
+    with pytest.raises(_APIError):
+        await gateway.call(bad)
+    assert len(calls) == 1
+    assert gateway.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_retries_exhausted(gateway):
+    """Test persistent throttling is raised after max_retries."""
+    async def throttled():
+        raise _APIError(503)
+
+    with pytest.raises(_APIError):
+        await gateway.call(throttled)
+    assert gateway.throttled == gateway.max_retries
+    assert gateway.limit == 1.0
+
+
+@pytest.mark.asyncio
+async def test_in_flight_bounded():
+    """Test concurrent calls never exceed the limit."""
+    gateway = GeminiGateway(TokenBucket(60_000), TokenBucket(60_000), max_in_flight=3)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        peak = max(peak, gateway.in_flight)
+        await asyncio.sleep(0.01)
+        return True
+
+    results = await asyncio.gather(*(gateway.call(work) for _ in range(12)))
+
+    assert all(results)
+    assert peak <= 3
+    assert gateway.in_flight == 0
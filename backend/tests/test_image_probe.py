@@ -0,0 +1,148 @@
+"""
+Neural Canvas Backend - Image Probe Tests
+Tests for header-only metadata probing and asset-creation validation.
+"""
+
+import io
+import os
+import re
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from httpx import AsyncClient
+from PIL import Image
+
+from app.services.image_probe import ORIENTATION, ImageProbe, probe_bytes
+from app.services.image_processor import ImageRejectedError
+
+
+def _jpeg(size=(640, 480), orientation=None, captured=None, icc_bytes=0) -> bytes:
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    if captured:
+        exif.get_ifd(0x8769)[0x9003] = captured
+    options = {"exif": exif}
+    if icc_bytes:
+        options["icc_profile"] = os.urandom(icc_bytes)
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(buffer, format="JPEG", **options)
+    return buffer.getvalue()
+
+
+def _ranged_client(objects: dict[str, bytes], honour_range: bool = True) -> httpx.AsyncClient:
+    """Client over an in-memory store that serves (or ignores) Range requests."""
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        data = objects[request.url.path]
+        match = re.match(r"bytes=(\d+)-(\d+)", request.headers.get("range", ""))
+        if not (honour_range and match):
+            requested.append(len(data))
+            return httpx.Response(200, content=data, headers={"content-type": "image/jpeg"})
+        start, end = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+        requested.append(end + 1 - start)
+        return httpx.Response(206, content=data[start:end + 1], headers={
+            "content-type": "image/jpeg",
+            "content-range": f"bytes {start}-{end}/{len(data)}",
+        })
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.requested = requested
+    return client
+
+
+# === UNIT TESTS ===
+
+def test_probe_reads_header_fields():
+    """Test format, EXIF-rotated dimensions and capture time from a prefix."""
+    data = _jpeg((640, 480), orientation=6, captured="2024:05:01 12:30:00")
+    result = probe_bytes(data[:4096], file_size=len(data))
+
+    assert result.format == "JPEG"
+    assert result.mime_type == "image/jpeg"
+    assert (result.width, result.height) == (480, 640)
+    assert result.orientation == 6
+    assert result.captured_at == datetime(2024, 5, 1, 12, 30)
+    assert result.file_size == len(data)
+
+
+def test_probe_truncated_header_needs_more():
+    """Test a prefix cut inside the header asks for more bytes."""
+    data = _jpeg(icc_bytes=40_000)
+    assert probe_bytes(data[:8192], file_size=len(data)) is None
+    assert probe_bytes(data[:65536], file_size=len(data)).width == 640
+
+
+def test_probe_rejects_bombs_and_non_images():
+    """Test oversized headers and non-image bytes are rejected."""
+    with pytest.raises(ImageRejectedError):
+        probe_bytes(_jpeg((2000, 2000)), max_pixels=1_000_000)
+    with pytest.raises(ImageRejectedError):
+        probe_bytes(b"<html><body>not an image</body></html>")
+
+
+@pytest.mark.asyncio
+async def test_probe_uses_ranged_reads():
+    """Test probing fetches only a prefix and widens it for big headers."""
+    objects = {"/small.jpg": _jpeg(), "/icc.jpg": _jpeg(icc_bytes=40_000)}
+    client = _ranged_client(objects)
+    with patch("app.services.image_probe.get_http_client", return_value=client):
+        small, icc = await ImageProbe().probe_many(
+            ["https://cdn.test/small.jpg", "https://cdn.test/icc.jpg"], concurrency=1
+        )
+
+    assert small.width == 640 and small.file_size == len(objects["/small.jpg"])
+    assert icc.height == 480
+    assert max(client.requested) < len(objects["/icc.jpg"])
+
+
+@pytest.mark.asyncio
+async def test_probe_without_range_support():
+    """Test servers that ignore Range still yield a result."""
+    data = _jpeg((300, 200))
+    client = _ranged_client({"/a.jpg": data}, honour_range=False)
+    with patch("app.services.image_probe.get_http_client", return_value=client):
+        result = await ImageProbe().probe("https://cdn.test/a.jpg")
+
+    assert (result.width, result.height, result.file_size) == (300, 200, len(data))
+
+
+# === ASSET CREATION ===
+
+@pytest.mark.asyncio
+async def test_create_asset_uses_probed_fields(authenticated_client: AsyncClient):
+    """Test managed-storage assets take dimensions and type from the probe."""
+    data = _jpeg((640, 480), captured="2024:05:01 12:30:00")
+    with patch("app.routers.assets.storage_service.owns_url", return_value=True), \
+         patch("app.routers.assets.index_asset", AsyncMock()), \
+         patch("app.services.image_probe.get_http_client", return_value=_ranged_client({"/a.jpg": data})):
+        response = await authenticated_client.post("/assets", json={
+            "storage_url": "https://cdn.test/a.jpg",
+            "mime_type": "image/png",
+            "width": 1,
+            "height": 1,
+        })
+
+    assert response.status_code == 201
+    body = response.json()
+    assert (body["width"], body["height"], body["mime_type"]) == (640, 480, "image/jpeg")
+    assert body["file_size"] == len(data)
+    assert body["captured_at"].startswith("2024-05-01T12:30")
+
+
+@pytest.mark.asyncio
+async def test_create_asset_rejects_bomb(authenticated_client: AsyncClient, monkeypatch):
+    """Test decompression bombs are refused before the asset exists."""
+    from app.config import settings
+    monkeypatch.setattr(settings, "image_max_pixels", 100_000)
+    data = _jpeg((640, 480))
+    with patch("app.routers.assets.storage_service.owns_url", return_value=True), \
+         patch("app.services.image_probe.get_http_client", return_value=_ranged_client({"/a.jpg": data})):
+        response = await authenticated_client.post("/assets", json={
+            "storage_url": "https://cdn.test/a.jpg", "width": 640, "height": 480,
+        })
+
+    assert response.status_code == 400
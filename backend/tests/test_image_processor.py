@@ -4,13 +4,23 @@ Tests for the image processing service using pytest best practices.
 Per Perplexity research: Fixtures, parametrize, AsyncMock for Gemini.
 """
 
+import asyncio
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
-from PIL import Image
+from PIL import Image, ImageEnhance
 import io
 
 # Import the service under test
-from app.services.image_processor import ImageProcessor, image_processor
+from app.services import filters
+from app.services.analysis_cache import AnalysisCache, MemoryAnalysisBackend
+from app.services.gemini_gateway import GeminiGateway, TokenBucket
+from app.services.image_processor import (
+    ImageProcessor,
+    DEFAULT_ANALYSIS_PROMPT,
+    ImageRejectedError,
+    RenditionSpec,
+    image_processor,
+)
 
 
 # === FIXTURES ===
@@ -40,8 +50,11 @@ def real_test_image():
 
 @pytest.fixture
 def processor():
-    """Get a fresh ImageProcessor instance."""
-    return ImageProcessor()
+    """Get a fresh ImageProcessor instance (with an isolated analysis cache and gateway)."""
+    proc = ImageProcessor()
+    proc.analysis_cache = AnalysisCache(MemoryAnalysisBackend(ttl=60, max_entries=100))
+    proc.gateway = GeminiGateway(TokenBucket(6000), TokenBucket(10_000_000), max_in_flight=4)
+    return proc
 
 
 # === UNIT TESTS: RESIZE ===
@@ -83,6 +96,107 @@ def test_create_thumbnail_custom_size(processor, real_test_image):
     assert max(opened.size) <= 50
 
 
+def _lazy_jpeg(size: tuple[int, int]) -> Image.Image:
+    """Encode a JPEG in memory and reopen it without decoding pixels."""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color="green").save(buffer, format="JPEG")
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def test_create_thumbnail_draft_decodes_reduced(processor):
+    """Test draft mode decodes a JPEG at a reduced DCT scale."""
+    source = _lazy_jpeg((4000, 3000))
+
+    result = processor.create_thumbnail(source, size=(300, 300), draft=True)
+
+    # 1/8 scale still covers the 300x300 box
+    assert source.size == (500, 375)
+    thumb = Image.open(io.BytesIO(result))
+    assert thumb.size == (300, 225)
+
+
+def test_resize_image_draft_matches_target(processor):
+    """Test draft resize produces the same dimensions as a full decode."""
+    full = processor.resize_image(_lazy_jpeg((3840, 2160)), 960, 540)
+    drafted = processor.resize_image(_lazy_jpeg((3840, 2160)), 960, 540, draft=True)
+
+    assert Image.open(io.BytesIO(drafted)).size == Image.open(io.BytesIO(full)).size
+
+
+# === UNIT TESTS: RENDITIONS ===
+
+def test_render_set_default_renditions(processor):
+    """Test all default renditions are produced from one decode."""
+    source = _lazy_jpeg((4000, 3000))
+
+    renditions = processor.render_set(source)
+
+    sizes = {name: Image.open(io.BytesIO(data)).size for name, data in renditions.items()}
+    assert sizes == {
+        "display": (1440, 1080),
+        "analysis": (1024, 768),
+        "grid": (960, 720),
+        "thumbnail": (300, 225),
+    }
+
+
+def test_render_set_does_not_upscale(processor):
+    """Test renditions larger than the source keep source dimensions."""
+    source = Image.new("RGBA", (200, 100), color="red")
+
+    renditions = processor.render_set(source, [RenditionSpec("display", 1920, 1080)])
+
+    result = Image.open(io.BytesIO(renditions["display"]))
+    assert result.size == (200, 100)
+    assert result.mode == "RGB"
+
+
+# === UNIT TESTS: OUTPUT FORMATS ===
+
+@pytest.mark.parametrize("accept,expected", [
+    (None, "JPEG"),
+    ("image/webp,image/*;q=0.8", "WEBP"),
+    ("image/avif,image/webp,*/*", "AVIF"),
+    ("image/avif;q=0,image/webp", "WEBP"),
+    ("text/html", "JPEG"),
+])
+def test_negotiate_format(accept, expected):
+    """Test the most compact accepted format wins."""
+    from app.services import encoders
+    if expected not in encoders.supported_formats():
+        pytest.skip(f"{expected} not available in this Pillow build")
+    assert encoders.negotiate_format(accept) == expected
+
+
+@pytest.mark.parametrize("format", ["WEBP", "AVIF"])
+def test_thumbnail_modern_formats(processor, real_test_image, format):
+    """Test thumbnails can be emitted as WebP/AVIF with a profile."""
+    from app.services import encoders
+    if format not in encoders.supported_formats():
+        pytest.skip(f"{format} not available in this Pillow build")
+
+    data = processor.create_thumbnail(real_test_image, (50, 50), format=format, profile="fast")
+
+    assert Image.open(io.BytesIO(data)).format == format
+
+
+def test_profiles_progressive_jpeg(processor):
+    """Test the archive profile emits progressive JPEG and fast does not."""
+    image = Image.new("RGB", (400, 300), color="teal")
+
+    archive = Image.open(io.BytesIO(processor.resize_image(image, 200, 200, None, profile="archive")))
+    fast = Image.open(io.BytesIO(processor.resize_image(image, 200, 200, None, profile="fast")))
+
+    assert archive.info.get("progressive")
+    assert not fast.info.get("progressive")
+
+
+def test_unknown_profile_rejected(processor, real_test_image):
+    with pytest.raises(ValueError):
+        processor.encode_image(real_test_image, profile="ludicrous")
+
+
 # === UNIT TESTS: FILTERS ===
 
 @pytest.mark.parametrize("filter_type,expected_mode", [
@@ -103,6 +217,86 @@ def test_apply_filter(processor, real_test_image, filter_type, expected_mode):
     assert result.mode == expected_mode or result.mode == "L"
 
 
+@pytest.mark.parametrize("filter_type", ["sharpen", "blur"])
+def test_spatial_filter_on_palette_image(processor, filter_type):
+    """Test kernel filters accept palette images (converted first)."""
+    img = Image.new("RGB", (32, 32), color="orange").quantize(16)
+
+    result = processor.apply_filter(img, filter_type)
+
+    assert result.mode == "RGB"
+    assert result.size == (32, 32)
+
+
+@pytest.fixture
+def gradient_image():
+    """RGB image covering a spread of channel values."""
+    img = Image.new("RGB", (256, 3))
+    img.putdata([(x, (x * 7) % 256, 255 - x) for x in range(256)] * 3)
+    return img
+
+
+def _max_channel_diff(a: Image.Image, b: Image.Image) -> int:
+    return max(abs(x - y) for x, y in zip(a.tobytes(), b.tobytes()))
+
+
+@pytest.mark.parametrize("filter_type,reference", [
+    ("grayscale", lambda im: im.convert("L").convert("RGB")),
+    ("sepia", lambda im: Image.merge("RGB", (
+        im.convert("L").point(lambda x: min(255, x * 1.07)),
+        im.convert("L").point(lambda x: x * 0.74),
+        im.convert("L").point(lambda x: x * 0.43),
+    ))),
+    ("brighten", lambda im: ImageEnhance.Brightness(im).enhance(1.3)),
+    ("darken", lambda im: ImageEnhance.Brightness(im).enhance(0.7)),
+])
+def test_lut_filters_match_reference(processor, gradient_image, filter_type, reference):
+    """Test LUT/matrix filters match the per-pixel reference within rounding."""
+    result = processor.apply_filter(gradient_image, filter_type)
+
+    assert result.mode == "RGB"
+    assert _max_channel_diff(result, reference(gradient_image)) <= 1
+
+
+def test_point_filter_preserves_alpha(processor):
+    """Test brighten leaves the alpha channel untouched."""
+    img = Image.new("RGBA", (4, 4), color=(100, 100, 100, 128))
+
+    result = processor.apply_filter(img, "brighten")
+
+    assert result.mode == "RGBA"
+    assert result.getpixel((0, 0)) == (130, 130, 130, 128)
+
+
+@pytest.mark.parametrize("chain", [
+    ["brighten", "darken", "brighten"],
+    ["brighten", "sepia", "darken"],
+    ["darken", "grayscale", "brighten", "sepia", "darken"],
+    ["brighten", "blur", "sepia", "sharpen", "darken"],
+])
+def test_apply_filters_matches_sequential(processor, gradient_image, chain):
+    """Test a fused chain matches applying each filter in turn."""
+    sequential = gradient_image
+    for filter_type in chain:
+        sequential = processor.apply_filter(sequential, filter_type)
+
+    fused = processor.apply_filters(gradient_image, chain)
+
+    assert fused.size == sequential.size
+    assert _max_channel_diff(fused, sequential) <= 2
+
+
+def test_fuse_collapses_colour_runs():
+    """Test spatial filters are the only pass boundaries."""
+    chain = ["brighten", "sepia", "darken", "blur", "darken", "brighten"]
+
+    passes = filters.fuse([filters.FILTERS[name] for name in chain])
+
+    assert [type(op) for op in passes] == [
+        filters.ProjectionOp, filters.SpatialOp, filters.PointOp,
+    ]
+
+
 # === ASYNC TESTS: GEMINI INTEGRATION ===
 
 @pytest.mark.asyncio
@@ -150,6 +344,319 @@ async def test_analyze_with_gemini_error_handling(processor, real_test_image):
     assert result["tags"] == []
 
 
+@pytest.mark.asyncio
+async def test_analyze_with_gemini_accepts_encoded_bytes(processor):
+    """Test pre-encoded rendition bytes are sent without re-encoding."""
+    jpeg_bytes = processor.render_set(
+        Image.new("RGB", (64, 64), color="red"), [RenditionSpec("analysis", 32, 32)]
+    )["analysis"]
+    mock_response = MagicMock()
+    mock_response.text = '{"tags": ["red"], "caption": "Red"}'
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+
+    result = await processor.analyze_with_gemini(jpeg_bytes)
+
+    assert result["tags"] == ["red"]
+    sent_part = mock_client.aio.models.generate_content.call_args.kwargs["contents"][0]
+    assert sent_part.inline_data.data == jpeg_bytes
+
+
+@pytest.mark.asyncio
+async def test_analyze_with_gemini_cached(processor, real_test_image):
+    """Test repeat analysis of the same pixels and prompt skips the API."""
+    mock_response = MagicMock()
+    mock_response.text = '{"tags": ["red"], "caption": "Red square"}'
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+
+    first = await processor.analyze_with_gemini(real_test_image)
+    second = await processor.analyze_with_gemini(real_test_image)
+    other_prompt = await processor.analyze_with_gemini(real_test_image, prompt="Just tags")
+
+    assert first == second == other_prompt
+    assert mock_client.aio.models.generate_content.await_count == 2
+    assert processor.analysis_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_analyze_source_checks_cache_before_decode(processor):
+    """Test a cached source hash returns without decoding."""
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(side_effect=Exception("API Error"))
+    processor.client = mock_client
+    data = b"not even an image"
+    key = processor.analysis_cache.make_key(
+        processor.analysis_cache.fingerprint(data), DEFAULT_ANALYSIS_PROMPT, processor.model_name
+    )
+    await processor.analysis_cache.set(key, {"tags": ["cached"], "caption": None})
+
+    result = await processor.analyze_source(data)
+
+    assert result["tags"] == ["cached"]
+    mock_client.aio.models.generate_content.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_analysis_errors_not_cached(processor, real_test_image):
+    """Test failed analyses are retried rather than cached."""
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(side_effect=Exception("API Error"))
+    processor.client = mock_client
+
+    await processor.analyze_with_gemini(real_test_image)
+    await processor.analyze_with_gemini(real_test_image)
+
+    assert mock_client.aio.models.generate_content.await_count == 2
+
+
+def _jpeg(color: str, size=(64, 64)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color=color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_analyze_batch_single_request(processor):
+    """Test several images share one request and are split by index."""
+    mock_response = MagicMock()
+    mock_response.text = (
+        '[{"index": 1, "tags": ["green"], "caption": "G", "mood": "calm", "colors": []},'
+        ' {"index": 0, "tags": ["red"], "caption": "R", "mood": "warm", "colors": []},'
+        ' {"index": 2, "tags": ["blue"], "caption": "B", "mood": "cool", "colors": []}]'
+    )
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+    images = [_jpeg("red"), _jpeg("green"), _jpeg("blue")]
+
+    results = await processor.analyze_batch_with_gemini(images)
+    again = await processor.analyze_batch_with_gemini(images)
+
+    assert [r["tags"] for r in results] == [["red"], ["green"], ["blue"]]
+    assert "index" not in results[0]
+    assert again == results
+    assert mock_client.aio.models.generate_content.await_count == 1
+    call = mock_client.aio.models.generate_content.call_args.kwargs
+    assert call["config"].response_schema is not None
+    assert sum(1 for part in call["contents"] if getattr(part, "inline_data", None)) == 3
+
+
+@pytest.mark.asyncio
+async def test_analyze_batch_missing_entries_not_cached(processor):
+    """Test images absent from the response get an error and are retried."""
+    mock_response = MagicMock()
+    mock_response.text = '[{"index": 0, "tags": ["red"], "caption": "R", "mood": "", "colors": []}]'
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+
+    results = await processor.analyze_batch_with_gemini([_jpeg("red"), _jpeg("green")])
+
+    assert results[0]["tags"] == ["red"]
+    assert "error" in results[1]
+    assert await processor.analysis_cache.get(
+        processor.analysis_cache.make_key(
+            processor.analysis_cache.fingerprint(_jpeg("green")),
+            DEFAULT_ANALYSIS_PROMPT,
+            processor.model_name,
+        )
+    ) is None
+
+
+@pytest.mark.asyncio
+async def test_analyze_sources_downscales(processor):
+    """Test sources are downscaled to the analysis rendition before sending."""
+    mock_response = MagicMock()
+    mock_response.text = (
+        '[{"index": 0, "tags": [], "caption": "", "mood": "", "colors": []},'
+        ' {"index": 1, "tags": [], "caption": "", "mood": "", "colors": []}]'
+    )
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+
+    await processor.analyze_sources([_jpeg("red", (3000, 2000)), _jpeg("blue", (2000, 3000))])
+
+    contents = mock_client.aio.models.generate_content.call_args.kwargs["contents"]
+    sent = [Image.open(io.BytesIO(p.inline_data.data)) for p in contents if getattr(p, "inline_data", None)]
+    assert [image.size for image in sent] == [(1024, 682), (682, 1024)]
+
+
+@pytest.mark.asyncio
+async def test_analyze_sources_isolates_bad_images(processor):
+    """Test a corrupt image fails only its own entry; the rest are still analyzed."""
+    mock_response = MagicMock()
+    mock_response.text = (
+        '[{"index": 0, "tags": ["red"], "caption": "", "mood": "", "colors": []},'
+        ' {"index": 1, "tags": ["blue"], "caption": "", "mood": "", "colors": []}]'
+    )
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+
+    results = await processor.analyze_sources(
+        [_jpeg("red", (300, 200)), b"not an image", _jpeg("blue", (200, 300))]
+    )
+
+    assert [result["tags"] for result in results] == [["red"], [], ["blue"]]
+    assert "error" in results[1] and results[1]["caption"] is None
+    contents = mock_client.aio.models.generate_content.call_args.kwargs["contents"]
+    assert sum(1 for part in contents if getattr(part, "inline_data", None)) == 2
+
+
+def test_prepare_analysis_input_bounds(processor):
+    """Test analysis inputs respect the long-edge limit and byte budget."""
+    import os
+    noisy = Image.frombytes("RGB", (2400, 1600), os.urandom(2400 * 1600 * 3))
+
+    data = processor.prepare_analysis_input(noisy, max_edge=1024, max_bytes=150 * 1024)
+    sent = Image.open(io.BytesIO(data))
+
+    assert max(sent.size) <= 1024
+    assert len(data) <= 150 * 1024
+    assert noisy.size == (2400, 1600)  # Caller's image untouched
+
+
+@pytest.mark.asyncio
+async def test_analyze_with_gemini_downscales_input(processor):
+    """Test full-resolution images are not uploaded as-is."""
+    mock_response = MagicMock()
+    mock_response.text = '{"tags": [], "caption": null}'
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+    processor.client = mock_client
+
+    await processor.analyze_with_gemini(Image.new("RGB", (4000, 3000), color="red"))
+
+    sent_part = mock_client.aio.models.generate_content.call_args.kwargs["contents"][0]
+    assert Image.open(io.BytesIO(sent_part.inline_data.data)).size == (1024, 768)
+
+
+def test_seeded_rendition_reused(processor, tmp_path):
+    """Test a cached analysis rendition is served instead of re-rendering."""
+    from app.services.derivative_cache import DerivativeCache
+    processor.cache = DerivativeCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    source = _jpeg("red", (3000, 2000))
+    rendition = processor.render_set(Image.open(io.BytesIO(source)))["analysis"]
+
+    assert processor.seed_analysis_input(source, rendition)
+    assert asyncio.run(processor.prepare_analysis_input_async(source)) == rendition
+    assert processor.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_analysis_batcher_flushes_full_and_on_timeout():
+    """Test the micro-batcher flushes on size, and on max-wait for stragglers."""
+    from app.services.analysis_batcher import AnalysisBatcher
+
+    batches = []
+
+    async def analyze(sources, prompt):
+        batches.append(list(sources))
+        return [{"tags": [source.decode()]} for source in sources]
+
+    batcher = AnalysisBatcher(analyze, max_batch=2, max_wait=0.01)
+    results = await asyncio.gather(*(batcher.submit(str(i).encode()) for i in range(3)))
+
+    assert [r["tags"] for r in results] == [["0"], ["1"], ["2"]]
+    assert batches == [[b"0", b"1"], [b"2"]]
+
+
+@pytest.mark.asyncio
+async def test_memory_analysis_backend_eviction():
+    """Test the memory backend honours TTL and entry cap."""
+    backend = MemoryAnalysisBackend(ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        await backend.set(key, {"tags": [key]})
+
+    assert await backend.get("a") is None
+    assert await backend.get("c") == {"tags": ["c"]}
+
+    expired = MemoryAnalysisBackend(ttl=-1, max_entries=2)
+    await expired.set("a", {"tags": []})
+    assert await expired.get("a") is None
+
+
+class _FakeAsyncRedis:
+    """The commands RedisAnalysisBackend uses, with manual expiry."""
+
+    def __init__(self):
+        self.values: dict[str, str] = {}
+        self.index: dict[str, float] = {}
+        self.commands: list = []
+
+    def pipeline(self, transaction=False):
+        fake = self
+
+        class Pipeline:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: fake.commands.append((name, args, kwargs))
+
+            async def execute(self):
+                results = [await getattr(fake, name)(*args, **kwargs) for name, args, kwargs in fake.commands]
+                fake.commands = []
+                return results
+
+        return Pipeline()
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def zadd(self, name, mapping):
+        self.index.update(mapping)
+
+    async def zcard(self, name):
+        return len(self.index)
+
+    async def zremrangebyscore(self, name, low, high):
+        dead = [member for member, score in self.index.items() if score <= high]
+        for member in dead:
+            del self.index[member]
+        return len(dead)
+
+    async def zpopmin(self, name, count):
+        oldest = sorted(self.index.items(), key=lambda item: item[1])[:count]
+        for member, _ in oldest:
+            del self.index[member]
+        return oldest
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+@pytest.mark.asyncio
+async def test_redis_analysis_backend_trims_expired_members_first(monkeypatch):
+    """Test expired index members don't take slots from live entries."""
+    from app.services import analysis_cache
+
+    backend = analysis_cache.RedisAnalysisBackend("redis://localhost", ttl=60, max_entries=2)
+    backend.redis = _FakeAsyncRedis()
+    now = [1000.0]
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: now[0])
+
+    await backend.set("old", {"tags": []})
+    backend.redis.values.pop("old")  # Expired by Redis
+    now[0] += 120
+    await backend.set("a", {"tags": ["a"]})
+    await backend.set("b", {"tags": ["b"]})
+
+    assert set(backend.redis.index) == {"a", "b"}
+    assert await backend.get("a") == {"tags": ["a"]}
+
+
 # === ASYNC TESTS: DOWNLOAD ===
 
 @pytest.mark.asyncio
@@ -161,12 +668,12 @@ async def test_download_image_success(processor):
     test_img.save(buffer, format="PNG")
     test_bytes = buffer.getvalue()
     
-    with patch("httpx.AsyncClient") as mock_client:
+    with patch("app.services.image_processor.get_http_client") as mock_client:
         mock_response = MagicMock()
         mock_response.content = test_bytes
         mock_response.raise_for_status = MagicMock()
         
-        mock_client.return_value.__aenter__.return_value.get = AsyncMock(return_value=mock_response)
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
         
         result = await processor.download_image("https://example.com/test.png")
         
@@ -174,6 +681,177 @@ async def test_download_image_success(processor):
         assert result.size == (50, 50)
 
 
+class _StreamingResponse:
+    """Minimal stand-in for an httpx streaming response."""
+
+    def __init__(self, body: bytes, headers: dict, chunk_size: int = 4096):
+        self.body = body
+        self.headers = headers
+        self.chunk_size = chunk_size
+        self.chunks_read = 0
+
+    def raise_for_status(self):
+        pass
+
+    async def aiter_bytes(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.chunks_read += 1
+            yield self.body[start:start + self.chunk_size]
+
+
+def _png_bytes(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color="blue").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_download_image_streaming(processor):
+    """Test streaming mode assembles chunks and decodes the result."""
+    response = _StreamingResponse(_png_bytes((64, 48)), {"content-type": "image/png"}, chunk_size=64)
+
+    with patch("app.services.image_processor.get_http_client") as mock_client:
+        stream_ctx = MagicMock()
+        stream_ctx.__aenter__ = AsyncMock(return_value=response)
+        stream_ctx.__aexit__ = AsyncMock(return_value=False)
+        mock_client.return_value.stream = MagicMock(return_value=stream_ctx)
+
+        result = await processor.download_image("https://example.com/test.png", stream=True)
+
+    assert result.size == (64, 48)
+    assert response.chunks_read > 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("declared", [None, 1000])
+async def test_stream_decode_matches_plain_decode(processor, declared):
+    """Test a many-chunk JPEG decodes once to the same pixels, whatever Content-Length says."""
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 600), 40).convert("RGB").save(buffer, format="JPEG")
+    body = buffer.getvalue()
+    headers = {"content-length": str(declared or len(body))}
+
+    result = await processor._stream_decode(_StreamingResponse(body, headers, chunk_size=1024))
+
+    assert result.tobytes() == Image.open(io.BytesIO(body)).tobytes()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body,headers,limits", [
+    (b"<html>" + b"x" * 100, {"content-type": "text/html"}, {}),
+    (b"x" * 100, {"content-length": "100"}, {"max_bytes": 50}),
+    (b"\0" * (2 * 1024 * 1024), {}, {}),
+])
+async def test_stream_decode_rejects(processor, body, headers, limits):
+    """Test oversized and non-image payloads are rejected early."""
+    with pytest.raises(ImageRejectedError):
+        await processor._stream_decode(_StreamingResponse(body, headers), **limits)
+
+
+@pytest.mark.asyncio
+async def test_stream_decode_sniffs_past_large_app_segments(processor):
+    """Test a JPEG whose SOF follows over 1 MB of APP data still decodes."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color="teal").save(buffer, format="JPEG")
+    plain = buffer.getvalue()
+    app_segment = b"\xff\xe2" + (65535).to_bytes(2, "big") + b"\0" * 65533
+    body = plain[:2] + app_segment * 40 + plain[2:]  # ~2.6 MB before the frame header
+
+    result = await processor._stream_decode(_StreamingResponse(body, {}, chunk_size=64 * 1024))
+
+    assert result.size == (64, 48)
+    with pytest.raises(ImageRejectedError):
+        await processor._stream_decode(
+            _StreamingResponse(body, {}, chunk_size=64 * 1024), max_pixels=1000
+        )
+
+
+@pytest.mark.asyncio
+async def test_stream_decode_rejects_pixel_budget(processor):
+    """Test the pixel budget is enforced from the header alone."""
+    response = _StreamingResponse(_png_bytes((400, 400)), {}, chunk_size=256)
+
+    with pytest.raises(ImageRejectedError):
+        await processor._stream_decode(response, max_pixels=10_000)
+    # Aborted long before the body was consumed
+    assert response.chunks_read < 3
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_shared():
+    """Test downloads reuse one pooled client until it is closed."""
+    from app.services.http_client import get_http_client, close_http_client
+
+    client = get_http_client()
+    assert get_http_client() is client
+
+    await close_http_client()
+    assert client.is_closed
+    assert get_http_client() is not client
+    await close_http_client()
+
+
+@pytest.mark.asyncio
+async def test_downloads_do_not_follow_redirects(processor):
+    """Test a 3xx from a vetted URL never reaches the redirect target."""
+    import httpx
+    from app.services import http_client
+
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.host)
+        return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})
+
+    real_client = httpx.AsyncClient
+    with patch.object(
+        http_client.httpx, "AsyncClient",
+        lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs),
+    ):
+        await http_client.close_http_client()
+        with pytest.raises(httpx.HTTPStatusError):
+            await processor.download_bytes("https://cdn.test/a.jpg")
+        await http_client.close_http_client()
+
+    assert requested == ["cdn.test"]
+
+
+# === ASYNC TESTS: PROCESS POOL ===
+
+@pytest.fixture
+def pooled_processor():
+    """ImageProcessor with a single-worker process pool."""
+    proc = ImageProcessor()
+    proc.start_pool(max_workers=1)
+    yield proc
+    proc.shutdown_pool()
+
+
+@pytest.mark.asyncio
+async def test_pooled_decode_filter_resize(pooled_processor):
+    """Test the pool round-trips pixels and bytes through shared memory."""
+    source = Image.new("RGBA", (120, 80), color=(200, 100, 50, 255))
+    data = pooled_processor.encode_image(source, format="PNG")
+
+    decoded = await pooled_processor.decode_async(data)
+    assert decoded.size == (120, 80)
+    assert decoded.mode == "RGBA"
+
+    filtered = await pooled_processor.apply_filter_async(decoded, "grayscale")
+    assert filtered.tobytes() == pooled_processor.apply_filter(decoded, "grayscale").tobytes()
+
+    resized = await pooled_processor.resize_async(filtered, 60, 60)
+    assert Image.open(io.BytesIO(resized)).size == (60, 40)
+
+
+@pytest.mark.asyncio
+async def test_async_wrappers_without_pool(processor, real_test_image):
+    """Test async wrappers fall back to a thread when no pool is running."""
+    encoded = await processor.encode_async(real_test_image, quality=80)
+    decoded = await processor.decode_async(encoded)
+    assert decoded.size == real_test_image.size
+
+
 # === INTEGRATION TEST: FULL PIPELINE ===
 
 def test_full_processing_pipeline(processor, real_test_image):
@@ -0,0 +1,63 @@
+"""
+Neural Canvas Backend - Palette Engine Tests
+Tests for local dominant-colour extraction.
+"""
+
+import io
+
+from PIL import Image
+
+from app.services.image_processor import image_processor
+from app.services.palette import extract_palettes, to_hex
+
+
+def _two_tone(left: str, right: str, split: float = 0.5, size=(400, 200)) -> Image.Image:
+    image = Image.new("RGB", size, color=right)
+    image.paste(Image.new("RGB", (int(size[0] * split), size[1]), color=left), (0, 0))
+    return image
+
+
+# === UNIT TESTS ===
+
+def test_palette_colours_and_weights():
+    """Test dominant colours are found with weights summing to one."""
+    palette = image_processor.extract_palette(_two_tone("#ff0000", "#0000ff", split=0.75))
+
+    assert [c["hex"] for c in palette] == ["#ff0000", "#0000ff"]
+    assert abs(palette[0]["weight"] - 0.75) < 0.02
+    assert abs(sum(c["weight"] for c in palette) - 1) < 1e-3
+
+
+def test_palette_batch_matches_single():
+    """Test batched extraction gives the same result as one at a time."""
+    images = [_two_tone("#ff0000", "#00ff00"), _two_tone("#202020", "#f0f0f0", split=0.3)]
+
+    batch = extract_palettes(images)
+
+    assert batch == [image_processor.extract_palette(image) for image in images]
+
+
+def test_palette_ignores_transparent_pixels():
+    """Test fully transparent areas don't contribute colours."""
+    image = Image.new("RGBA", (100, 100), (0, 0, 0, 0))
+    image.paste(Image.new("RGBA", (50, 100), (0, 128, 255, 255)), (0, 0))
+
+    palette = image_processor.extract_palette(image)
+
+    assert palette == [{"hex": "#0080ff", "weight": 1.0}]
+
+
+def test_palette_draft_decode():
+    """Test lazily-opened JPEGs can be drafted before sampling."""
+    buffer = io.BytesIO()
+    _two_tone("#ff0000", "#0000ff", size=(2000, 1000)).save(buffer, format="JPEG")
+    image = Image.open(io.BytesIO(buffer.getvalue()))
+
+    palette = image_processor.extract_palette(image, count=2, draft=True)
+
+    assert image.size[0] < 2000
+    assert len(palette) == 2
+
+
+def test_to_hex_clamps():
+    assert to_hex((300, -5, 127.6)) == "#ff0080"
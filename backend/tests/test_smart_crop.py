@@ -0,0 +1,116 @@
+"""
+Neural Canvas Backend - Smart Crop Tests
+Tests for the server-side hero crop (parity with utils/smartCrop.ts).
+"""
+
+import io
+
+import pytest
+from httpx import AsyncClient
+from PIL import Image
+
+from app.routers.batch import _batch_jobs, process_batch_smart_crop
+from app.services.image_processor import image_processor
+from app.services.smart_crop import calculate_smart_crop, energy_focus
+
+
+# === UNIT TESTS: CROP GEOMETRY ===
+
+@pytest.mark.parametrize("width,height", [(1920, 1080), (1000, 1000), (3440, 1440), (1080, 1920)])
+def test_crop_is_largest_16_9_inside(width, height):
+    """Test the crop keeps 16:9 and stays inside the image."""
+    x, y, crop_w, crop_h = calculate_smart_crop(width, height)
+
+    assert crop_w / crop_h == pytest.approx(16 / 9)
+    assert x >= 0 and y >= 0
+    assert x + crop_w <= width + 1e-6 and y + crop_h <= height + 1e-6
+    assert crop_w == pytest.approx(width) or crop_h == pytest.approx(height)
+
+
+def test_crop_centres_on_focal_point():
+    """Test the crop is centred on the focal point."""
+    _, y, _, crop_h = calculate_smart_crop(1000, 2000, focal_point={"x": 0.5, "y": 0.75})
+
+    assert y + crop_h / 2 == pytest.approx(1500)
+
+
+def test_crop_keeps_subject_box():
+    """Test the subject box stays in frame on a panorama."""
+    box = [0.2, 0.8, 0.6, 0.95]  # [ymin, xmin, ymax, xmax]
+    x, _, crop_w, _ = calculate_smart_crop(4000, 1000, box=box)
+
+    assert x <= 0.8 * 4000
+    assert x + crop_w >= 0.95 * 4000
+
+
+def test_thirds_places_subject_on_line():
+    """Test rule-of-thirds shifts the subject onto the right-hand line."""
+    x, _, crop_w, _ = calculate_smart_crop(4000, 1000, focal_point={"x": 0.5, "y": 0.5}, composition="thirds")
+
+    assert 2000 - x == pytest.approx(crop_w * 0.66)
+
+
+# === UNIT TESTS: EDGE-ENERGY FALLBACK ===
+
+def _busy_patch(size=(1000, 1000), at=(700, 50)) -> Image.Image:
+    image = Image.new("RGB", size, "white")
+    image.paste(Image.effect_noise((200, 200), 80).convert("RGB"), at)
+    return image
+
+
+def test_energy_focus_finds_detail():
+    """Test the focus moves towards the textured region."""
+    assert energy_focus(_busy_patch())["y"] < 0.4
+    flat = energy_focus(Image.new("RGB", (1000, 1000), "gray"))
+    assert flat["x"] == 0.5 and flat["y"] == pytest.approx(0.5, abs=0.01)
+
+
+def test_smart_crop_rendition():
+    """Test the rendition is 16:9, within size and keeps the detail."""
+    data = image_processor.smart_crop(_busy_patch(), size=(640, 360))
+    cropped = Image.open(io.BytesIO(data))
+
+    assert cropped.size == (640, 360)
+    top = cropped.crop((0, 0, 640, 60)).convert("L")
+    assert max(top.getextrema()) - min(top.getextrema()) > 50  # Noise visible near the top
+
+
+def test_smart_crop_derivative_draft():
+    """Test the cached derivative path drafts large JPEGs and honours size."""
+    buffer = io.BytesIO()
+    _busy_patch((4000, 3000), (2800, 200)).save(buffer, format="JPEG")
+
+    data = image_processor.render_derivative(
+        buffer.getvalue(), "smart_crop", {"width": 800, "height": 450, "composition": "thirds"}
+    )
+
+    assert Image.open(io.BytesIO(data)).size == (800, 450)
+
+
+# === BATCH OPERATION ===
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("params", [
+    {"width": "wide"},
+    {"width": 0},
+    {"height": -5},
+    {"width": 100_000},
+    {"subjects": ["a"]},
+    {"subjects": {"a": "box"}},
+])
+async def test_smart_crop_batch_rejects_bad_params(authenticated_client: AsyncClient, params):
+    response = await authenticated_client.post("/batch/process", json={
+        "asset_ids": ["a"], "operation": "smart_crop", "params": params,
+    })
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_smart_crop_job_fails_on_bad_params():
+    """Test bad params reaching the background task fail the job instead of hanging it."""
+    _batch_jobs["bad-crop"] = {"status": "queued", "processed": 0, "total": 1, "failed_ids": [], "outputs": {}}
+
+    await process_batch_smart_crop("bad-crop", ["a"], "u", {"width": "x"}, "sqlite+aiosqlite://")
+
+    assert _batch_jobs.pop("bad-crop")["status"] == "failed"
@@ -0,0 +1,165 @@
+"""
+Neural Canvas Backend - Storage Backend Tests
+Tests for the local-filesystem and S3 storage backends.
+"""
+
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+from httpx import AsyncClient
+from PIL import Image
+
+from app.config import settings
+from app.services.image_probe import image_probe
+from app.services.storage_backends import LocalBackend, S3Backend, StorageError, create_backend
+from app.services.storage_service import StorageService
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    return LocalBackend(str(tmp_path), "http://localhost:8000/storage")
+
+
+# === LOCAL BACKEND ===
+
+def test_local_put_get_range_head_delete(local):
+    local.put("renditions/a/grid.jpg", memoryview(b"0123456789"), "image/jpeg")
+
+    assert local.get("renditions/a/grid.jpg") == b"0123456789"
+    assert local.get("renditions/a/grid.jpg", 2, 5) == b"234"
+    assert local.get("renditions/a/grid.jpg", 8, 100) == b"89"
+    info = local.head("renditions/a/grid.jpg")
+    assert (info.size, info.content_type) == (10, "image/jpeg")
+
+    local.delete("renditions/a/grid.jpg")
+    local.delete("renditions/a/grid.jpg")  # Idempotent
+    assert local.head("renditions/a/grid.jpg") is None
+    with pytest.raises(StorageError):
+        local.get("renditions/a/grid.jpg")
+
+
+def test_local_layout_fans_out_and_leaves_no_temp_files(local, tmp_path):
+    """Test keys map to hashed subdirectories and overwrites are atomic renames."""
+    for i in range(20):
+        local.put(f"renditions/{i}/grid.jpg", b"x" * i, "image/jpeg")
+    local.put("renditions/0/grid.jpg", b"new", "image/jpeg")
+    local.put("../../escape.jpg", b"y", "image/jpeg")
+
+    path = local.path_for("renditions/3/grid.jpg")
+    assert path.relative_to(tmp_path).parts[:2] == (path.parent.parent.name, path.parent.name)
+    assert len({local.path_for(f"renditions/{i}/grid.jpg").parent for i in range(20)}) > 1
+    assert local.get("renditions/0/grid.jpg") == b"new"
+    assert local.path_for("../../escape.jpg").is_relative_to(tmp_path)
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.startswith(".tmp-")]
+
+
+def test_local_empty_object_and_long_key(local):
+    long_key = "a/" * 200 + "x.png"
+    local.put(long_key, b"", "image/png")
+
+    assert local.get(long_key) == b""
+    assert len(local.path_for(long_key).name) == 64
+
+
+def test_storage_service_on_local_backend(local):
+    storage = StorageService(local)
+
+    url = storage.upload_image(b"data", "renditions/a/grid.jpg")
+
+    assert url == "http://localhost:8000/storage/renditions/a/grid.jpg"
+    assert storage.local_key(url) == "renditions/a/grid.jpg"
+    assert storage.local_key("https://example.com/a.jpg") is None
+    assert storage.read_object("renditions/a/grid.jpg", 0, 2) == b"da"
+    assert storage.generate_presigned_url("renditions/a/grid.jpg") == url
+
+
+# === ROUTE ===
+
+@pytest.mark.asyncio
+async def test_storage_route_serves_ranges(async_client: AsyncClient, local):
+    local.put("renditions/a/grid.jpg", b"0123456789", "image/jpeg")
+
+    with patch("app.routers.storage.storage_service", StorageService(local)):
+        full = await async_client.get("/storage/renditions/a/grid.jpg")
+        partial = await async_client.get(
+            "/storage/renditions/a/grid.jpg", headers={"Range": "bytes=2-4"}
+        )
+        head = await async_client.head("/storage/renditions/a/grid.jpg")
+        missing = await async_client.get("/storage/renditions/b/grid.jpg")
+
+    assert full.status_code == 200
+    assert full.content == b"0123456789"
+    assert full.headers["content-type"] == "image/jpeg"
+    assert partial.status_code == 206
+    assert partial.content == b"234"
+    assert partial.headers["content-range"] == "bytes 2-4/10"
+    assert head.headers["content-length"] == "10"
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_storage_route_requires_explicit_local_backend(async_client: AsyncClient, local, monkeypatch):
+    """Test a local backend alone doesn't expose objects without the opt-in."""
+    local.put("renditions/a/grid.jpg", b"0123456789", "image/jpeg")
+    monkeypatch.setattr(settings, "storage_backend", "auto")
+
+    with patch("app.routers.storage.storage_service", StorageService(local)):
+        response = await async_client.get("/storage/renditions/a/grid.jpg")
+
+    assert response.status_code == 404
+
+
+def test_auto_backend_never_falls_back_to_local(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "r2_access_key_id", "")
+    monkeypatch.setattr(settings, "storage_local_root", str(tmp_path))
+    monkeypatch.setattr(settings, "storage_backend", "auto")
+    assert create_backend() is None
+
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    assert create_backend().is_local
+
+
+@pytest.mark.asyncio
+async def test_storage_route_disabled_for_s3(async_client: AsyncClient):
+    with patch("app.routers.storage.storage_service", StorageService(S3Backend(MagicMock(), "b"))):
+        response = await async_client.get("/storage/a.jpg")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_probe_reads_local_objects_directly(local):
+    """Test owned local URLs are probed from disk, not over HTTP."""
+    storage = StorageService(local)
+    image = Image.effect_noise((640, 480), 40).convert("RGB")
+    url = storage.upload_image(b"", "uploads/a.jpg")
+    with storage.backend.path_for("uploads/a.jpg").open("wb") as file:
+        image.save(file, "JPEG")
+
+    with patch("app.services.image_probe.storage_service", storage), \
+         patch("app.services.image_probe.get_http_client") as http:
+        result = await image_probe.probe(url)
+
+    assert (result.width, result.height) == (640, 480)
+    http.assert_not_called()
+
+
+# === S3 BACKEND ===
+
+def test_s3_backend_ranges_and_missing_objects():
+    client = MagicMock()
+    client.get_object.return_value = {"Body": MagicMock(read=lambda: b"234")}
+    client.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+    backend = S3Backend(client, "bucket", "https://cdn.test/")
+
+    assert backend.get("a.jpg", 2, 5) == b"234"
+    client.get_object.assert_called_once_with(Bucket="bucket", Key="a.jpg", Range="bytes=2-4")
+    assert backend.head("a.jpg") is None
+    assert backend.url_for("a.jpg") == "https://cdn.test/a.jpg"
+
+    client.delete_object.side_effect = ClientError({"Error": {"Code": "403"}}, "DeleteObject")
+    with pytest.raises(StorageError):
+        backend.delete("a.jpg")
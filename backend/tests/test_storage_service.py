@@ -0,0 +1,157 @@
+"""
+Neural Canvas Backend - Storage Service Tests
+Tests for the non-blocking StorageService API.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.config import settings
+from app.services.storage_backends import S3Backend
+from app.services.storage_service import StorageService, UploadItem
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """StorageService with a mocked S3 client whose calls block for 50 ms."""
+    monkeypatch.setattr(settings, "storage_max_concurrency", 2)
+    service = StorageService(S3Backend(MagicMock(), "bucket", "https://cdn.test"))
+    service.active = 0
+    service.peak = 0
+    lock = threading.Lock()
+
+    def slow_upload(fileobj, bucket, key, **kwargs):
+        with lock:
+            service.active += 1
+            service.peak = max(service.peak, service.active)
+        time.sleep(0.05)
+        with lock:
+            service.active -= 1
+
+    service.backend.client.upload_fileobj.side_effect = slow_upload
+    service.backend.client.generate_presigned_url.return_value = "https://signed.test/a"
+    yield service
+    service.shutdown()
+
+
+# === ASYNC API ===
+
+@pytest.mark.asyncio
+async def test_upload_async_keeps_loop_responsive(storage):
+    """Test uploads run off the event loop within the concurrency bound."""
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticking = asyncio.create_task(ticker())
+    urls = await asyncio.gather(
+        *(storage.upload_image_async(b"data", f"renditions/{i}.jpg") for i in range(6))
+    )
+    ticking.cancel()
+
+    assert urls == [f"https://cdn.test/renditions/{i}.jpg" for i in range(6)]
+    assert storage.peak == 2
+    assert ticks > 10  # Loop kept running during ~150 ms of blocking uploads
+
+
+@pytest.mark.asyncio
+async def test_async_counterparts_delegate(storage):
+    """Test delete and presign have awaitable forms."""
+    assert await storage.generate_presigned_url_async("a.jpg", 60) == "https://signed.test/a"
+    assert await storage.delete_object_async("a.jpg") is True
+    storage.backend.client.delete_object.assert_called_once_with(Bucket="bucket", Key="a.jpg")
+
+
+# === BULK UPLOADS ===
+
+def test_upload_many_parallel_with_per_object_results(storage):
+    """Test small objects are PUT in parallel and failures stay per object."""
+    def slow_put(Bucket, Key, Body, **kwargs):
+        time.sleep(0.01)
+        if Key.endswith("bad.jpg"):
+            raise RuntimeError("boom")
+
+    storage.backend.client.put_object.side_effect = slow_put
+    items = [UploadItem(f"renditions/{i}/grid.jpg", b"x" * 1024) for i in range(200)]
+    items.append(UploadItem("renditions/bad.jpg", memoryview(b"y" * 10)))
+
+    report = storage.upload_many(items, parallelism=50)
+
+    assert [r.object_key for r in report.results] == [item.object_key for item in items]
+    assert report.succeeded == 200
+    assert [r.object_key for r in report.failed] == ["renditions/bad.jpg"]
+    assert report.results[0].url == "https://cdn.test/renditions/0/grid.jpg"
+    assert report.total_bytes == 200 * 1024 + 10
+    assert report.seconds < 1.0  # Serially this is over 2 s
+    assert report.objects_per_second > 200
+    storage.backend.client.upload_fileobj.assert_not_called()
+
+
+def test_upload_many_reuses_one_bounded_pool(storage):
+    """Test calls share the long-lived bulk pool and respect per-call parallelism."""
+    active = peak = 0
+    lock = threading.Lock()
+    threads = set()
+
+    def slow_put(Bucket, Key, Body, **kwargs):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+            threads.add(threading.current_thread().name)
+        time.sleep(0.005)
+        with lock:
+            active -= 1
+
+    storage.backend.client.put_object.side_effect = slow_put
+    for _ in range(3):
+        report = storage.upload_many([UploadItem(f"{i}.jpg", b"x") for i in range(40)], parallelism=4)
+        assert report.succeeded == 40
+
+    assert peak == 4
+    assert len(threads) <= settings.storage_upload_parallelism
+    assert all(name.startswith("storage-bulk") for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_upload_many_async_stays_within_storage_bound(storage):
+    """Test async bulk uploads run on the storage pool, not a pool of their own."""
+    active = peak = 0
+    lock = threading.Lock()
+
+    def slow_put(Bucket, Key, Body, **kwargs):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+
+    storage.backend.client.put_object.side_effect = slow_put
+    items = [UploadItem(f"renditions/{i}.jpg", b"x") for i in range(10)]
+
+    report = await storage.upload_many_async(items, parallelism=50)
+
+    assert [r.object_key for r in report.results] == [item.object_key for item in items]
+    assert report.succeeded == 10
+    assert peak == settings.storage_max_concurrency
+
+
+def test_upload_many_without_backend(monkeypatch):
+    monkeypatch.setattr(settings, "storage_backend", "s3")
+    monkeypatch.setattr(settings, "r2_access_key_id", "")
+    service = StorageService()
+
+    report = service.upload_many([UploadItem("a.jpg", b"data")])
+
+    assert report.succeeded == 0
+    assert report.failed[0].error == "Storage not configured"
@@ -0,0 +1,244 @@
+"""
+Neural Canvas Backend - Celery Task Tests
+Tests for the micro-batched analysis pipeline (run eagerly, no broker).
+"""
+
+import io
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.database import Base
+from app.models.asset import Asset
+from app.models.user import User
+from app.services.storage_backends import S3Backend
+from app.services.storage_service import StorageService
+from app.workers import tasks
+
+
+class FakeRedis:
+    """The list operations the analysis queue uses."""
+
+    def __init__(self):
+        self.lists: dict[str, list] = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.lists.setdefault(key, []).insert(0, value)
+        return len(self.lists[key])
+
+    def lpop(self, key, count):
+        items = self.lists.get(key, [])
+        popped, self.lists[key] = items[:count], items[count:]
+        return popped or None
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(tasks, "_redis", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def assets(tmp_path, monkeypatch):
+    """Three pending assets in a file-backed SQLite database (tasks run their own loop)."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tasks.db'}")
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr("app.database.async_session_maker", maker)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with maker() as db:
+            db.add(User(id="u", email="u@test.com", hashed_password="x"))
+            for i in range(3):
+                db.add(Asset(
+                    id=f"a{i}", owner_id="u", storage_url=f"https://cdn.test/{i}.jpg",
+                    width=10, height=10, processing_status="pending",
+                ))
+            await db.commit()
+
+    tasks._run(setup())
+
+    def load():
+        async def query():
+            async with maker() as db:
+                return {a.id: a for a in (await db.execute(select(Asset))).scalars()}
+        return tasks._run(query())
+
+    yield load
+    tasks._run(engine.dispose())
+
+
+def _queue(redis, count=3):
+    for i in range(count):
+        redis.rpush(
+            tasks.PENDING_ANALYSIS_KEY,
+            json.dumps({"asset_id": f"a{i}", "image_url": f"https://cdn.test/{i}.jpg"}),
+        )
+
+
+def _gemini(*outcomes):
+    """analyze_sources stand-in: one list of per-image results per call."""
+    calls = iter(outcomes)
+    return AsyncMock(side_effect=lambda sources: next(calls)(sources))
+
+
+def test_gemini_failure_retries_batch_without_losing_items(redis, assets):
+    """Test a failed Gemini call is retried by Celery and every result reaches the DB."""
+    _queue(redis)
+    analyze = _gemini(
+        lambda sources: [{"error": "503 unavailable", "tags": [], "caption": None} for _ in sources],
+        lambda sources: [{"tags": [f"t{i}"], "caption": f"c{i}"} for i in range(len(sources))],
+    )
+
+    with patch.object(tasks.analyze_images, "delay", lambda items: tasks.analyze_images.apply(args=[items])), \
+         patch("app.services.image_processor.image_processor.download_bytes", AsyncMock(return_value=b"img")), \
+         patch("app.services.image_processor.image_processor.analyze_sources", analyze):
+        result = tasks.analyze_pending_images()
+
+    assert result["dispatched"] == 3
+    assert analyze.call_count == 2
+    rows = assets()
+    assert [rows[f"a{i}"].tags for i in range(3)] == [["t0"], ["t1"], ["t2"]]
+    assert all(row.analyzed and row.processing_status == "completed" for row in rows.values())
+
+
+def test_only_failed_items_are_retried(redis, assets):
+    _queue(redis)
+    analyze = _gemini(
+        lambda sources: [
+            {"tags": ["ok"], "caption": None},
+            {"error": "Missing from batch response", "tags": [], "caption": None},
+            {"tags": ["ok"], "caption": None},
+        ],
+        lambda sources: [{"tags": ["retried"], "caption": None} for _ in sources],
+    )
+
+    with patch.object(tasks.analyze_images, "delay", lambda items: tasks.analyze_images.apply(args=[items])), \
+         patch("app.services.image_processor.image_processor.download_bytes", AsyncMock(return_value=b"img")), \
+         patch("app.services.image_processor.image_processor.analyze_sources", analyze):
+        tasks.analyze_pending_images()
+
+    rows = assets()
+    assert [rows[f"a{i}"].tags for i in range(3)] == [["ok"], ["retried"], ["ok"]]
+    assert [len(call.args[0]) for call in analyze.call_args_list] == [3, 1]
+
+
+def test_exhausted_retries_mark_assets_failed(redis, assets):
+    _queue(redis, count=1)
+    always_failing = AsyncMock(
+        side_effect=lambda sources: [{"error": "bad", "tags": [], "caption": None} for _ in sources]
+    )
+
+    with patch("app.services.image_processor.image_processor.download_bytes", AsyncMock(return_value=b"img")), \
+         patch("app.services.image_processor.image_processor.analyze_sources", always_failing):
+        result = tasks.analyze_images.apply(
+            args=[[{"asset_id": "a0", "image_url": "https://cdn.test/0.jpg"}]]
+        ).get()
+
+    assert always_failing.call_count == tasks.analyze_images.max_retries + 1
+    assert result["results"][0]["status"] == "failed"
+    assert assets()["a0"].processing_status == "failed"
+
+
+def test_batch_route_does_not_store_error_results(assets, tmp_path):
+    """Test a failed multi-image call leaves rows unanalyzed and fails the assets."""
+    from app.routers import batch
+
+    results = iter([
+        {"tags": ["ok"], "caption": "fine"},
+        {"error": "429 Too Many Requests", "tags": [], "caption": None},
+        {"error": "429 Too Many Requests", "tags": [], "caption": None},
+    ])
+    batch._batch_jobs["job"] = {"status": "queued", "processed": 0, "total": 3, "failed_ids": [], "outputs": {}}
+
+    with patch.object(batch.image_processor, "download_bytes", AsyncMock(return_value=b"img")), \
+         patch.object(batch.analysis_batcher, "submit", AsyncMock(side_effect=lambda data: next(results))):
+        tasks._run(batch.process_batch_analyze(
+            "job", ["a0", "a1", "a2"], "u", f"sqlite+aiosqlite:///{tmp_path / 'tasks.db'}"
+        ))
+
+    job = batch._batch_jobs.pop("job")
+    assert (job["processed"], job["failed_ids"], job["status"]) == (1, ["a1", "a2"], "partial")
+    rows = assets()
+    assert rows["a0"].analyzed and rows["a0"].tags == ["ok"]
+    assert not rows["a1"].analyzed and rows["a1"].processing_status == "pending"
+
+
+def test_dispatch_failure_requeues_batch(redis):
+    _queue(redis)
+
+    with patch.object(tasks.analyze_images, "delay", side_effect=ConnectionError("broker down")):
+        with pytest.raises(ConnectionError):
+            tasks.analyze_pending_images()
+
+    assert [json.loads(item)["asset_id"] for item in redis.lists[tasks.PENDING_ANALYSIS_KEY]] == [
+        "a0", "a1", "a2"
+    ]
+
+
+# === RENDITIONS ===
+
+def test_renditions_batch_uploads_all_assets_in_one_bulk_call():
+    """Test renditions for many assets share one upload_many; bad sources fail alone."""
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 600), 40).convert("RGB").save(buffer, "JPEG")
+    sources = {f"https://cdn.test/{i}.jpg": buffer.getvalue() for i in range(5)}
+    sources["https://cdn.test/broken.jpg"] = b"not an image"
+
+    async def download(url):
+        if url.endswith("missing.jpg"):
+            raise ValueError("404")
+        return sources[url]
+
+    storage = StorageService(S3Backend(MagicMock(), "bucket", "https://cdn.test"))
+    upload_many = MagicMock(wraps=storage.upload_many)
+    items = [{"asset_id": f"a{i}", "image_url": f"https://cdn.test/{i}.jpg"} for i in range(5)]
+    items += [
+        {"asset_id": "broken", "image_url": "https://cdn.test/broken.jpg"},
+        {"asset_id": "missing", "image_url": "https://cdn.test/missing.jpg"},
+    ]
+
+    with patch("app.services.image_processor.image_processor.download_bytes", download), \
+         patch("app.services.storage_service.storage_service", storage), \
+         patch.object(storage, "upload_many", upload_many):
+        result = tasks.generate_renditions_batch.apply(args=[items]).get()
+    storage.shutdown()
+
+    upload_many.assert_called_once()
+    assert len(upload_many.call_args.args[0]) == 5 * 3
+    by_id = {r["asset_id"]: r for r in result["results"]}
+    assert by_id["a0"]["status"] == "completed"
+    assert by_id["a0"]["urls"]["grid"] == "https://cdn.test/renditions/a0/grid.jpg"
+    assert set(by_id["a4"]["urls"]) == {"display", "grid", "thumbnail"}
+    assert by_id["broken"]["status"] == "failed"
+    assert by_id["missing"]["error"].startswith("Download failed")
+
+
+def test_process_batch_dispatches_rendition_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "rendition_batch_size", 2)
+    dispatched = []
+    urls = {f"a{i}": f"https://cdn.test/{i}.jpg" for i in range(5)}
+
+    with patch.object(tasks.generate_renditions_batch, "delay", dispatched.append):
+        result = tasks.process_batch.apply(
+            args=["job", [*urls, "no-url"], "renditions", {"image_urls": urls}]
+        ).get()
+
+    assert [len(chunk) for chunk in dispatched] == [2, 2, 1]
+    assert dispatched[0][0] == {"asset_id": "a0", "image_url": "https://cdn.test/0.jpg"}
+    assert (result["processed"], result["failed_ids"]) == (5, ["no-url"])
@@ -0,0 +1,113 @@
+"""
+Neural Canvas Backend - Tiled Processing Tests
+Tests for strip-wise filters and resizes on large images.
+"""
+
+import io
+
+import pytest
+from PIL import Image, ImageChops
+
+from app.config import settings
+from app.services import filters, tiling
+from app.services.image_processor import image_processor
+
+
+@pytest.fixture
+def small_tiles(monkeypatch):
+    """Tile anything above 0.1 MP, in strips of at most 20k pixels."""
+    monkeypatch.setattr(settings, "image_tile_threshold_mp", 0.1)
+    monkeypatch.setattr(settings, "image_tile_max_pixels", 20_000)
+
+
+def _noise(size=(480, 400)) -> Image.Image:
+    return Image.merge("RGB", [Image.effect_noise(size, 60 + 10 * i) for i in range(3)])
+
+
+def _max_difference(a: Image.Image, b: Image.Image) -> int:
+    return max(high for _, high in ImageChops.difference(a, b).getextrema())
+
+
+# === UNIT TESTS ===
+
+def test_strips_cover_height(small_tiles):
+    """Test strips cover every row once and stay within the pixel cap."""
+    rows = tiling.strip_rows(400, margin=5)
+    ranges = list(tiling.strips(1000, rows))
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == 1000
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert (rows + 10) * 400 <= settings.image_tile_max_pixels
+
+
+@pytest.mark.parametrize("chain", [
+    ["sharpen"],
+    ["blur"],
+    ["sepia", "sharpen", "brighten", "blur", "grayscale"],
+])
+def test_tiled_filters_match_whole_image(small_tiles, chain):
+    """Test strip-wise filter chains are pixel-identical to a whole-image run."""
+    image = _noise()
+    passes = filters.fuse([filters.FILTERS[name] for name in chain])
+    whole = image
+    for op in passes:
+        whole = filters.apply_op(whole, op)
+
+    tiled = tiling.apply_ops_tiled(image, passes)
+
+    assert tiled.size == whole.size and tiled.mode == whole.mode
+    assert _max_difference(tiled, whole) == 0
+
+
+def test_tiled_reduce_matches_whole_image(small_tiles):
+    """Test strip-wise box reduction is identical to Image.reduce."""
+    image = _noise((483, 401))
+    assert _max_difference(tiling.reduce_tiled(image, 4), image.reduce(4)) == 0
+
+
+@pytest.mark.parametrize("size,box", [
+    ((240, 200), None),
+    ((100, 83), None),
+    ((200, 112), (40, 60, 440, 285)),
+])
+def test_tiled_resize_close_to_whole_image(small_tiles, size, box):
+    """Test strip-wise resizes match a whole-image LANCZOS resize closely."""
+    image = _noise()
+    region = image.crop(box) if box else image
+    whole = region.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    tiled = tiling.resize_tiled(image, size, box=box)
+
+    assert tiled.size == size
+    assert _max_difference(tiled, whole) <= 8
+
+
+def test_tiled_resize_keeps_alpha(small_tiles):
+    """Test transparent sources resize to RGBA."""
+    image = _noise().convert("RGBA")
+    assert tiling.resize_tiled(image, (120, 100)).mode == "RGBA"
+
+
+def test_processor_routes_large_images(small_tiles, monkeypatch):
+    """Test ImageProcessor switches to tiled paths above the threshold."""
+    calls = []
+    resize_tiled = tiling.resize_tiled
+    apply_ops_tiled = tiling.apply_ops_tiled
+    monkeypatch.setattr(tiling, "resize_tiled", lambda *a, **k: calls.append("resize") or resize_tiled(*a, **k))
+    monkeypatch.setattr(tiling, "apply_ops_tiled", lambda *a, **k: calls.append("ops") or apply_ops_tiled(*a, **k))
+    image = _noise()
+
+    thumb = Image.open(io.BytesIO(image_processor.create_thumbnail(image, (120, 120))))
+    resized = Image.open(io.BytesIO(image_processor.resize_image(image, 240, 240)))
+    filtered = image_processor.apply_filters(image, ["sepia", "sharpen"])
+
+    assert thumb.size == (120, 100)
+    assert resized.size == (240, 200)
+    assert filtered.size == image.size
+    assert calls == ["resize", "resize", "ops"]
+
+
+def test_small_images_not_tiled(small_tiles):
+    """Test images under the threshold take the regular path."""
+    assert not tiling.should_tile(Image.new("RGB", (300, 300)))
+    assert tiling.should_tile(Image.new("RGB", (400, 300)))
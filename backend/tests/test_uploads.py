@@ -0,0 +1,226 @@
+"""
+Neural Canvas Backend - Direct Upload Tests
+Tests for presigned upload sessions and completion.
+"""
+
+import io
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from app.config import settings
+from app.services.image_probe import ProbeResult
+from app.services.storage_backends import LocalBackend, S3Backend
+from app.services.storage_service import StorageService
+
+MB = 1024 * 1024
+
+
+@contextmanager
+def using(storage: StorageService):
+    """Route uploads, the local storage route and probes through ``storage``."""
+    with patch("app.routers.uploads.storage_service", storage), \
+         patch("app.routers.storage.storage_service", storage), \
+         patch("app.services.image_probe.storage_service", storage), \
+         patch("app.routers.uploads.index_asset", new=AsyncMock()) as index:
+        yield index
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    storage = StorageService(LocalBackend(str(tmp_path), "http://test/storage", "secret"))
+    yield storage
+    storage.shutdown()
+
+
+def jpeg(size=(640, 480)) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+# === LOCAL BACKEND (END TO END) ===
+
+@pytest.mark.asyncio
+async def test_local_upload_session_end_to_end(authenticated_client: AsyncClient, test_user, local):
+    """Test a client PUT plus completion creates a probed asset exactly once."""
+    data = jpeg()
+    with using(local) as index:
+        session = await authenticated_client.post("/uploads", json={
+            "filename": "../My Photo.jpg", "content_type": "image/jpeg", "file_size": len(data),
+        })
+        body = session.json()
+        put = await authenticated_client.put(body["url"], content=data, headers=body["headers"])
+        complete = await authenticated_client.post("/uploads/complete", json={
+            "object_key": body["object_key"], "original_filename": "My Photo.jpg", "x": 10, "tags": ["trip"],
+        })
+        again = await authenticated_client.post("/uploads/complete", json={
+            "object_key": body["object_key"],
+        })
+
+    assert session.status_code == 201
+    assert body["object_key"].startswith(f"uploads/{test_user.id}/")
+    assert body["object_key"].endswith("/My_Photo.jpg")
+    assert body["upload_id"] is None
+    assert put.status_code == 200
+    assert local.read_object(body["object_key"]) == data
+
+    assert complete.status_code == 201
+    asset = complete.json()
+    assert (asset["width"], asset["height"], asset["mime_type"]) == (640, 480, "image/jpeg")
+    assert asset["file_size"] == len(data)
+    assert (asset["x"], asset["tags"]) == (10, ["trip"])
+    assert asset["storage_url"] == f"http://test/storage/{body['object_key']}"
+    assert again.json()["id"] == asset["id"]
+    index.assert_called_once_with(asset["id"], test_user.id, asset["storage_url"])
+
+
+@pytest.mark.asyncio
+async def test_local_put_requires_valid_signature(authenticated_client: AsyncClient, local):
+    url = local.backend.presigned_put_url("uploads/a.jpg", "image/jpeg", 60)
+    with using(local):
+        forged = await authenticated_client.put(url.replace("uploads/a.jpg", "uploads/b.jpg"), content=b"x")
+        expired = await authenticated_client.put(
+            "/storage/uploads/a.jpg?expires=1&signature=" + local.backend.put_signature("uploads/a.jpg", 1),
+            content=b"x",
+        )
+
+    assert forged.status_code == 403
+    assert expired.status_code == 403
+    assert local.head_object("uploads/b.jpg") is None
+
+
+@pytest.mark.asyncio
+async def test_completion_rejects_and_deletes_non_images(authenticated_client: AsyncClient, test_user, local):
+    key = f"uploads/{test_user.id}/{'0' * 32}/fake.jpg"
+    local.upload_image(b"<html>not an image</html>" * 100, key)
+
+    with using(local):
+        response = await authenticated_client.post("/uploads/complete", json={"object_key": key})
+
+    assert response.status_code == 400
+    assert local.head_object(key) is None
+
+
+@pytest.mark.asyncio
+async def test_completion_before_upload_and_foreign_keys(authenticated_client: AsyncClient, test_user, local):
+    with using(local):
+        missing = await authenticated_client.post("/uploads/complete", json={
+            "object_key": f"uploads/{test_user.id}/{'0' * 32}/a.jpg",
+        })
+        foreign = await authenticated_client.post("/uploads/complete", json={
+            "object_key": f"uploads/other-user/{'0' * 32}/a.jpg",
+        })
+        traversal = await authenticated_client.post("/uploads/complete", json={
+            "object_key": f"uploads/{test_user.id}/{'0' * 32}/../../x.jpg",
+        })
+
+    assert missing.status_code == 400
+    assert foreign.status_code == 404
+    assert traversal.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_session_rejects_non_images_and_oversized(authenticated_client: AsyncClient):
+    not_image = await authenticated_client.post("/uploads", json={
+        "filename": "a.pdf", "content_type": "application/pdf", "file_size": 10,
+    })
+    too_big = await authenticated_client.post("/uploads", json={
+        "filename": "a.jpg", "content_type": "image/jpeg", "file_size": 10 ** 12,
+    })
+
+    assert not_image.status_code == 400
+    assert too_big.status_code == 400
+
+
+# === S3 MULTIPART ===
+
+@pytest.mark.asyncio
+async def test_large_upload_uses_multipart(authenticated_client: AsyncClient, test_user):
+    """Test files above the multipart threshold get part URLs and are assembled on completion."""
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    client.generate_presigned_url.side_effect = (
+        lambda op, Params, ExpiresIn: f"https://r2.test/{Params['Key']}?part={Params.get('PartNumber')}"
+    )
+    client.head_object.return_value = {"ContentLength": 70 * MB, "ContentType": "image/png"}
+    storage = StorageService(S3Backend(client, "bucket", "https://cdn.test"))
+    probe = ProbeResult(format="PNG", mime_type="image/png", width=9000, height=6000)
+
+    with using(storage), \
+         patch("app.routers.uploads.image_probe.probe_object", new=AsyncMock(return_value=probe)):
+        session = (await authenticated_client.post("/uploads", json={
+            "filename": "pano.png", "content_type": "image/png", "file_size": 70 * MB,
+        })).json()
+        complete = await authenticated_client.post("/uploads/complete", json={
+            "object_key": session["object_key"],
+            "upload_id": session["upload_id"],
+            "parts": [
+                {"part_number": part["part_number"], "etag": f"etag-{part['part_number']}"}
+                for part in reversed(session["parts"])
+            ],
+        })
+    storage.shutdown()
+
+    assert session["url"] is None
+    assert session["upload_id"] == "upload-1"
+    assert session["part_size"] == 16 * MB
+    assert [part["part_number"] for part in session["parts"]] == [1, 2, 3, 4, 5]
+    assert session["parts"][0]["url"].endswith("?part=1")
+
+    assert complete.status_code == 201
+    assert (complete.json()["width"], complete.json()["file_size"]) == (9000, 70 * MB)
+    parts = client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert [part["PartNumber"] for part in parts] == [1, 2, 3, 4, 5]
+    assert parts[0]["ETag"] == "etag-1"
+
+
+# === PRIVATE BUCKET ===
+
+def private_bucket(body: bytes) -> StorageService:
+    """S3 backend with no public URL; objects are only readable through the client."""
+    client = MagicMock()
+    client.head_object.return_value = {"ContentLength": len(body), "ContentType": "image/jpeg"}
+    client.get_object.side_effect = lambda Bucket, Key, Range=None: {
+        "Body": io.BytesIO(body[:int(Range.split("-")[1]) + 1] if Range else body)
+    }
+    return StorageService(S3Backend(client, "bucket", ""))
+
+
+@pytest.mark.asyncio
+async def test_private_bucket_completion_probes_through_backend(authenticated_client: AsyncClient, test_user):
+    """Test completion reads the header via the S3 client, not an HTTP GET of the key."""
+    data = jpeg((320, 200))
+    storage = private_bucket(data)
+    key = f"uploads/{test_user.id}/{'0' * 32}/a.jpg"
+
+    with using(storage):
+        response = await authenticated_client.post("/uploads/complete", json={"object_key": key})
+    storage.shutdown()
+
+    assert response.status_code == 201
+    assert (response.json()["width"], response.json()["height"]) == (320, 200)
+    assert storage.backend.client.get_object.call_args.kwargs["Key"] == key
+
+
+@pytest.mark.asyncio
+async def test_completion_deletes_object_on_every_rejection(authenticated_client: AsyncClient, test_user):
+    not_image = private_bucket(b"<html>not an image</html>" * 100)
+    unreadable = private_bucket(jpeg())
+    unreadable.backend.client.get_object.side_effect = ClientError({"Error": {"Code": "500"}}, "GetObject")
+    key = f"uploads/{test_user.id}/{'0' * 32}/a.jpg"
+
+    responses = []
+    for storage in (not_image, unreadable):
+        with using(storage):
+            responses.append(await authenticated_client.post("/uploads/complete", json={"object_key": key}))
+        storage.shutdown()
+
+    assert [response.status_code for response in responses] == [400, 502]
+    for storage in (not_image, unreadable):
+        storage.backend.client.delete_object.assert_called_once_with(Bucket="bucket", Key=key)
@@ -0,0 +1,226 @@
+"""
+Neural Canvas Backend - Presigned URL Cache Tests
+Tests for windowed URL signing and signed asset listings.
+"""
+
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import boto3
+import pytest
+from botocore.credentials import Credentials
+from botocore.exceptions import ClientError
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.asset import Asset
+from app.services.storage_backends import S3Backend
+from app.services.storage_service import StorageService
+from app.services.url_signer import UrlSigner
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def client():
+    """Mock S3 client whose signatures encode the key and expiry."""
+    client = MagicMock()
+    client.generate_presigned_url.side_effect = (
+        lambda op, Params, ExpiresIn: f"https://signed.test/{Params['Key']}?exp={ExpiresIn}&n={client.generate_presigned_url.call_count}"
+    )
+    return client
+
+
+@pytest.fixture
+def signer(client):
+    storage = StorageService(S3Backend(client, "bucket", "https://cdn.test"))
+    yield UrlSigner(storage, window=600, max_entries=3, clock=Clock(6000.0))
+    storage.shutdown()
+
+
+# === CACHE ===
+
+def test_url_stable_within_window_and_resigned_after(signer, client):
+    """Test a key keeps its URL for the window and always has a window of validity."""
+    with patch.object(
+        signer.storage, "generate_presigned_urls", wraps=signer.storage.generate_presigned_urls
+    ) as sign:
+        first = signer.sign("a.jpg")
+        signer.clock.now = 6599.0
+        assert signer.sign("a.jpg") == first
+    # Signed at window start: valid to the end of the next one
+    sign.assert_called_once_with(["a.jpg"], 1200, 6000)
+
+    signer.clock.now = 6600.0
+    second = signer.sign("a.jpg")
+
+    assert second != first
+    assert client.generate_presigned_url.call_count == 2
+    assert (signer.hits, signer.misses) == (1, 2)
+
+
+def test_late_signing_still_leaves_a_full_window(signer):
+    signer.clock.now = 6599.0
+
+    with patch.object(signer.storage, "generate_presigned_urls", return_value=["u"]) as sign:
+        signer.sign("a.jpg")
+
+    sign.assert_called_once_with(["a.jpg"], 1200, 6000)
+
+
+def test_urls_identical_across_processes_and_evictions():
+    """Test URLs depend only on (key, window): separate signers agree, and match botocore."""
+    def backend():
+        client = boto3.client(
+            "s3", region_name="auto", endpoint_url="https://account.r2.test",
+            aws_access_key_id="key", aws_secret_access_key="secret",
+        )
+        return S3Backend(client, "bucket", "https://cdn.test", Credentials("key", "secret"))
+
+    window_start = 1_800_000_000
+    one = UrlSigner(StorageService(backend()), window=600, max_entries=1, clock=Clock(window_start + 5.0))
+    other = UrlSigner(StorageService(backend()), window=600, max_entries=1, clock=Clock(window_start + 590.0))
+
+    url = one.sign("uploads/a b.jpg")
+    one.sign("uploads/other.jpg")  # Evicts the first entry
+    assert one.sign("uploads/a b.jpg") == url
+    assert other.sign("uploads/a b.jpg") == url
+    assert "X-Amz-Date=20270115T080000Z" in url and "X-Amz-Expires=1200" in url
+
+    reference = backend()
+    signed_at = datetime.fromtimestamp(window_start, timezone.utc).replace(tzinfo=None)
+    with patch("botocore.auth.get_current_datetime", return_value=signed_at):
+        expected = reference.client.generate_presigned_url(
+            "get_object", Params={"Bucket": "bucket", "Key": "uploads/a b.jpg"}, ExpiresIn=1200
+        )
+    assert url == expected
+
+    other.clock.now = window_start + 600.0
+    assert other.sign("uploads/a b.jpg") != url
+
+
+def test_sign_many_dedupes_and_signs_only_misses(signer, client):
+    signer.sign("a.jpg")
+
+    signed = signer.sign_many(["a.jpg", "b.jpg", "b.jpg", "c.jpg"])
+
+    assert set(signed) == {"a.jpg", "b.jpg", "c.jpg"}
+    assert client.generate_presigned_url.call_count == 3
+
+
+def test_lru_bound_and_failures_not_cached(signer, client):
+    signer.sign_many(["a.jpg", "b.jpg", "c.jpg", "d.jpg"])
+    assert list(signer._entries) == ["b.jpg", "c.jpg", "d.jpg"]
+
+    client.generate_presigned_url.side_effect = ClientError({"Error": {"Code": "403"}}, "Presign")
+    assert signer.sign("e.jpg") is None
+    assert "e.jpg" not in signer._entries
+
+
+@pytest.mark.asyncio
+async def test_sign_urls_skips_foreign_urls(signer, client):
+    signed = await signer.sign_urls_async([
+        "https://cdn.test/uploads/a.jpg",
+        "https://cdn.test/uploads/a.jpg",
+        "https://example.com/b.jpg",
+        None,
+    ])
+
+    assert list(signed) == ["https://cdn.test/uploads/a.jpg"]
+    assert signed["https://cdn.test/uploads/a.jpg"].startswith("https://signed.test/uploads/a.jpg?")
+    assert client.generate_presigned_url.call_count == 1
+
+
+# === LISTINGS ===
+
+@pytest.mark.asyncio
+async def test_listing_signs_in_bulk_with_stable_urls(
+    authenticated_client: AsyncClient, db_session: AsyncSession, test_user, signer, client, monkeypatch
+):
+    """Test a page of assets is signed once and the URLs repeat on the next request."""
+    monkeypatch.setattr(settings, "storage_signed_urls", True)
+    signer.max_entries = 100
+    for i in range(20):
+        db_session.add(Asset(
+            id=f"signed-{i}",
+            owner_id=test_user.id,
+            storage_url=f"https://cdn.test/uploads/{i}.jpg",
+            thumbnail_url=f"https://cdn.test/thumbs/{i}.jpg" if i % 2 else None,
+            width=100,
+            height=100,
+        ))
+    db_session.add(Asset(
+        id="external", owner_id=test_user.id, storage_url="https://example.com/x.jpg",
+        width=100, height=100,
+    ))
+    await db_session.commit()
+
+    with patch("app.routers.assets.url_signer", signer):
+        first = (await authenticated_client.get("/assets")).json()
+        second = (await authenticated_client.get("/assets")).json()
+
+    urls = {asset["id"]: asset for asset in first}
+    assert urls["signed-3"]["storage_url"].startswith("https://signed.test/uploads/3.jpg?")
+    assert urls["signed-3"]["thumbnail_url"].startswith("https://signed.test/thumbs/3.jpg?")
+    assert urls["signed-2"]["thumbnail_url"] is None
+    assert urls["external"]["storage_url"] == "https://example.com/x.jpg"
+    assert first == second
+    assert client.generate_presigned_url.call_count == 30
+
+
+# === PRIVATE BUCKET (NO PUBLIC URL) ===
+
+def test_object_keys_without_public_url(monkeypatch):
+    """Test stored keys and bucket URLs map to object keys when r2_public_url is empty."""
+    monkeypatch.setattr(settings, "r2_public_url", "")
+    client = boto3.client(
+        "s3", region_name="auto", endpoint_url="https://account.r2.test",
+        aws_access_key_id="key", aws_secret_access_key="secret",
+    )
+    storage = StorageService(S3Backend(client, "bucket", settings.r2_public_url))
+
+    assert storage.object_key("uploads/u/a.jpg") == "uploads/u/a.jpg"
+    assert storage.object_key("https://account.r2.test/bucket/uploads/a%20b.jpg") == "uploads/a b.jpg"
+    assert storage.object_key("https://bucket.account.r2.test/thumbs/a.jpg?x=1") == "thumbs/a.jpg"
+    assert storage.local_key("uploads/u/a.jpg") == "uploads/u/a.jpg"  # Read via the client
+    for foreign in ("https://example.com/a.jpg", "https://account.r2.test/other/a.jpg", "/etc/passwd", ""):
+        assert storage.object_key(foreign) is None
+
+
+@pytest.mark.asyncio
+async def test_private_bucket_listing_is_signed(
+    authenticated_client: AsyncClient, db_session: AsyncSession, test_user, client, monkeypatch
+):
+    monkeypatch.setattr(settings, "storage_signed_urls", True)
+    monkeypatch.setattr(settings, "r2_public_url", "")
+    storage = StorageService(S3Backend(client, "bucket", settings.r2_public_url))
+    signer = UrlSigner(storage, window=600, max_entries=10)
+    db_session.add(Asset(
+        id="private", owner_id=test_user.id, storage_url=f"uploads/{test_user.id}/a.jpg",
+        thumbnail_url="renditions/private/thumbnail.jpg", width=10, height=10,
+    ))
+    await db_session.commit()
+
+    with patch("app.routers.assets.url_signer", signer):
+        asset = (await authenticated_client.get("/assets")).json()[0]
+    storage.shutdown()
+
+    assert asset["storage_url"].startswith(f"https://signed.test/uploads/{test_user.id}/a.jpg?")
+    assert asset["thumbnail_url"].startswith("https://signed.test/renditions/private/thumbnail.jpg?")
+
+
+@pytest.mark.asyncio
+async def test_cannot_claim_another_users_upload(authenticated_client: AsyncClient, signer):
+    with patch("app.routers.assets.storage_service", signer.storage):
+        response = await authenticated_client.post("/assets", json={
+            "storage_url": "https://cdn.test/uploads/someone-else/x/a.jpg", "width": 10, "height": 10,
+        })
+
+    assert response.status_code == 403